@@ -0,0 +1,452 @@
+'''
+    MIT License
+    
+    Copyright (c) 2020 OpenSeesPro
+    
+    Permission is hereby granted, free of charge, to any person obtaining a copy
+    of this software and associated documentation files (the "Software"), to deal
+    in the Software without restriction, including without limitation the rights
+    to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+    copies of the Software, and to permit persons to whom the Software is
+    furnished to do so, subject to the following conditions:
+    
+    The above copyright notice and this permission notice shall be included in all
+    copies or substantial portions of the Software.
+    
+    THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+    IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+    FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+    AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+    LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+    OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+    SOFTWARE.
+
+    Developed by:
+        Ayush Singhania (ayushs@stanford.edu)
+        Pearl Ranchal (ranchal@berkeley.edu)
+      
+    Publication:
+        Goings, C. B., Singhania, A., Ranchal, P., Weaver B., 2020, “Industrial 
+        Scale NLRH Analysis Using OpenSees and Comparison with Perform3D,” 
+        Proceedings of 2020 SEAOC Virtual Convention, SEAOC, CA
+
+    
+    Description of the script - 
+        This is a supporting script to expose the progress of the running response
+        history analyses on a local HTTP endpoint (GET /metrics, in the Prometheus
+        text format) so that stuck or slow runs can be spotted while a campaign is
+        running. The execution loop only updates a few numbers of a metrics 
+        table per step. The table is a memory mapped file which is read by a 
+        sidecar process serving the endpoint, so the endpoint keeps answering 
+        while OpenSees holds the GIL of the analysis process (e.g. during a long
+        step with the backup algorithms). Everything else (rates, ETA, memory) 
+        is computed by the sidecar when the endpoint is scraped.
+
+'''
+
+import os
+import sys
+import json
+import mmap
+import time
+import atexit
+import socket
+import tempfile
+import threading
+import subprocess
+import numpy as np
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+METRICS_PREFIX = 'e2o'
+DEFAULT_ALGORITHM = 'Krylov-Newton'
+
+# number of runs of a process kept in the metrics table (the slot of the oldest finished run is reused)
+NUM_SLOTS = 32
+
+# number of consecutive ports tried when the requested port is taken (e.g. several workers on one machine)
+MAX_PORT_TRIES = 64
+
+# numbers of a run in the metrics table, the state of a slot is one of FREE, REGISTERED, RUNNING or FINISHED
+FIELDS = ['state', 'failed', 'in_fallback', 'total_time', 'sim_time', 'started_at', 'finished_at', 'steps', 'iterations', 
+          'last_iterations']
+FREE, REGISTERED, RUNNING, FINISHED = range(4)
+STATE, FAILED, IN_FALLBACK, TOTAL_TIME, SIM_TIME, STARTED_AT, FINISHED_AT, STEPS, ITERATIONS, LAST_ITERATIONS = range(len(FIELDS))
+
+# one slot per run: the numbers and a json text (run id, algorithm and fallback counts) guarded by a sequence number,
+# which is odd while the text is being written
+TEXT_SIZE = 1024
+SLOT_DTYPE = np.dtype([('seq', '<i8'), ('values', '<f8', (len(FIELDS),)), ('text', f'S{TEXT_SIZE}')])
+
+# PROGRESS OF ONE RESPONSE HISTORY ANALYSIS, UPDATED BY THE EXECUTION LOOP AND READ BY THE METRICS SIDECAR
+class AnalysisMetrics:
+    def __init__(self, run_id, table=None, index=0):
+        """
+        run_id              label of the run in the metrics
+        table               metrics table (see SLOT_DTYPE) where the run is written, a private table if None
+        index               slot of the run in the table
+        """
+        if table is None:
+            table, index = np.zeros(1, dtype=SLOT_DTYPE), 0
+        
+        # views of the slot, every update is written straight to the table
+        self.values = table['values'][index]
+        self.seq = table['seq'][index:index + 1]
+        self.text = table['text'][index:index + 1]
+        
+        self.run_id = run_id
+        self.fallbacks = {}
+        self.algorithm = DEFAULT_ALGORITHM
+        self.values[:] = 0.0
+        self.values[STATE] = REGISTERED
+        self.write_text()
+    
+    # the text changes only when a run starts or an algorithm is switched, not on every step
+    def write_text(self):
+        data = json.dumps({'run': self.run_id, 'algorithm': self.algorithm, 'fallbacks': self.fallbacks}).encode()
+        self.seq += 1
+        self.text[0] = data[:TEXT_SIZE]
+        self.seq += 1
+        return
+    
+    @property
+    def running(self):
+        return self.values[STATE] == RUNNING
+    
+    def start(self, total_time):
+        self.values[TOTAL_TIME] = total_time
+        self.values[STARTED_AT] = time.time()
+        self.values[STATE] = RUNNING
+        return
+    
+    # called once per step of the execution loop, keep it to plain updates of the table
+    def step(self, sim_time, iterations):
+        values = self.values
+        values[SIM_TIME] = sim_time
+        values[STEPS] += 1
+        values[ITERATIONS] += iterations
+        values[LAST_ITERATIONS] = iterations
+        return
+    
+    def fallback(self, algorithm):
+        self.fallbacks[algorithm] = self.fallbacks.get(algorithm, 0) + 1
+        self.algorithm = algorithm
+        self.values[IN_FALLBACK] = 1
+        self.write_text()
+        return
+    
+    def recovered(self):
+        self.algorithm = DEFAULT_ALGORITHM
+        self.values[IN_FALLBACK] = 0
+        self.write_text()
+        return
+    
+    def finish(self, failed):
+        self.values[FAILED] = bool(failed)
+        self.values[FINISHED_AT] = time.time()
+        self.values[STATE] = FINISHED
+        return
+    
+    def sample(self):
+        return sample_run(self.values)
+
+# VALUES OF THE METRICS OF A RUN, THE RATES ARE AVERAGED FROM THE START OF THE ANALYSIS
+def sample_run(values, now=None):
+    now = time.time() if now is None else now
+    running = values[STATE] == RUNNING
+    started_at, finished_at = values[STARTED_AT], values[FINISHED_AT]
+    elapsed = ((finished_at or now) - started_at) if started_at else 0.0
+    sim_time, total_time, steps = values[SIM_TIME], values[TOTAL_TIME], int(values[STEPS])
+    sim_rate = sim_time / elapsed if elapsed > 0 else 0.0
+    remaining = max(total_time - sim_time, 0.0) if running else 0.0
+    return {'running'           : int(running),
+            'failed'            : int(values[FAILED]),
+            'in_fallback'       : int(values[IN_FALLBACK]),
+            'sim_time_seconds'  : sim_time,
+            'total_time_seconds': total_time,
+            'elapsed_seconds'   : elapsed,
+            'steps_total'       : steps,
+            'steps_per_second'  : steps / elapsed if elapsed > 0 else 0.0,
+            'eta_seconds'       : remaining / sim_rate if sim_rate > 0 else float('nan'),
+            'iterations_total'  : int(values[ITERATIONS]),
+            'last_step_iterations': int(values[LAST_ITERATIONS]),
+            }
+
+# name, type and help of the metrics of each run
+RUN_METRICS = [('running', 'gauge', '1 while the analysis is running'),
+               ('failed', 'gauge', '1 if the analysis stopped because no algorithm converged'),
+               ('in_fallback', 'gauge', '1 while a backup algorithm is being used'),
+               ('sim_time_seconds', 'gauge', 'current analysis (pseudo) time'),
+               ('total_time_seconds', 'gauge', 'analysis time at the end of the run'),
+               ('elapsed_seconds', 'gauge', 'wall clock time since the start of the run'),
+               ('steps_total', 'counter', 'number of completed steps'),
+               ('steps_per_second', 'gauge', 'average number of steps per wall clock second'),
+               ('eta_seconds', 'gauge', 'estimated wall clock time to the end of the run'),
+               ('iterations_total', 'counter', 'number of iterations of the convergence test over all the steps'),
+               ('last_step_iterations', 'gauge', 'number of iterations of the convergence test in the last step'),
+               ]
+
+# METRICS TABLE OF THIS PROCESS (MAPPED FROM A FILE ONCE THE METRICS ARE SERVED) AND ITS SIDECAR
+_table = None
+_sidecar = None
+_table_lock = threading.Lock()
+
+# CREATE THE METRICS OF A NEW RUN, IN THE TABLE SERVED BY THE SIDECAR IF THERE IS ONE
+def register_run(run_id):
+    if _table is None:
+        return AnalysisMetrics(run_id)
+    
+    # a free slot, otherwise the slot of the run which finished first (the slots of the runs still going are never reused)
+    with _table_lock:
+        states = _table['values'][:, STATE]
+        free = np.flatnonzero(states == FREE)
+        finished = np.flatnonzero(states == FINISHED)
+        if len(free):
+            index = free[0]
+        elif len(finished):
+            index = finished[np.argmin(_table['values'][finished, FINISHED_AT])]
+        else:
+            print(f'analysis_metrics: all the {NUM_SLOTS} slots are used by running analyses, {run_id} is not exported')
+            return AnalysisMetrics(run_id)
+        return AnalysisMetrics(run_id, _table, index)
+
+# READ THE TEXT OF A SLOT (RETRIED WHILE IT IS BEING WRITTEN)
+def read_slot_text(table, index, max_tries=100):
+    for _ in range(max_tries):
+        seq = int(table['seq'][index])
+        text = bytes(table['text'][index])
+        if seq % 2 == 0 and int(table['seq'][index]) == seq:
+            return json.loads(text.decode()) if text else None
+    return None
+
+# RESIDENT AND PEAK RESIDENT MEMORY OF A PROCESS IN BYTES (None IF NOT AVAILABLE ON THIS PLATFORM)
+def memory_usage(pid):
+    rss = peak = None
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    rss = int(line.split()[1]) * 1024
+                elif line.startswith('VmHWM:'):
+                    peak = int(line.split()[1]) * 1024
+    except OSError:
+        # psutil (optional) covers the other platforms, peak_wset is the peak working set on Windows
+        try:
+            import psutil
+            info = psutil.Process(pid).memory_info()
+            rss, peak = info.rss, getattr(info, 'peak_wset', None)
+        except Exception:
+            pass
+    
+    if rss is not None and peak is not None:
+        peak = max(rss, peak)
+    return rss, peak
+
+# FORMAT THE METRICS OF ALL THE RUNS OF A TABLE IN THE PROMETHEUS TEXT FORMAT
+def format_metrics(table, pid):
+    now = time.time()
+    values = np.array(table['values'])
+    samples = []
+    for index in np.flatnonzero(values[:, STATE] != FREE).tolist():
+        info = read_slot_text(table, index)
+        if info is not None:
+            samples.append((info, sample_run(values[index], now)))
+    labels = f'pid="{pid}",host="{socket.gethostname()}"'
+    
+    lines = []
+    for name, kind, description in RUN_METRICS:
+        lines += [f'# HELP {METRICS_PREFIX}_{name} {description}', f'# TYPE {METRICS_PREFIX}_{name} {kind}']
+        lines += [f'{METRICS_PREFIX}_{name}{{run="{info["run"]}",{labels}}} {sample[name]}' for info, sample in samples]
+    
+    lines += [f'# HELP {METRICS_PREFIX}_fallback_events_total number of times a backup algorithm was tried', 
+              f'# TYPE {METRICS_PREFIX}_fallback_events_total counter']
+    lines += [f'{METRICS_PREFIX}_fallback_events_total{{run="{info["run"]}",algorithm="{algorithm}",{labels}}} {count}' 
+              for info, _ in samples for algorithm, count in info['fallbacks'].items()]
+    
+    # the memory metrics are left out when they are not available on this platform
+    rss, peak = memory_usage(pid)
+    if rss is not None:
+        lines += [f'# HELP {METRICS_PREFIX}_memory_rss_bytes resident memory of the process', 
+                  f'# TYPE {METRICS_PREFIX}_memory_rss_bytes gauge', f'{METRICS_PREFIX}_memory_rss_bytes{{{labels}}} {rss}']
+    if peak is not None:
+        lines += [f'# HELP {METRICS_PREFIX}_memory_peak_rss_bytes peak resident memory of the process', 
+                  f'# TYPE {METRICS_PREFIX}_memory_peak_rss_bytes gauge', 
+                  f'{METRICS_PREFIX}_memory_peak_rss_bytes{{{labels}}} {peak}']
+    return '\n'.join(lines) + '\n'
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics':
+            self.send_error(404)
+            return
+        body = format_metrics(self.server.table, self.server.pid).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    # do not log every scrape to stderr
+    def log_message(self, format, *args):
+        return
+
+# BODY OF THE SIDECAR PROCESS, SERVES THE TABLE OF THE ANALYSIS PROCESS pid UNTIL ITS STDIN IS CLOSED
+def serve_metrics(fpath, pid, host, port):
+    with open(fpath, 'rb') as f:
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    table = np.frombuffer(buffer, dtype=SLOT_DTYPE, count=NUM_SLOTS)
+    
+    # both processes hold the mapping now, removing the file here does not leave it behind if the analysis process is 
+    # killed (it is removed again on shutdown on the platforms which do not allow removing an open file)
+    try:
+        os.remove(fpath)
+    except OSError:
+        pass
+    
+    for port in ([0] if port == 0 else range(port, port + MAX_PORT_TRIES)):
+        try:
+            server = ThreadingHTTPServer((host, port), MetricsHandler)
+            break
+        except OSError:
+            continue
+    else:
+        print(f'error: no free port for the metrics server in [{port - MAX_PORT_TRIES + 1}, {port}]', flush=True)
+        return
+    
+    server.daemon_threads = True
+    server.table, server.pid = table, pid
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f'port {server.server_address[1]}', flush=True)
+    
+    # the analysis process holds the other end of stdin, it is closed when the process stops the sidecar or exits
+    sys.stdin.read()
+    server.shutdown()
+    return
+
+# SIDECAR PROCESS SERVING THE METRICS OF THIS PROCESS
+class MetricsSidecar:
+    def __init__(self, process, fpath, host, port):
+        self.process, self.fpath, self.host, self.port = process, fpath, host, port
+    
+    def shutdown(self):
+        global _table, _sidecar
+        if self.process.poll() is None:
+            self.process.stdin.close()
+            self.process.wait(timeout=10)
+        
+        # the runs registered from now on are private again
+        with _table_lock:
+            _table, _sidecar = None, None
+        try:
+            os.remove(self.fpath)
+        except OSError:
+            pass
+        return
+
+# START A SIDECAR PROCESS SERVING THE METRICS OF THE RUNS OF THIS PROCESS
+def start_metrics_server(port=9400, host='127.0.0.1'):
+    """
+    port                first port tried, the next ports are tried if it is taken (port 0 picks any free port)
+    host                interface to listen on, only the local machine by default
+    
+    returns the sidecar, the port is sidecar.port and sidecar.shutdown() stops it (it also stops when this process exits)
+    """
+    global _table, _sidecar
+    if _sidecar is not None:
+        return _sidecar
+    
+    # the table is a file mapped by both processes
+    fd, fpath = tempfile.mkstemp(prefix=f'e2o_metrics_{os.getpid()}_', suffix='.bin')
+    os.ftruncate(fd, NUM_SLOTS * SLOT_DTYPE.itemsize)
+    buffer = mmap.mmap(fd, NUM_SLOTS * SLOT_DTYPE.itemsize)
+    os.close(fd)
+    
+    process = subprocess.Popen([sys.executable, os.path.abspath(__file__), 'serve', fpath, str(os.getpid()), host, str(port)],
+                               stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+    line = process.stdout.readline().strip()
+    if not line.startswith('port '):
+        process.wait()
+        os.remove(fpath)
+        raise OSError(f'The metrics sidecar did not start: {line}')
+    
+    with _table_lock:
+        _table = np.ndarray(NUM_SLOTS, dtype=SLOT_DTYPE, buffer=buffer)
+    _sidecar = MetricsSidecar(process, fpath, host, int(line.split()[1]))
+    atexit.register(_sidecar.shutdown)
+    print(f'Serving analysis metrics on http://{host}:{_sidecar.port}/metrics')
+    return _sidecar
+
+# MEASURE THE OVERHEAD OF THE METRICS ON THE EXECUTION LOOP AND THE LATENCY OF THE ENDPOINT DURING A LONG STEP
+def measure_overhead(total_run_time=2.0, time_step=0.01, scrape_interval=0.1):
+    import timeit
+    import urllib.request
+    import opensees_utilities as osu
+    from model_generator import generate_etabs_data
+    
+    # cost of the per step update alone
+    metrics = AnalysisMetrics('timeit')
+    num = 200000
+    update_cost = timeit.timeit(lambda: metrics.step(1.0, 3), number=num) / num
+    
+    # cost of one analysis with and without the metrics (and a client scraping the endpoint during the run)
+    model_data = generate_etabs_data(3, 2, 2)
+    record_file = os.path.abspath('BM68elc.acc')
+    sidecar = start_metrics_server(0)
+    url = f'http://127.0.0.1:{sidecar.port}/metrics'
+    
+    # the client is a separate process, a thread of this process would wait for the GIL held by the analysis
+    scraper = subprocess.Popen([sys.executable, '-c', SCRAPER_CODE, url, str(scrape_interval)], stdin=subprocess.PIPE, 
+                               stdout=subprocess.PIPE, text=True)
+    
+    step_times = {}
+    cwd = os.getcwd()
+    for label in ['without metrics', 'with metrics', 'without metrics (repeat)', 'with metrics (repeat)']:
+        with tempfile.TemporaryDirectory() as work_dir:
+            os.chdir(work_dir)
+            try:
+                osu.setup_opensees_model(model_data)
+                metrics = register_run(label) if label.startswith('with ') else None
+                start = time.perf_counter()
+                osu.run_dynamic_analysis_w_rayleigh_damping(model_data, 0.05, 'tangent', work_dir, total_run_time, time_step, 
+                                                            record_file, metrics=metrics)
+                step_times[label] = (time.perf_counter() - start) / (total_run_time / time_step)
+            finally:
+                os.chdir(cwd)
+    
+    # worst latency of the endpoint while the analyses were running
+    scraper.stdin.close()
+    max_latency = float(scraper.stdout.read())
+    last_scrape = urllib.request.urlopen(url).read().decode()
+    sidecar.shutdown()
+    
+    print(last_scrape)
+    print(f'metrics update per step: {update_cost * 1e6:.3f} us')
+    for label, step_time in step_times.items():
+        print(f'wall time per step {label:<26}: {step_time * 1e3:.3f} ms')
+    print(f'update cost relative to a step: {update_cost / min(step_times.values()) * 100:.4f} %')
+    print(f'max latency of the endpoint during the analyses: {max_latency * 1e3:.1f} ms')
+    return update_cost, step_times, max_latency
+
+# CLIENT SCRAPING THE ENDPOINT UNTIL ITS STDIN IS CLOSED, PRINTS THE LONGEST RESPONSE TIME
+SCRAPER_CODE = '''
+import sys, time, threading, urllib.request
+url, interval = sys.argv[1], float(sys.argv[2])
+stop, latencies = threading.Event(), [0.0]
+def scrape():
+    while not stop.wait(interval):
+        start = time.perf_counter()
+        urllib.request.urlopen(url).read()
+        latencies.append(time.perf_counter() - start)
+thread = threading.Thread(target=scrape)
+thread.start()
+sys.stdin.read()
+stop.set()
+thread.join()
+print(max(latencies))
+'''
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == 'serve':
+        serve_metrics(sys.argv[2], int(sys.argv[3]), sys.argv[4], int(sys.argv[5]))
+    else:
+        measure_overhead()
+    sys.exit(0)
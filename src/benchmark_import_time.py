@@ -0,0 +1,92 @@
+'''
+    MIT License
+    
+    Copyright (c) 2020 OpenSeesPro
+    
+    Permission is hereby granted, free of charge, to any person obtaining a copy
+    of this software and associated documentation files (the "Software"), to deal
+    in the Software without restriction, including without limitation the rights
+    to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+    copies of the Software, and to permit persons to whom the Software is
+    furnished to do so, subject to the following conditions:
+    
+    The above copyright notice and this permission notice shall be included in all
+    copies or substantial portions of the Software.
+    
+    THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+    IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+    FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+    AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+    LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+    OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+    SOFTWARE.
+
+    Developed by:
+        Ayush Singhania (ayushs@stanford.edu)
+        Pearl Ranchal (ranchal@berkeley.edu)
+      
+    Publication:
+        Goings, C. B., Singhania, A., Ranchal, P., Weaver B., 2020, “Industrial 
+        Scale NLRH Analysis Using OpenSees and Comparison with Perform3D,” 
+        Proceedings of 2020 SEAOC Virtual Convention, SEAOC, CA
+
+    
+    Description of the script - 
+        This is a supporting script to benchmark the time taken to import the
+        modules of this library in a fresh Python interpreter. It also reports
+        if any of the modules that should be loaded lazily (COM connection, 
+        rendering, progress bar) were loaded at import time.
+
+'''
+
+import os
+import sys
+import json
+import subprocess
+import numpy as np
+
+# modules of this library in the order of a typical import path of a worker
+MODULES = ['general_utilities', 'etabs_utilities', 'opensees_utilities', 'opensees_postprocessor']
+
+# modules that must not be loaded by simply importing the library
+LAZY_MODULES = ['comtypes', 'matplotlib', 'tqdm', 'openseespy.postprocessing.Get_Rendering']
+
+# script executed in a fresh interpreter, prints the import time and the lazy modules that got loaded
+SNIPPET = '''
+import sys, time, json
+sys.path.insert(0, {src!r})
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{'time': elapsed, 'loaded': [m for m in {lazy!r} if m in sys.modules]}}))
+'''
+
+# TIME THE IMPORT OF A MODULE IN A FRESH INTERPRETER
+def time_import(module, repeat=5):
+    src = os.path.dirname(os.path.abspath(__file__))
+    snippet = SNIPPET.format(src=src, module=module, lazy=LAZY_MODULES)
+    
+    times = []
+    for _ in range(repeat):
+        out = subprocess.run([sys.executable, '-c', snippet], capture_output=True, text=True)
+        
+        # report the error if the module could not be imported at all (e.g. a missing dependency)
+        if out.returncode != 0:
+            return None, out.stderr.strip().splitlines()[-1]
+        
+        result = json.loads(out.stdout.strip().splitlines()[-1])
+        times.append(result['time'])
+    return np.array(times), result['loaded']
+
+if __name__ == '__main__':
+    print(''.center(100, '-'))
+    print(':: IMPORT TIME BENCHMARK ::'.center(100))
+    print(''.center(100, '-'))
+    
+    for module in MODULES + ['main']:
+        times, loaded = time_import(module)
+        if times is None:
+            print(f'{module:<25} import failed: {loaded}')
+            continue
+        print(f'{module:<25} median: {np.median(times)*1000:8.1f} ms    min: {times.min()*1000:8.1f} ms    '
+              f'lazy modules loaded: {", ".join(loaded) if loaded else "none"}')
@@ -0,0 +1,115 @@
+'''
+    MIT License
+    
+    Copyright (c) 2020 OpenSeesPro
+    
+    Permission is hereby granted, free of charge, to any person obtaining a copy
+    of this software and associated documentation files (the "Software"), to deal
+    in the Software without restriction, including without limitation the rights
+    to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+    copies of the Software, and to permit persons to whom the Software is
+    furnished to do so, subject to the following conditions:
+    
+    The above copyright notice and this permission notice shall be included in all
+    copies or substantial portions of the Software.
+    
+    THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+    IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+    FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+    AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+    LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+    OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+    SOFTWARE.
+
+    Developed by:
+        Ayush Singhania (ayushs@stanford.edu)
+        Pearl Ranchal (ranchal@berkeley.edu)
+      
+    Publication:
+        Goings, C. B., Singhania, A., Ranchal, P., Weaver B., 2020, “Industrial 
+        Scale NLRH Analysis Using OpenSees and Comparison with Perform3D,” 
+        Proceedings of 2020 SEAOC Virtual Convention, SEAOC, CA
+
+    
+    Description of the script - 
+        This is a supporting script to benchmark the speedup of the parallel
+        analysis (opensees_parallel.py) over the serial analysis for synthetic
+        buildings. Every run is launched with mpirun (the serial run with python)
+        and the floor displacements of the parallel runs are compared with the
+        serial ones. The timings are saved to a csv file. Execute this script
+        from the src directory on a machine with MPI and a parallel OpenSeesPy.
+
+'''
+
+import os
+import sys
+import json
+import shutil
+import argparse
+import subprocess
+import numpy as np
+import pandas as pd
+
+# (stories, bays, frames) of the synthetic buildings
+BUILDING_SIZES = [(12, 4, 3), (24, 6, 4), (40, 8, 6)]
+NUM_PROCS = [1, 2, 4]
+
+# RUN ONE ANALYSIS WITH A NUMBER OF PROCESSES AND RETURN ITS TIMINGS
+def run_case(size, num_procs, run_time, results_dir, mpirun='mpirun', mpi_args=()):
+    os.makedirs(results_dir, exist_ok=True)
+    timing_file = os.path.join(results_dir, 'timing.json')
+    
+    cmd = [sys.executable, 'opensees_parallel.py', '--size', *map(str, size), '--run-time', str(run_time), 
+           '--results-dir', results_dir, '--timing-file', timing_file]
+    if num_procs > 1:
+        cmd = [mpirun, '-np', str(num_procs), *mpi_args] + cmd
+    subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL)
+    
+    with open(timing_file) as f:
+        return json.load(f)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the parallel analysis against the serial analysis.')
+    parser.add_argument('--procs', type=int, nargs='+', default=NUM_PROCS)
+    parser.add_argument('--run-time', type=float, default=1.0, help='duration of each response history analysis')
+    parser.add_argument('--max-stories', type=int, default=40, help='skip the buildings with more stories')
+    parser.add_argument('--mpirun', default='mpirun')
+    parser.add_argument('--mpi-args', nargs=argparse.REMAINDER, default=[], help='extra arguments of mpirun (last)')
+    args = parser.parse_args()
+    
+    working_dir = os.path.join(os.path.dirname(os.getcwd()), 'results', 'benchmark_parallel')
+    os.makedirs(working_dir, exist_ok=True)
+    
+    rows = []
+    for size in BUILDING_SIZES:
+        if size[0] > args.max_stories:
+            continue
+        
+        serial_dir = os.path.join(working_dir, 'x'.join(map(str, size)) + '-np1')
+        serial = run_case(size, 1, args.run_time, serial_dir)
+        serial_disp = np.loadtxt(os.path.join(serial_dir, 'floor_disp_tangent.out'), ndmin=2)
+        
+        for num_procs in args.procs:
+            if num_procs == 1:
+                timing, error = serial, 0.0
+            else:
+                results_dir = os.path.join(working_dir, 'x'.join(map(str, size)) + f'-np{num_procs}')
+                timing = run_case(size, num_procs, args.run_time, results_dir, args.mpirun, args.mpi_args)
+                
+                # largest difference of the floor displacements relative to the largest serial displacement
+                disp = np.loadtxt(os.path.join(results_dir, 'floor_disp_tangent.out'), ndmin=2)
+                num_steps = min(len(disp), len(serial_disp))
+                error = np.abs(disp[:num_steps] - serial_disp[:num_steps]).max() / np.abs(serial_disp).max()
+                shutil.rmtree(results_dir)
+            
+            rows.append({'Stories': size[0], 'Bays': size[1], 'Frames': size[2], 'DOF': timing['num_dofs'], 
+                         'Processes': num_procs, 'Wall Time (s)': timing['wall_time'], 
+                         'Speedup': serial['wall_time'] / timing['wall_time'], 'Rel. Disp. Error': error})
+            print(rows[-1])
+            sys.stdout.flush()
+        shutil.rmtree(serial_dir)
+    
+    df = pd.DataFrame(rows)
+    df.to_csv(os.path.join(working_dir, 'parallel.csv'), index=False)
+    print(df.to_string(index=False))
+    sys.exit(0)
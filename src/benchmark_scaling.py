@@ -0,0 +1,151 @@
+'''
+    MIT License
+    
+    Copyright (c) 2020 OpenSeesPro
+    
+    Permission is hereby granted, free of charge, to any person obtaining a copy
+    of this software and associated documentation files (the "Software"), to deal
+    in the Software without restriction, including without limitation the rights
+    to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+    copies of the Software, and to permit persons to whom the Software is
+    furnished to do so, subject to the following conditions:
+    
+    The above copyright notice and this permission notice shall be included in all
+    copies or substantial portions of the Software.
+    
+    THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+    IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+    FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+    AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+    LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+    OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+    SOFTWARE.
+
+    Developed by:
+        Ayush Singhania (ayushs@stanford.edu)
+        Pearl Ranchal (ranchal@berkeley.edu)
+      
+    Publication:
+        Goings, C. B., Singhania, A., Ranchal, P., Weaver B., 2020, “Industrial 
+        Scale NLRH Analysis Using OpenSees and Comparison with Perform3D,” 
+        Proceedings of 2020 SEAOC Virtual Convention, SEAOC, CA
+
+    
+    Description of the script - 
+        This is a supporting script to benchmark the scaling of every stage of
+        the library (hinge joint remap, model setup, eigen analysis, transient
+        analysis and post-processing) with the size of the model. Synthetic
+        buildings from model_generator are used so that ETABS is not needed.
+        The timings are saved to a csv file and the scaling curves are plotted
+        if matplotlib is available. Execute this script from the src directory.
+
+'''
+
+import os
+import sys
+import time
+import shutil
+import argparse
+import pandas as pd
+from model_generator import generate_etabs_tables, count_dofs
+from etabs_utilities import remap_hinge_joints, remap_frame_joints
+from model_data import ModelData
+from opensees_utilities import setup_opensees_model, modal_response, run_dynamic_analysis_w_rayleigh_damping, numEigen
+from opensees_postprocessor import hinge_analytics, base_shear
+
+# (stories, bays, frames) of the synthetic buildings, from ~1k to ~100k DOF
+BUILDING_SIZES = [(4, 3, 2), (8, 4, 3), (12, 5, 4), (20, 6, 5), (30, 7, 6), (40, 8, 6)]
+STAGES = ['remap', 'setup', 'eigen', 'transient', 'post-process']
+
+# number of transient steps timed for each building
+NUM_STEPS = 100
+TIME_STEP = 0.01
+
+# TIME ALL THE STAGES FOR ONE SYNTHETIC BUILDING
+def benchmark_building(num_stories, num_bays, num_frames, results_dir):
+    timings = {}
+    joints_df, frames_df, pts_loads_df, mass_df, frame_props_df = generate_etabs_tables(num_stories, num_bays, num_frames)
+    
+    start = time.perf_counter()
+    joints_df, dict_of_hinges, dict_of_hinges_1, list_new_joints = remap_hinge_joints(joints_df)
+    frames_df, dict_of_hinges_2 = remap_frame_joints(frames_df, dict_of_hinges_1)
+    model_data = ModelData.from_etabs_data(joints_df, pts_loads_df, frames_df, mass_df, frame_props_df, dict_of_hinges, dict_of_hinges_2)
+    timings['remap'] = time.perf_counter() - start
+    
+    start = time.perf_counter()
+    setup_opensees_model(model_data)
+    timings['setup'] = time.perf_counter() - start
+    
+    start = time.perf_counter()
+    eigenValues = modal_response(numEigen)
+    timings['eigen'] = time.perf_counter() - start
+    
+    # the eigenvalues are passed so the transient analysis does not repeat the eigen analysis
+    start = time.perf_counter()
+    run_dynamic_analysis_w_rayleigh_damping(model_data, 0.05, 'tangent', results_dir, 
+                                            total_run_time=(NUM_STEPS - 1) * TIME_STEP, time_step=TIME_STEP, 
+                                            eigenValues=eigenValues)
+    timings['transient'] = time.perf_counter() - start
+    
+    start = time.perf_counter()
+    hinge_analytics(model_data, 'tangent', results_dir)
+    base_shear(results_dir, model_data, 'tangent', time_step=TIME_STEP)
+    timings['post-process'] = time.perf_counter() - start
+    
+    return timings
+
+# PLOT THE TIME TAKEN BY EACH STAGE AGAINST THE NUMBER OF DOF
+def plot_scaling_curves(df, fpath):
+    try:
+        import matplotlib
+        matplotlib.use('Agg')
+        import matplotlib.pyplot as plt
+    except ImportError:
+        print('matplotlib is not available, skipping the scaling plot.')
+        return
+    
+    fig, ax = plt.subplots(figsize=(10, 6))
+    for stage in STAGES:
+        ax.loglog(df['DOF'], df[stage], marker='o', label=stage)
+    ax.set_xlabel('Number of DOF')
+    ax.set_ylabel('Time (s)')
+    ax.grid(True, which='both')
+    ax.set_axisbelow(True)
+    ax.legend()
+    fig.savefig(fpath, dpi=150, bbox_inches='tight')
+    plt.close(fig)
+    return
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the scaling of the library with the model size.')
+    parser.add_argument('--max-dof', type=int, default=110000, help='skip the buildings larger than this number of DOF')
+    args = parser.parse_args()
+    
+    working_dir = os.path.join(os.path.dirname(os.getcwd()), 'results', 'benchmark_scaling')
+    if not os.path.exists(working_dir):
+        os.makedirs(working_dir)
+    
+    rows = []
+    for num_stories, num_bays, num_frames in BUILDING_SIZES:
+        num_dofs = count_dofs(num_stories, num_bays, num_frames)
+        if num_dofs > args.max_dof:
+            continue
+        
+        print(''.center(100, '-'))
+        print(f':: {num_stories} STORIES x {num_bays} BAYS x {num_frames} FRAMES ({num_dofs} DOF) ::'.center(100))
+        print(''.center(100, '-'))
+        
+        # results of each building are written to a scratch directory that is removed after post-processing
+        results_dir = os.path.join(working_dir, f'{num_stories}x{num_bays}x{num_frames}')
+        os.makedirs(results_dir, exist_ok=True)
+        timings = benchmark_building(num_stories, num_bays, num_frames, results_dir)
+        shutil.rmtree(results_dir)
+        
+        rows.append({'Stories': num_stories, 'Bays': num_bays, 'Frames': num_frames, 'DOF': num_dofs, **timings})
+        print('\n' + '    '.join(f'{stage}: {timings[stage]:.2f} s' for stage in STAGES) + '\n')
+        sys.stdout.flush()
+    
+    df = pd.DataFrame(rows)
+    df.to_csv(os.path.join(working_dir, 'scaling.csv'), index=False)
+    plot_scaling_curves(df, os.path.join(working_dir, 'scaling.png'))
+    print(df.to_string(index=False))
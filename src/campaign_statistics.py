@@ -0,0 +1,313 @@
+'''
+    MIT License
+    
+    Copyright (c) 2020 OpenSeesPro
+    
+    Permission is hereby granted, free of charge, to any person obtaining a copy
+    of this software and associated documentation files (the "Software"), to deal
+    in the Software without restriction, including without limitation the rights
+    to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+    copies of the Software, and to permit persons to whom the Software is
+    furnished to do so, subject to the following conditions:
+    
+    The above copyright notice and this permission notice shall be included in all
+    copies or substantial portions of the Software.
+    
+    THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+    IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+    FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+    AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+    LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+    OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+    SOFTWARE.
+
+    Developed by:
+        Ayush Singhania (ayushs@stanford.edu)
+        Pearl Ranchal (ranchal@berkeley.edu)
+      
+    Publication:
+        Goings, C. B., Singhania, A., Ranchal, P., Weaver B., 2020, “Industrial 
+        Scale NLRH Analysis Using OpenSees and Comparison with Perform3D,” 
+        Proceedings of 2020 SEAOC Virtual Convention, SEAOC, CA
+
+    
+    Description of the script - 
+        This is a supporting script to compute statistics (mean, dispersion and
+        percentiles) of the response over all the runs of a campaign (a suite of
+        ground motions, an IDA or a Monte Carlo ensemble). The recorder output of
+        every run is converted once into binary arrays, which are memory mapped
+        and reduced in chunks with streaming statistics, so the runs are never
+        loaded in memory at the same time. The statistics of a campaign are
+        saved in one compact summary file.
+
+'''
+
+import os
+import sys
+import json
+import glob
+import argparse
+import numpy as np
+from opensees_postprocessor import read_story_drifts, read_base_shear, read_hinge_histories
+
+# quantities exported for each run, arrays of shape (number of steps, ...)
+#   drift               story drift ratios, shape (number of steps, number of floors, 2)
+#   base_shear          base shear Vx and Vy, shape (number of steps, 2)
+#   hinge_rotation      rotation of all the hinges, shape (number of steps, number of hinges)
+QUANTITIES = ['drift', 'base_shear', 'hinge_rotation']
+
+# quantities for which the statistics of the histories (aligned on a common time grid) are also computed
+TIME_QUANTITIES = ['drift', 'base_shear']
+
+PERCENTILES = [16, 50, 84]
+ARRAYS_DIR = 'arrays'
+META_FNAME = 'meta.json'
+SUMMARY_FNAME = 'campaign_summary.npz'
+
+# number of steps of a history that are read from the memory mapped arrays at once
+CHUNK_SIZE = 2000
+
+# CONVERT THE RECORDER OUTPUT OF A RUN INTO BINARY ARRAYS (PARSED ONCE, THEN MEMORY MAPPED BY THE STATISTICS)
+def export_run_arrays(model_data, initialOrTangent, dir_, time_step):
+    arrays_dir = os.path.join(dir_, ARRAYS_DIR)
+    os.makedirs(arrays_dir, exist_ok=True)
+    
+    arrays = {'drift': read_story_drifts(model_data, initialOrTangent, dir_),
+              'base_shear': read_base_shear(model_data, initialOrTangent, dir_),
+              'hinge_rotation': read_hinge_histories(initialOrTangent, dir_)[0].T,
+              }
+    
+    # all the quantities must have the same number of steps (the last line may be missing if the analysis was interrupted)
+    num_steps = min(len(array) for array in arrays.values())
+    for quantity, array in arrays.items():
+        np.save(os.path.join(arrays_dir, f'{quantity}.npy'), np.ascontiguousarray(array[:num_steps]))
+    
+    # the recorders write one line per step, the first line is at the end of the first step
+    with open(os.path.join(arrays_dir, META_FNAME), 'w') as f:
+        json.dump({'time_step': time_step, 'num_steps': num_steps, 'initialOrTangent': initialOrTangent}, f)
+    return arrays_dir
+
+# FIND THE RUNS (DIRECTORIES WITH EXPORTED ARRAYS) UNDER A DIRECTORY
+def find_runs(root_dir):
+    return sorted(os.path.dirname(os.path.dirname(fpath)) 
+                  for fpath in glob.glob(os.path.join(root_dir, '**', ARRAYS_DIR, META_FNAME), recursive=True))
+
+# OPEN THE ARRAYS OF A RUN AS READ ONLY MEMORY MAPS
+def open_run(run_dir):
+    arrays_dir = os.path.join(run_dir, ARRAYS_DIR)
+    with open(os.path.join(arrays_dir, META_FNAME)) as f:
+        meta = json.load(f)
+    arrays = {quantity: np.load(os.path.join(arrays_dir, f'{quantity}.npy'), mmap_mode='r') for quantity in QUANTITIES}
+    return meta, arrays
+
+# PEAK ABSOLUTE VALUE OF A HISTORY, READ IN CHUNKS OF STEPS
+def peak_of(history, chunk_size=CHUNK_SIZE):
+    peak = np.zeros(history.shape[1:])
+    for start in range(0, len(history), chunk_size):
+        np.maximum(peak, np.abs(history[start:start + chunk_size]).max(axis=0), out=peak)
+    return peak
+
+# HISTORY LINEARLY INTERPOLATED AT THE TIMES OF A GRID, RETURNS THE NUMBER OF GRID POINTS COVERED BY THE RUN AND THE VALUES
+def resample_chunk(history, time_step, grid):
+    # the value at the start of the analysis is zero and line k of the history is at time (k + 1) * time_step
+    position = grid / time_step - 1.0
+    covered = np.count_nonzero(position <= len(history) - 1)
+    position = position[:covered]
+    
+    i0 = np.clip(np.floor(position).astype(int), -1, len(history) - 1)
+    i1 = np.minimum(i0 + 1, len(history) - 1)
+    weight = (position - i0).reshape((-1,) + (1,) * (history.ndim - 1))
+    
+    # only the rows needed by this chunk are read from the memory map
+    rows = np.unique(np.concatenate([i0[i0 >= 0], i1]))
+    values = np.asarray(history[rows])
+    lookup = np.searchsorted(rows, np.maximum(i0, 0))
+    v0 = np.where((i0 >= 0).reshape(weight.shape), values[lookup], 0.0)
+    v1 = values[np.searchsorted(rows, i1)]
+    return covered, v0 + (v1 - v0) * weight
+
+# STREAMING MEAN AND VARIANCE (WELFORD), ONE SAMPLE PER RUN, ELEMENT WISE
+class RunningStats:
+    def __init__(self, shape):
+        self.count = np.zeros(shape[:1], dtype=np.int64)
+        self.mean = np.zeros(shape)
+        self.m2 = np.zeros(shape)
+    
+    # add the sample of a run to the rows [start, start + len(values))
+    def update(self, values, start=0):
+        rows = slice(start, start + len(values))
+        self.count[rows] += 1
+        count = self.count[rows].reshape((-1,) + (1,) * (values.ndim - 1))
+        delta = values - self.mean[rows]
+        self.mean[rows] += delta / count
+        self.m2[rows] += delta * (values - self.mean[rows])
+        return
+    
+    @property
+    def std(self):
+        count = self.count.reshape((-1,) + (1,) * (self.m2.ndim - 1))
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.sqrt(np.where(count > 1, self.m2 / (count - 1), np.nan))
+
+# STREAMING QUANTILES OF NON NEGATIVE VALUES, ELEMENT WISE (LOGARITHMIC BINS WITH A BOUNDED RELATIVE ERROR)
+class QuantileSketch:
+    """
+    Each positive value falls in a bin [gamma^(i-1), gamma^i), and the quantile is reported as the representative value of 
+    the bin, so the relative error of any quantile is below relative_accuracy. The zeros (and negative values) are counted 
+    apart and reported as 0, the NaN are ignored.
+    
+    The range of the bins is set from the first run (span decades on each side) and extended when a later value falls 
+    outside of it. The counts are an int32 array of (number of elements x number of bins) with about 
+    ln(10) / ln(gamma) bins per decade (115 for 1 %), i.e. about 4 * number of elements * 115 bytes per decade. The range 
+    is limited to max_decades, the values beyond it are counted in the first/last bin and reported in num_clipped.
+    """
+    def __init__(self, shape, relative_accuracy=0.01, span=4, max_decades=16):
+        self.shape = tuple(shape)
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.span = span
+        self.max_bins = int(np.ceil(max_decades * np.log(10) / np.log(self.gamma)))
+        self.counts = None
+        self.zeros = np.zeros(int(np.prod(self.shape)), dtype=np.int32)
+        self.num_clipped = 0
+    
+    # index of the bin of each value (not offset)
+    def index_of(self, values):
+        return np.ceil(np.log(values) / np.log(self.gamma)).astype(np.int64)
+    
+    # extend the bins to [lo, hi] (within max_bins of the current bins)
+    def extend(self, lo, hi):
+        cur_lo, cur_hi = self.offset, self.offset + self.num_bins - 1
+        new_lo = max(min(lo, cur_lo), cur_hi - self.max_bins + 1)
+        new_hi = min(max(hi, cur_hi), new_lo + self.max_bins - 1)
+        if (new_lo, new_hi) != (cur_lo, cur_hi):
+            self.counts = np.pad(self.counts, ((0, 0), (cur_lo - new_lo, new_hi - cur_hi)))
+            self.offset, self.num_bins = new_lo, new_hi - new_lo + 1
+        return
+    
+    def update(self, values):
+        values = np.asarray(values, dtype=float).reshape(-1)
+        positive = values > 0
+        self.zeros += values <= 0
+        elements = np.flatnonzero(positive)
+        index = self.index_of(values[elements])
+        
+        if self.counts is None:
+            lo, hi = (index.min(), index.max()) if len(index) else (0, 0)
+            pad = int(np.ceil(self.span * np.log(10) / np.log(self.gamma)))
+            pad = max(min(pad, (self.max_bins - (hi - lo + 1)) // 2), 0)
+            self.offset = int(lo) - pad
+            self.num_bins = min(int(hi - lo) + 1 + 2 * pad, self.max_bins)
+            self.counts = np.zeros((values.size, self.num_bins), dtype=np.int32)
+        elif len(index):
+            self.extend(index.min(), index.max())
+        
+        # values beyond the largest range allowed are counted in the first/last bin
+        index -= self.offset
+        clipped = np.count_nonzero((index < 0) | (index >= self.num_bins))
+        if clipped:
+            self.num_clipped += clipped
+            print(f'QuantileSketch: {clipped} values outside of the range of the bins '
+                  f'[{self.gamma**self.offset:.3g}, {self.gamma**(self.offset + self.num_bins - 1):.3g}] were clipped')
+            index = np.clip(index, 0, self.num_bins - 1)
+        
+        # flat index of the (element, bin) counter of each value
+        flat = elements * self.num_bins + index
+        self.counts.reshape(-1)[flat] += 1
+        return
+    
+    # quantile q of each element, NaN for the elements without any value (all of them before the first update)
+    def quantile(self, q):
+        if self.counts is None:
+            return np.full(self.shape, np.nan)
+        cumulative = self.zeros[:, None] + np.cumsum(self.counts, axis=1)
+        target = q * cumulative[:, -1:]
+        index = np.argmax(cumulative >= np.maximum(target, 1), axis=1) + self.offset
+        values = 2 * self.gamma**index / (self.gamma + 1)
+        
+        # the quantile is 0 while the zeros reach the target
+        values[self.zeros >= np.maximum(target[:, 0], 1)] = 0.0
+        values[cumulative[:, -1] == 0] = np.nan
+        return values.reshape(self.shape)
+
+# COMPUTE THE STATISTICS OF THE RESPONSE OVER ALL THE RUNS OF A CAMPAIGN AND SAVE THEM IN A SUMMARY FILE
+def summarize_campaign(run_dirs, summary_fpath=None, grid_time_step=None, chunk_size=CHUNK_SIZE, relative_accuracy=0.01):
+    """
+    run_dirs            directories of the runs (each with the arrays written by export_run_arrays), see find_runs
+    summary_fpath       file where the summary is saved (.npz), not saved if None
+    grid_time_step      time step of the common time grid of the histories (the time step of the first run by default)
+    
+    The peak of each quantity (e.g. the drift of each story) is computed for every run, these peaks are reduced to the 
+    mean, standard deviation, dispersion (standard deviation of the log) and percentiles over all the runs. The histories 
+    of the TIME_QUANTITIES are resampled on a common time grid and reduced to their mean and standard deviation at each 
+    time, the runs that are shorter than the grid only contribute to the beginning of the grid.
+    """
+    run_dirs = list(run_dirs)
+    if not run_dirs:
+        raise ValueError('no runs to summarize')
+    metas = [open_run(run_dir)[0] for run_dir in run_dirs]
+    if grid_time_step is None:
+        grid_time_step = metas[0]['time_step']
+    grid = grid_time_step * np.arange(1, int(round(max(m['time_step'] * m['num_steps'] for m in metas) / grid_time_step)) + 1)
+    
+    peak_stats, log_peak_stats, sketches, time_stats = {}, {}, {}, {}
+    for run_dir in run_dirs:
+        meta, arrays = open_run(run_dir)
+        
+        for quantity in QUANTITIES:
+            history = arrays[quantity]
+            peak = peak_of(history, chunk_size)
+            if quantity not in peak_stats:
+                peak_stats[quantity] = RunningStats((1,) + peak.shape)
+                log_peak_stats[quantity] = RunningStats((1,) + peak.shape)
+                sketches[quantity] = QuantileSketch(peak.shape, relative_accuracy)
+            peak_stats[quantity].update(peak[None])
+            log_peak_stats[quantity].update(np.log(np.maximum(peak, np.finfo(float).tiny))[None])
+            sketches[quantity].update(peak)
+            
+            if quantity in TIME_QUANTITIES:
+                if quantity not in time_stats:
+                    time_stats[quantity] = RunningStats(grid.shape + history.shape[1:])
+                for start in range(0, len(grid), chunk_size):
+                    covered, values = resample_chunk(history, meta['time_step'], grid[start:start + chunk_size])
+                    if covered == 0:
+                        break
+                    time_stats[quantity].update(values, start)
+        
+        # release the memory maps of the run before opening the next one
+        del arrays
+    
+    summary = {'runs': np.array(run_dirs), 'num_runs': np.array(len(run_dirs)), 'time': grid}
+    for quantity in QUANTITIES:
+        summary[f'{quantity}/peak_mean'] = peak_stats[quantity].mean[0]
+        summary[f'{quantity}/peak_std'] = peak_stats[quantity].std[0]
+        summary[f'{quantity}/peak_dispersion'] = log_peak_stats[quantity].std[0]
+        for p in PERCENTILES:
+            summary[f'{quantity}/peak_p{p}'] = sketches[quantity].quantile(p / 100)
+        summary[f'{quantity}/peak_num_clipped'] = np.array(sketches[quantity].num_clipped)
+        if quantity in TIME_QUANTITIES:
+            summary[f'{quantity}/time_mean'] = time_stats[quantity].mean
+            summary[f'{quantity}/time_std'] = time_stats[quantity].std
+            summary[f'{quantity}/time_count'] = time_stats[quantity].count
+    
+    if summary_fpath is not None:
+        np.savez_compressed(summary_fpath, **summary)
+    return summary
+
+# LOAD THE SUMMARY OF A CAMPAIGN
+def load_summary(summary_fpath):
+    with np.load(summary_fpath) as data:
+        return {key: data[key] for key in data.files}
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Statistics of the response over all the runs of a campaign.')
+    parser.add_argument('root_dir', help='directory searched for runs with exported arrays (e.g. the results of a queue)')
+    parser.add_argument('--output', default=None, help=f'summary file (default: <root_dir>/{SUMMARY_FNAME})')
+    parser.add_argument('--time-step', type=float, default=None, help='time step of the common time grid')
+    args = parser.parse_args()
+    
+    run_dirs = find_runs(args.root_dir)
+    summary = summarize_campaign(run_dirs, args.output or os.path.join(args.root_dir, SUMMARY_FNAME), args.time_step)
+    print(f'{len(run_dirs)} runs summarized')
+    for p in PERCENTILES:
+        print(f'P{p} peak drift:\n{summary[f"drift/peak_p{p}"]}')
+    sys.exit(0)
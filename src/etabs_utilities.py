@@ -39,6 +39,7 @@
 import pandas as pd
 import math
 from general_utilities import get_database_table_for_all_load_cases_and_combos as get_dbtable, get_model_from_etabs
+from model_data import ModelData
 
 # DEFINE DATAFRAME COLUMNS
 JOINT_DATA_COLS = ['UniqueName', 'X', 'Y', 'Z']
@@ -60,6 +61,11 @@ def get_joints(model=None):
     # extract the point object restraints from etabs
     joints_df['Restraints'] = joints_df.apply(lambda row: model.PointObj.GetRestraint(row.UniqueName)[0], axis='columns')
     
+    return remap_hinge_joints(joints_df)
+
+# RENAME THE DUMMY HINGE JOINTS (PREFIX "N") TO NEW NUMERICAL JOINTS AT THE LOCATION OF THE REAL JOINT
+def remap_hinge_joints(joints_df):
+    
     # get the maximum numberical joint ID, this is required to name various new objects while modeling nonlinearity in OpenSees 
     max_jointID = max(joints_df[joints_df.UniqueName.str.isdigit()].UniqueName.astype('int').tolist())
     constant_joint = 10**(int(math.log10(max_jointID))+2)
@@ -103,7 +109,7 @@ def get_joints(model=None):
 # EXTRACT NODAL LOADS FROM ETABS
 def get_pt_loads(model=None):
     if model is None:
-        model = get_model_from_etabs(True)
+        model = get_model_from_etabs()
     
     joints_df, dict_of_hinges, dict_of_hinges_1, list_new_joints = get_joints(model)
     
@@ -128,7 +134,7 @@ def get_pt_loads(model=None):
 # EXTRACT FRAME CONNECTIVITY FROM ETABS
 def get_frames(dict_of_hinges_1, model=None):
     if model is None:
-        model = get_model_from_etabs(True)
+        model = get_model_from_etabs()
     
     # Extract all frame labels from etabs
     frame_label_data = model.FrameObj.GetLabelNameList()
@@ -139,6 +145,11 @@ def get_frames(dict_of_hinges_1, model=None):
     frames_df = pd.DataFrame.from_dict({col:val for (col,val) in zip(FRAME_DATA_COLS, frame_data [1:-1])})
     frames_df['Label'] = frames_df['UniqueName'].replace(frame_labels_df.set_index('UniqueName')['Label'])
     
+    return remap_frame_joints(frames_df, dict_of_hinges_1)
+
+# RENAME THE FRAME END JOINTS THAT WERE RENAMED BY remap_hinge_joints
+def remap_frame_joints(frames_df, dict_of_hinges_1):
+    
     # Dictionary to get NL properties for the zero length element
     dict_of_hinges_2 = {}
     
@@ -162,18 +173,16 @@ def get_frames(dict_of_hinges_1, model=None):
 # EXTRACT NODAL MASSES FROM ETABS
 def get_nodal_masses(model=None):
     if model is None:
-        model = get_model_from_etabs(True)
+        model = get_model_from_etabs()
     
     # extract the assembled joint masses from etabs using the get_dbtable method
     mass_df = get_dbtable('Assembled Joint Masses', model)
-    mass_df = mass_df.astype({'PointElm': int  , 'UX' : float, 'UY' : float, 'UZ' : float, 'RX' : float, 
-                              'RY'      : float, 'RZ' : float, 'X'  : float, 'Y'  : float, 'Z'  : float})
     return mass_df.copy()
 
 # EXTRACT FRAME SECTION PROPERTIES FROM ETABS
 def get_frame_props(dict_of_hinges_1, model=None):
     if model is None:
-        model = get_model_from_etabs(True)
+        model = get_model_from_etabs()
     
     frames_df, dict_of_hinges_2 = get_frames(dict_of_hinges_1, model)
     
@@ -196,8 +205,6 @@ def get_frame_props(dict_of_hinges_1, model=None):
 # EXTRACT FRAME SECTION PROPERTIES FROM ETBAS
 def get_frame_props_from_db_table(model=None):
     
-    FLOAT_COLS = ['Area', 'As2', 'As3', 'J', 'I22', 'I33', 'S22Pos', 'S33Pos', 'Z22', 'Z33', 'R22', 'R33', 'I3Mod']
-    
     if model is None:
         model = get_model_from_etabs()
         
@@ -205,31 +212,16 @@ def get_frame_props_from_db_table(model=None):
     frame_props_df = get_dbtable('Frame Section Property Definitions - Summary', model)[FRAME_PROP_COLS]
     
     # update the properties as per modifiers defined in ETABS
-    frame_props_df['I33'] = frame_props_df['I33'].astype(float) * frame_props_df ['I3Mod'].astype(float)
+    frame_props_df['I33'] = frame_props_df['I33'] * frame_props_df ['I3Mod']
     frame_props_df.set_index('Name', inplace=True)
-    frame_props_df = frame_props_df.astype({col:'float' for col in FLOAT_COLS})
     return frame_props_df.copy()
 
-# GET JOINTS WHERE REACTION NEEDS TO BE RECORDED AND WHERE DISPLACEMENT NEEDS TO BE RECORDED
-def get_node_dicts(joints_df):
-    
-    # joints not on the lowest level are diaplcement nodes
-    disp_joints_df = joints_df[joints_df.Z != joints_df.Z.min()].copy()
-    
-    # all joints at the lowest level are reaction nodes
-    rxn_joints_df = joints_df[joints_df.Z == joints_df.Z.min()].copy()
-    
-    dict_of_disp_nodes = disp_joints_df[['UniqueName','X','Y','Z']].set_index('UniqueName').T.to_dict()
-    dict_of_rxn_nodes = rxn_joints_df [['UniqueName','X','Y','Z']].set_index('UniqueName').T.to_dict()
-    
-    return dict_of_disp_nodes, dict_of_rxn_nodes
-
 # EXTRACT MODAL ANALYSIS RESULTS FROM ETABS
 def get_modal_results_from_etabs(model):
     
     # extract the Modal Participating Mass Ratio table from etabs using the get_dbtable method
     df = get_dbtable('Modal Participating Mass Ratios', model)
-    etabs_periods = [round(n, 3) for n in df.Period.astype(float).tolist()[:4]]
+    etabs_periods = [round(n, 3) for n in df.Period.tolist()[:4]]
     return etabs_periods
 
 # MAIN FUNCTION TO OBTAIN ALL REQUIRED DATA FROM ETABS TO CREATE A OPENSEES MODEL
@@ -241,11 +233,11 @@ def get_etabs_data(model=None, units=None):
     
     # call different methods written above to extract and process data from ETABS
     joints_df, dict_of_hinges, dict_of_hinges_1, list_new_joints = get_joints(model)
-    dict_of_disp_nodes, dict_of_rxn_nodes = get_node_dicts(joints_df.copy())
     pt_loads_df = get_pt_loads(model)
     frames_df, dict_of_hinges_2 = get_frames(dict_of_hinges_1, model)
     mass_df = get_nodal_masses(model)
     frame_props_df = get_frame_props_from_db_table(model)
     etabs_periods = get_modal_results_from_etabs(model)
     
-    return joints_df, pt_loads_df, frames_df, mass_df, frame_props_df, dict_of_hinges, dict_of_hinges_2, list_new_joints, dict_of_disp_nodes, dict_of_rxn_nodes, etabs_periods
+    # collect all the data in a compact container, the displacement and reaction nodes are identified by the container
+    return ModelData.from_etabs_data(joints_df, pt_loads_df, frames_df, mass_df, frame_props_df, dict_of_hinges, dict_of_hinges_2, etabs_periods)
@@ -37,13 +37,16 @@
 
 '''
 
-import comtypes.client
 import sys
 import time
+import pickle
 import pandas as pd
 import numpy as np
 
 def get_model_from_etabs():
+    # comtypes is only available (and only needed) on a machine running ETABS, import it on first use
+    import comtypes.client
+    
     try:
         # attach to a running instance of ETABS
         etabs = comtypes.client.GetActiveObject('CSI.ETABS.API.ETABSObject')
@@ -52,23 +55,31 @@ def get_model_from_etabs():
         sys.exit(-1)
     return etabs.SapModel
 
-def set_load_cases_selected_for_display(loadCaseList, model = get_model_from_etabs()):
+def set_load_cases_selected_for_display(loadCaseList, model=None):
+    if model is None:
+        model = get_model_from_etabs()
     return model.DatabaseTables.SetLoadCasesSelectedForDisplay(loadCaseList)
 
-def set_load_combo_selected_for_display(loadComboList, model = get_model_from_etabs()):
+def set_load_combo_selected_for_display(loadComboList, model=None):
+    if model is None:
+        model = get_model_from_etabs()
     return model.DatabaseTables.SetLoadCombinationsSelectedForDisplay(loadComboList)
 
-def set_load_patterns_selected_for_display(loadPatternList, model = get_model_from_etabs()):
+def set_load_patterns_selected_for_display(loadPatternList, model=None):
+    if model is None:
+        model = get_model_from_etabs()
     return model.DatabaseTables.SetLoadPatternsSelectedForDisplay(loadPatternList)
 
-def deselect_all_load_cases_and_combos_for_output(model = get_model_from_etabs()):
+def deselect_all_load_cases_and_combos_for_output(model=None):
+    if model is None:
+        model = get_model_from_etabs()
     return [bool(~set_load_cases_selected_for_display('', model)[-1]), 
             bool(~set_load_combo_selected_for_display('', model)[-1]),]
 
-def get_database_table_for_all_load_cases_and_combos(table_title, model=None):
+def get_database_table_for_all_load_cases_and_combos(table_title, model=None, schema=None):
     # connect to ETABS model
     if model is None:
-        model = get_model_from_etabs(True)
+        model = get_model_from_etabs()
     
     # set units to kip, in (default for OpenSees)
     model.SetPresentUnits(3)
@@ -91,16 +102,66 @@ def get_database_table_for_all_load_cases_and_combos(table_title, model=None):
     # get table from API
     ret = model.DatabaseTables.GetTableForDisplayArray(table_title, '', '')
     
-    # develop DataFrame
-    headers = list(ret[2])
-    data = np.array(ret[4])
-    data = data.reshape(len(data)//len(headers), len(headers))
-    df = pd.DataFrame(data)
+    # develop DataFrame with only the columns (and types) registered for this table
+    if schema is None:
+        schema = TABLE_SCHEMAS.get(table_title)
+    return parse_database_table(ret[2], ret[4], schema, table_title)
+
+# COLUMNS KEPT FROM EACH ETABS DATABASE TABLE AND THEIR TYPES, THE REMAINING COLUMNS ARE DROPPED BEFORE THE DATAFRAME IS 
+# BUILT. TABLES WHICH ARE NOT REGISTERED ARE RETURNED WITH ALL THEIR COLUMNS AS STRINGS
+TABLE_SCHEMAS = {
+    'Point Object Connectivity'                    : {'UniqueName': object, 'Story': object, 'IsAuto': object, 
+                                                      'X': float, 'Y': float, 'Z': float},
+    'Assembled Joint Masses'                       : {'Story': object, 'PointElm': int, 
+                                                      'UX': float, 'UY': float, 'UZ': float, 'RX': float, 'RY': float, 'RZ': float,
+                                                      'X': float, 'Y': float, 'Z': float},
+    'Frame Section Property Definitions - Summary' : {'Name': object, 'Material': object, 'Shape': object, 
+                                                      'Area': float, 'As2': float, 'As3': float, 'J': float, 'I22': float, 
+                                                      'I33': float, 'S22Pos': float, 'S33Pos': float, 'Z22': float, 'Z33': float,
+                                                      'R22': float, 'R33': float, 'I3Mod': float},
+    'Modal Participating Mass Ratios'              : {'Case': object, 'Mode': int, 'Period': float},
+}
+
+# PARSE THE FLAT ARRAY RETURNED BY GetTableForDisplayArray (ROW AFTER ROW) INTO A DATAFRAME OF TYPED COLUMNS
+def parse_database_table(headers, data, schema=None, table_title=None):
+    """
+    headers     field keys of the table
+    data        flat sequence of strings, len(headers) values per row
+    schema      dict of column name to type (object, int or float) of the columns to keep, all columns as strings if None
+    table_title name of the table, used in the error messages
+    """
+    headers = list(headers)
+    num_cols = len(headers)
+    if schema is None:
+        schema = {header: object for header in headers}
     
-    cols_dict = dict(zip(df.columns.tolist(), headers))
-    df.rename(cols_dict, axis = 'columns', inplace = True)
+    missing = [col for col in schema if col not in headers]
+    if missing:
+        raise KeyError(f'Columns {missing} not found in the database table {table_title!r}, available columns are {headers}')
     
-    return df.copy()
+    # each column is a strided slice of the flat data, so the full table is never copied into a 2D array of strings
+    columns = {col: parse_database_column(data[headers.index(col)::num_cols], dtype, col, table_title) 
+               for (col, dtype) in schema.items()}
+    return pd.DataFrame(columns)
+
+# CONVERT THE STRINGS OF ONE DATABASE TABLE COLUMN TO THE GIVEN TYPE
+def parse_database_column(values, dtype, column=None, table_title=None):
+    if dtype is object:
+        return pd.Series(values, dtype=object)
+    try:
+        return np.array(values, dtype=dtype)
+    except ValueError:
+        # empty cells (NaN) or integers written with a decimal point
+        floats = pd.to_numeric(pd.Series(values, dtype=object), errors='coerce').to_numpy(dtype=float)
+        if dtype is float:
+            return floats
+        
+        # an integer column cannot hold NaN (it would be cast to a meaningless integer), nor fractional values
+        invalid = np.flatnonzero(np.isnan(floats) | (floats != np.round(floats)))
+        if len(invalid):
+            raise ValueError(f'Column {column!r} of the database table {table_title!r} should only contain integers but '
+                             f'{len(invalid)} cells are empty or not integers (e.g. row {invalid[0]}: {values[invalid[0]]!r})')
+        return floats.astype(dtype)
 
 def start_time():
     print('Started at: ' + time.strftime('%a, %d %b %Y %H:%M:%S PST', time.localtime()))
@@ -112,4 +173,16 @@ def end_time(start_time, final=True):
     print(f'\nTime Elapsed: {mins} minute(s) {secs} second(s).\n')
     if final:
         print('Finished at: ' + time.strftime('%a, %d %b %Y %H:%M:%S PST', time.localtime()))
-    return
\ No newline at end of file
+    return
+
+# SAVE THE DATA EXTRACTED FROM ETABS SO THAT THE OPENSEES MODEL CAN BE BUILT WITHOUT ETABS
+def save_model_snapshot(fpath, etabs_data):
+    with open(fpath, 'wb') as f:
+        pickle.dump(etabs_data, f, protocol=pickle.HIGHEST_PROTOCOL)
+    return
+
+# LOAD THE DATA SAVED USING save_model_snapshot
+def load_model_snapshot(fpath):
+    with open(fpath, 'rb') as f:
+        etabs_data = pickle.load(f)
+    return etabs_data
@@ -0,0 +1,271 @@
+'''
+    MIT License
+    
+    Copyright (c) 2020 OpenSeesPro
+    
+    Permission is hereby granted, free of charge, to any person obtaining a copy
+    of this software and associated documentation files (the "Software"), to deal
+    in the Software without restriction, including without limitation the rights
+    to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+    copies of the Software, and to permit persons to whom the Software is
+    furnished to do so, subject to the following conditions:
+    
+    The above copyright notice and this permission notice shall be included in all
+    copies or substantial portions of the Software.
+    
+    THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+    IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+    FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+    AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+    LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+    OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+    SOFTWARE.
+
+    Developed by:
+        Ayush Singhania (ayushs@stanford.edu)
+        Pearl Ranchal (ranchal@berkeley.edu)
+      
+    Publication:
+        Goings, C. B., Singhania, A., Ranchal, P., Weaver B., 2020, “Industrial 
+        Scale NLRH Analysis Using OpenSees and Comparison with Perform3D,” 
+        Proceedings of 2020 SEAOC Virtual Convention, SEAOC, CA
+
+    
+    Description of the script - 
+        This is a supporting script to run a Monte Carlo ensemble of response
+        history analyses with uncertain moment hinge parameters (My, theta_p, 
+        theta_pc and the residual strength ratio). The parameters are sampled 
+        from configurable distributions around the values obtained from the NL
+        Properties Summary worksheet. Each worker of the pool builds the elastic
+        frame model once and only replaces the hinge materials of every
+        realization, so the cost of a realization is the transient run alone
+        (the model is rebuilt every REBUILD_INTERVAL realizations to drop the 
+        materials of the previous realizations). Realizations which do not 
+        converge are reported and excluded from the statistics.
+
+'''
+
+import os
+import sys
+import argparse
+import shutil
+import tempfile
+import multiprocessing
+import numpy as np
+import pandas as pd
+import opensees_utilities as osu
+from analysis_metrics import register_run, start_metrics_server
+from opensees_postprocessor import read_hinge_histories, read_base_shear
+
+# groups of Bilin parameters that are sampled together (the same factor is applied to both loading directions)
+PARAM_GROUPS = {'My'      : ['My_Plus', 'My_Neg'],
+                'theta_p' : ['theta_p_Plus', 'theta_p_Neg'],
+                'theta_pc': ['theta_pc_Plus', 'theta_pc_Neg'],
+                'Res'     : ['Res_Pos', 'Res_Neg'],
+                }
+
+# distribution of the factor applied to the deterministic value of each group of parameters
+#   lognormal       median of 1.0 and a logarithmic standard deviation of 'dispersion'
+#   normal          mean of 1.0 and a coefficient of variation of 'cov'
+#   uniform         uniform between 1.0 - 'range' and 1.0 + 'range'
+DEFAULT_DISTRIBUTIONS = {'My'      : {'dist': 'lognormal', 'dispersion': 0.10},
+                         'theta_p' : {'dist': 'lognormal', 'dispersion': 0.35},
+                         'theta_pc': {'dist': 'lognormal', 'dispersion': 0.35},
+                         'Res'     : {'dist': 'lognormal', 'dispersion': 0.20},
+                         }
+
+# percentiles reported by the ensemble statistics
+PERCENTILES = [16, 50, 84]
+
+# opensees cannot remove a uniaxial material, so every realization adds one material per hinge to the domain of the worker,
+# the domain is rebuilt after this number of realizations to bound the memory of the workers
+REBUILD_INTERVAL = 50
+
+# SAMPLE THE FACTORS OF A DISTRIBUTION, SHAPE (NUMBER OF REALIZATIONS, NUMBER OF HINGES)
+def sample_factors(rng, distribution, shape):
+    if distribution['dist'] == 'lognormal':
+        return np.exp(rng.normal(0.0, distribution['dispersion'], shape))
+    elif distribution['dist'] == 'normal':
+        return np.maximum(rng.normal(1.0, distribution['cov'], shape), 0.0)
+    elif distribution['dist'] == 'uniform':
+        return rng.uniform(1.0 - distribution['range'], 1.0 + distribution['range'], shape)
+    raise ValueError(f'Unknown distribution: {distribution["dist"]}')
+
+# SAMPLE THE BILIN PARAMETERS OF ALL THE HINGES FOR A NUMBER OF REALIZATIONS
+def sample_hinge_params(base_params, num_realizations, distributions=DEFAULT_DISTRIBUTIONS, rng=None, hinge_codes=None):
+    """
+    base_params         deterministic parameters of each hinge, shape (number of hinges, number of Bilin parameters)
+    num_realizations    number of realizations to sample
+    distributions       distribution of the factor of each group of parameters (see DEFAULT_DISTRIBUTIONS)
+    rng                 numpy random Generator (or seed)
+    hinge_codes         if provided (e.g. model_data.hinges['hinge']), one factor is sampled per hinge name and shared by all 
+                        the hinges with that name, otherwise every hinge is sampled independently
+    
+    returns an array of shape (number of realizations, number of hinges, number of Bilin parameters)
+    """
+    rng = np.random.default_rng(rng)
+    num_hinges = base_params.shape[0]
+    params = np.repeat(base_params[None, :, :], num_realizations, axis=0)
+    
+    for group, distribution in distributions.items():
+        if hinge_codes is None:
+            factors = sample_factors(rng, distribution, (num_realizations, num_hinges))
+        else:
+            factors = sample_factors(rng, distribution, (num_realizations, hinge_codes.max() + 1))[:, hinge_codes]
+        cols = [osu.BILIN_PARAMS.index(param) for param in PARAM_GROUPS[group]]
+        params[:, :, cols] *= factors[:, :, None]
+    
+    # the residual strength ratio must remain between 0 and 1
+    res_cols = [osu.BILIN_PARAMS.index(param) for param in PARAM_GROUPS['Res']]
+    params[:, :, res_cols] = np.clip(params[:, :, res_cols], 0.0, 1.0)
+    return params
+
+# STATE OF A WORKER OF THE POOL (THE OPENSEES MODEL LIVES IN THE WORKER PROCESS)
+_worker = {}
+
+# BUILD THE FRAME MODEL OF A WORKER (WITH THE DETERMINISTIC HINGES)
+def build_worker_model(model_data, base_params):
+    osu.initiate_model()
+    osu.add_nodes(model_data)
+    osu.add_frames(model_data)
+    osu.add_hinge_constraints(model_data)
+    osu.add_hinge_elements(model_data, base_params)
+    
+    # the materials of the realizations are numbered from the largest tag in use
+    _worker['next_mat_tag'] = int(model_data.hinges['ele'].max()) + 1
+    _worker['num_since_build'] = 0
+    return
+
+# BUILD THE FRAME MODEL ONCE IN EACH WORKER OF THE POOL
+def init_worker(model_data, base_params, config):
+    build_worker_model(model_data, base_params)
+    
+    # the elastic stiffness of the hinges is not sampled, so the eigenvalues are the same for all the realizations
+    _worker['eigenValues'] = osu.modal_response(osu.numEigen)
+    _worker['model_data'] = model_data
+    _worker['base_params'] = base_params
+    _worker['config'] = config
+    
+    # each worker serves its progress on the first free port from metrics_port
+    if config['metrics_port'] is not None:
+        start_metrics_server(config['metrics_port'])
+    
+    # the recorders write to the current directory, which is private to this worker
+    _worker['work_dir'] = tempfile.mkdtemp(prefix='worker_', dir=config['scratch_dir'])
+    os.chdir(_worker['work_dir'])
+    return
+
+# RUN ONE REALIZATION IN A WORKER AND RETURN ITS RESPONSE
+def run_realization(realization):
+    model_data, config = _worker['model_data'], _worker['config']
+    
+    # each realization has its own random stream, so the results do not depend on how the realizations are scheduled
+    rng = np.random.default_rng([config['seed'], realization])
+    hinge_codes = model_data.hinges['hinge'] if config['per_hinge_name'] else None
+    params = sample_hinge_params(_worker['base_params'], 1, config['distributions'], rng, hinge_codes)[0]
+    
+    # drop the materials of the previous realizations every rebuild_interval realizations
+    if _worker['num_since_build'] >= config['rebuild_interval']:
+        build_worker_model(model_data, _worker['base_params'])
+    _worker['num_since_build'] += 1
+    
+    # new materials for the hinges (opensees cannot redefine a material with an existing tag)
+    mat_tags = np.arange(_worker['next_mat_tag'], _worker['next_mat_tag'] + len(params))
+    _worker['next_mat_tag'] += len(params)
+    osu.replace_hinge_materials(model_data, params, mat_tags)
+    
+    results_dir = os.path.join(_worker['work_dir'], f'realization_{realization}')
+    os.makedirs(results_dir)
+    _, _, status = osu.run_dynamic_analysis_w_rayleigh_damping(model_data, config['zeta'], config['initialOrTangent'], 
+                                                               results_dir, config['total_run_time'], config['time_step'], 
+                                                               config['record_file'], config['scale_factor'], 
+                                                               eigenValues=_worker['eigenValues'], wipe_model=False, 
+                                                               metrics=register_run(f'realization_{realization}'))
+    
+    # the peaks of a realization that did not converge are only those of the truncated histories
+    rotations, moments = read_hinge_histories(config['initialOrTangent'], results_dir)
+    shear = read_base_shear(model_data, config['initialOrTangent'], results_dir)
+    response = {'realization': realization,
+                'failed': status['failed'],
+                'time': status['time'],
+                'peak_rotation': np.abs(rotations).max(axis=1),
+                'peak_base_shear': np.abs(shear).max(axis=0)}
+    shutil.rmtree(results_dir)
+    return response
+
+# STATISTICS (MEAN, DISPERSION AND PERCENTILES) OF A STACK OF RESPONSES, SHAPE (NUMBER OF REALIZATIONS, ...)
+def response_statistics(values, index):
+    
+    # the dispersion (standard deviation of the logarithm) is computed from the positive values only, NaN if there are none
+    positive = values > 0
+    num_positive = positive.sum(axis=0)
+    log_values = np.log(np.where(positive, values, 1.0))
+    mean_log = (log_values * positive).sum(axis=0) / np.maximum(num_positive, 1)
+    dispersion = np.sqrt((((log_values - mean_log) * positive)**2).sum(axis=0) / np.maximum(num_positive, 1))
+    
+    df = pd.DataFrame({'Mean': values.mean(axis=0), 'Std': values.std(axis=0), 
+                       'Dispersion': np.where(num_positive > 0, dispersion, np.nan)}, index=index)
+    for p, vals in zip(PERCENTILES, np.percentile(values, PERCENTILES, axis=0)):
+        df[f'P{p}'] = vals
+    return df
+
+# RUN THE ENSEMBLE OF REALIZATIONS ON A POOL OF WORKERS AND AGGREGATE THE RESPONSE STATISTICS
+def run_ensemble(model_data, num_realizations, distributions=DEFAULT_DISTRIBUTIONS, zeta=0.05, initialOrTangent='tangent', 
+                 record_file='BM68elc.acc', scale_factor=3.0, total_run_time=50, time_step=0.01, num_workers=None, seed=0, 
+                 per_hinge_name=False, metrics_port=None, rebuild_interval=REBUILD_INTERVAL):
+    
+    config = {'distributions': distributions, 'zeta': zeta, 'initialOrTangent': initialOrTangent, 
+              'record_file': os.path.abspath(record_file), 'scale_factor': scale_factor, 'total_run_time': total_run_time, 
+              'time_step': time_step, 'seed': seed, 'per_hinge_name': per_hinge_name, 'metrics_port': metrics_port, 
+              'rebuild_interval': rebuild_interval, 'scratch_dir': tempfile.mkdtemp(prefix='e2o_ensemble_')}
+    base_params = osu.get_hinge_params(model_data)
+    
+    num_workers = num_workers or os.cpu_count()
+    ctx = multiprocessing.get_context('spawn')
+    try:
+        with ctx.Pool(num_workers, initializer=init_worker, initargs=(model_data, base_params, config)) as pool:
+            responses = sorted(pool.imap_unordered(run_realization, range(num_realizations)), key=lambda r: r['realization'])
+    finally:
+        shutil.rmtree(config['scratch_dir'], ignore_errors=True)
+    
+    # the realizations which did not converge are reported but left out of the statistics
+    failed = [r['realization'] for r in responses if r['failed']]
+    if failed:
+        print(f'{len(failed)} of {num_realizations} realizations did not converge and are excluded from the statistics: {failed}')
+    responses = [r for r in responses if not r['failed']]
+    if not responses:
+        raise RuntimeError('None of the realizations converged')
+    
+    peak_rotation = np.stack([r['peak_rotation'] for r in responses])
+    peak_base_shear = np.stack([r['peak_base_shear'] for r in responses])
+    
+    stats = {'hinge_rotation': response_statistics(peak_rotation, pd.Index(model_data.hinges['ele'], name='Hinge ID')),
+             'base_shear': response_statistics(peak_base_shear, pd.Index(['Vx', 'Vy'])),
+             }
+    stats['hinge_rotation'].insert(0, 'Hinge NAME', model_data.hinge_name_of())
+    return stats, {'realization': np.array([r['realization'] for r in responses]), 'peak_rotation': peak_rotation, 
+                   'peak_base_shear': peak_base_shear, 'failed': failed}
+
+# RUN A SMALL ENSEMBLE ON A SYNTHETIC BUILDING AND EXPORT THE STATISTICS
+if __name__ == '__main__':
+    from model_generator import generate_etabs_data
+    
+    parser = argparse.ArgumentParser(description='Monte Carlo ensemble of NLRHA with uncertain hinge parameters.')
+    parser.add_argument('--realizations', type=int, default=20)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--run-time', type=float, default=2.0, help='duration of each response history analysis')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--rebuild-interval', type=int, default=REBUILD_INTERVAL, 
+                        help='number of realizations after which a worker rebuilds its model')
+    args = parser.parse_args()
+    
+    model_data = generate_etabs_data(3, 2, 2)
+    stats, _ = run_ensemble(model_data, args.realizations, total_run_time=args.run_time, num_workers=args.workers, 
+                            seed=args.seed, rebuild_interval=args.rebuild_interval)
+    
+    results_dir = os.path.join(os.path.dirname(os.getcwd()), 'results', 'hinge_ensemble')
+    os.makedirs(results_dir, exist_ok=True)
+    for name, df in stats.items():
+        df.to_excel(os.path.join(results_dir, f'{name}.xlsx'))
+    print(stats['base_shear'])
+    sys.exit(0)
@@ -0,0 +1,215 @@
+'''
+    MIT License
+    
+    Copyright (c) 2020 OpenSeesPro
+    
+    Permission is hereby granted, free of charge, to any person obtaining a copy
+    of this software and associated documentation files (the "Software"), to deal
+    in the Software without restriction, including without limitation the rights
+    to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+    copies of the Software, and to permit persons to whom the Software is
+    furnished to do so, subject to the following conditions:
+    
+    The above copyright notice and this permission notice shall be included in all
+    copies or substantial portions of the Software.
+    
+    THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+    IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+    FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+    AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+    LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+    OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+    SOFTWARE.
+
+    Developed by:
+        Ayush Singhania (ayushs@stanford.edu)
+        Pearl Ranchal (ranchal@berkeley.edu)
+      
+    Publication:
+        Goings, C. B., Singhania, A., Ranchal, P., Weaver B., 2020, “Industrial 
+        Scale NLRH Analysis Using OpenSees and Comparison with Perform3D,” 
+        Proceedings of 2020 SEAOC Virtual Convention, SEAOC, CA
+
+    
+    Description of the script - 
+        This is a supporting script for the main.py (user should execute main.py)
+        This script defines the ModelData container which holds all the data
+        required to generate the OpenSees model in compact structured NumPy
+        arrays. It is created once from the data extracted from ETABS (or the
+        synthetic buildings of model_generator) and passed by reference to the
+        model setup, the recorders and the post-processing.
+
+'''
+
+import numpy as np
+import pandas as pd
+
+# structured array layouts (kip, in)
+JOINT_DTYPE = np.dtype([('id', 'i4'), ('x', 'f8'), ('y', 'f8'), ('z', 'f8'), ('restraints', 'i1', (6,)), ('is_auto', '?')])
+FRAME_DTYPE = np.dtype([('id', 'i4'), ('node_i', 'i4'), ('node_j', 'i4'), ('section', 'i2'), ('angle', 'f8'), ('is_column', '?')])
+SECTION_DTYPE = np.dtype([('area', 'f8'), ('j', 'f8'), ('i22', 'f8'), ('i33', 'f8'), ('as2', 'f8'), ('as3', 'f8')])
+MASS_DTYPE = np.dtype([('id', 'i4'), ('mass', 'f8', (6,))])
+LOAD_DTYPE = np.dtype([('id', 'i4'), ('force', 'f8', (6,))])
+HINGE_DTYPE = np.dtype([('node', 'i4'), ('new_node', 'i4'), ('ele', 'i4'), ('dirn', 'i1'), ('hinge', 'i2')])
+
+# SORTED IDS AND THEIR ROWS, USED TO LOOKUP THE ROWS OF A SET OF IDS
+def build_index(ids):
+    order = np.argsort(ids, kind='stable').astype(np.int32)
+    return ids[order], order
+
+# ROWS OF THE GIVEN IDS, RAISES KeyError IF ANY OF THE IDS IS NOT PRESENT
+def lookup_rows(index, ids):
+    sorted_ids, order = index
+    ids = np.asarray(ids)
+    pos = np.minimum(np.searchsorted(sorted_ids, ids), len(sorted_ids) - 1)
+    found = sorted_ids[pos] == ids
+    if not np.all(found):
+        raise KeyError(f'IDs not found: {np.atleast_1d(ids)[~np.atleast_1d(found)][:10].tolist()}')
+    return order[pos]
+
+# ROWS OF THE VALUES IN A LIST OF CATEGORIES, RAISES KeyError IF ANY OF THE VALUES IS NOT A CATEGORY
+def category_codes(categories, values):
+    codes = pd.Index(categories).get_indexer(values)
+    if np.any(codes < 0):
+        raise KeyError(f'Unknown categories: {sorted(set(np.asarray(values)[codes < 0].tolist()))[:10]}')
+    return codes
+
+class ModelData:
+    """
+    joints              structured array (JOINT_DTYPE) of all the joints including the new hinge joints
+    frames              structured array (FRAME_DTYPE) of the frame elements, section is the row in sections
+    sections            structured array (SECTION_DTYPE) of the frame section properties (I33 includes the modifier)
+    section_names       names of the frame sections (categories of frames['section'])
+    masses              structured array (MASS_DTYPE) of the nodal masses
+    loads               structured array (LOAD_DTYPE) of the nodal dead loads
+    hinges              structured array (HINGE_DTYPE) of the moment hinges: real joint, new joint, zero length element,
+                        direction and the row in hinge_names
+    hinge_names         names of the hinges, identical to the 'Hinge NAME' in the NL Properties Summary worksheet
+    disp_nodes          joints where the displacements are recorded (all joints above the lowest level)
+    rxn_nodes           joints where the reactions are recorded (all joints at the lowest level)
+    etabs_periods       periods of the first modes obtained from ETABS (None if not available)
+    """
+    __slots__ = ('joints', 'frames', 'sections', 'section_names', 'masses', 'loads', 'hinges', 'hinge_names', 
+                 'disp_nodes', 'rxn_nodes', 'etabs_periods', '_joint_index', '_hinge_index')
+    
+    def __init__(self, joints, frames, sections, section_names, masses, loads, hinges, hinge_names, etabs_periods=None):
+        self.joints = joints
+        self.frames = frames
+        self.sections = sections
+        self.section_names = section_names
+        self.masses = masses
+        self.loads = loads
+        self.hinges = hinges
+        self.hinge_names = hinge_names
+        self.etabs_periods = etabs_periods
+        
+        # joints not on the lowest level are displacement nodes, all joints at the lowest level are reaction nodes
+        base = joints['z'] == joints['z'].min()
+        self.disp_nodes = joints['id'][~base]
+        self.rxn_nodes = joints['id'][base]
+        
+        self._joint_index = build_index(joints['id'])
+        self._hinge_index = build_index(hinges['ele'])
+    
+    def __getstate__(self):
+        return {slot: getattr(self, slot) for slot in self.__slots__}
+    
+    def __setstate__(self, state):
+        for slot, value in state.items():
+            setattr(self, slot, value)
+    
+    def __repr__(self):
+        return (f'ModelData({len(self.joints)} joints, {len(self.frames)} frames, {len(self.hinges)} hinges, '
+                f'{self.num_dofs} DOF, {self.nbytes / 1024:.1f} KiB)')
+    
+    @property
+    def new_joints(self):
+        return self.hinges['new_node']
+    
+    @property
+    def num_dofs(self):
+        return 6 * len(self.joints)
+    
+    @property
+    def nbytes(self):
+        return sum(getattr(self, slot).nbytes for slot in ['joints', 'frames', 'sections', 'masses', 'loads', 'hinges', 
+                                                            'disp_nodes', 'rxn_nodes'])
+    
+    # elevations of the floors (all levels above the lowest level)
+    @property
+    def floor_levels(self):
+        z = self.joints['z']
+        return np.unique(z[z > z.min()])
+    
+    # joints of the rigid diaphragm of each floor, the hinge joints (real and new) are not part of the diaphragm
+    # the first joint of each floor is the retained node of the diaphragm
+    def diaphragm_nodes(self):
+        in_diaphragm = ~np.isin(self.joints['id'], self.hinges['node']) & ~np.isin(self.joints['id'], self.new_joints)
+        return [self.joints['id'][in_diaphragm & (self.joints['z'] == level)] for level in self.floor_levels.tolist()]
+    
+    # joint of each floor where the floor displacements are recorded (the retained node of the diaphragm)
+    @property
+    def floor_nodes(self):
+        return np.array([nodes[0] for nodes in self.diaphragm_nodes()], dtype=self.joints['id'].dtype)
+    
+    # rows of the joints with the given IDs
+    def joint_rows(self, ids):
+        return lookup_rows(self._joint_index, ids)
+    
+    # coordinates (x, y, z) of the joints with the given IDs
+    def joint_coords(self, ids):
+        rows = self.joint_rows(ids)
+        return np.column_stack([self.joints['x'][rows], self.joints['y'][rows], self.joints['z'][rows]])
+    
+    # rows of the hinges with the given zero length element IDs
+    def hinge_rows(self, eles):
+        return lookup_rows(self._hinge_index, eles)
+    
+    # hinge name of each hinge
+    def hinge_name_of(self, rows=slice(None)):
+        return self.hinge_names[self.hinges['hinge'][rows]]
+    
+    # CREATE THE CONTAINER FROM THE DATAFRAMES AND DICTIONARIES PRODUCED BY etabs_utilities
+    @classmethod
+    def from_etabs_data(cls, joints_df, pts_loads_df, frames_df, mass_df, frame_props_df, dict_of_hinges, dict_of_hinges_2, 
+                        etabs_periods=None):
+        
+        joints = np.empty(len(joints_df), dtype=JOINT_DTYPE)
+        joints['id'] = joints_df.UniqueName.values
+        joints['x'] = joints_df.X.values
+        joints['y'] = joints_df.Y.values
+        joints['z'] = joints_df.Z.values
+        joints['restraints'] = np.array(joints_df.Restraints.tolist(), dtype=bool)
+        joints['is_auto'] = (joints_df.IsAuto == 'Yes').values
+        
+        # frame sections are stored once and referred to by their row
+        section_names = frame_props_df.index.values.astype(str)
+        sections = np.empty(len(frame_props_df), dtype=SECTION_DTYPE)
+        for field, col in zip(SECTION_DTYPE.names, ['Area', 'J', 'I22', 'I33', 'As2', 'As3']):
+            sections[field] = frame_props_df[col].values
+        
+        frames = np.empty(len(frames_df), dtype=FRAME_DTYPE)
+        frames['id'] = frames_df.UniqueName.values
+        frames['node_i'] = frames_df.PointI.values
+        frames['node_j'] = frames_df.PointJ.values
+        frames['section'] = category_codes(section_names, frames_df.Prop.values)
+        frames['angle'] = frames_df.Angle.values
+        frames['is_column'] = frames_df.Label.astype(str).str.contains('C').values
+        
+        masses = np.empty(len(mass_df), dtype=MASS_DTYPE)
+        masses['id'] = mass_df.PointElm.values
+        masses['mass'] = mass_df[['UX', 'UY', 'UZ', 'RX', 'RY', 'RZ']].values
+        
+        loads = np.empty(len(pts_loads_df), dtype=LOAD_DTYPE)
+        loads['id'] = pts_loads_df.UniqueName.values
+        loads['force'] = pts_loads_df[['F1', 'F2', 'F3', 'M1', 'M2', 'M3']].values
+        
+        # dict_of_hinges = {real joint: (new joint, zero length element ID, orientation)}
+        # dict_of_hinges_2 = {zero length element ID: hinge name}
+        hinges = np.empty(len(dict_of_hinges), dtype=HINGE_DTYPE)
+        hinge_values = np.array(list(dict_of_hinges.values()), dtype=np.int64).reshape(-1, 3)
+        hinges['node'] = list(dict_of_hinges.keys())
+        hinges['new_node'], hinges['ele'], hinges['dirn'] = hinge_values.T
+        hinge_names, hinges['hinge'] = np.unique([dict_of_hinges_2[ele] for ele in hinges['ele'].tolist()], return_inverse=True)
+        
+        return cls(joints, frames, sections, section_names, masses, loads, hinges, hinge_names.astype(str), etabs_periods)
@@ -0,0 +1,189 @@
+'''
+    MIT License
+    
+    Copyright (c) 2020 OpenSeesPro
+    
+    Permission is hereby granted, free of charge, to any person obtaining a copy
+    of this software and associated documentation files (the "Software"), to deal
+    in the Software without restriction, including without limitation the rights
+    to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+    copies of the Software, and to permit persons to whom the Software is
+    furnished to do so, subject to the following conditions:
+    
+    The above copyright notice and this permission notice shall be included in all
+    copies or substantial portions of the Software.
+    
+    THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+    IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+    FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+    AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+    LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+    OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+    SOFTWARE.
+
+    Developed by:
+        Ayush Singhania (ayushs@stanford.edu)
+        Pearl Ranchal (ranchal@berkeley.edu)
+      
+    Publication:
+        Goings, C. B., Singhania, A., Ranchal, P., Weaver B., 2020, “Industrial 
+        Scale NLRH Analysis Using OpenSees and Comparison with Perform3D,” 
+        Proceedings of 2020 SEAOC Virtual Convention, SEAOC, CA
+
+    
+    Description of the script - 
+        This is a supporting script to generate synthetic moment frame buildings
+        of any size. The data is returned in exactly the same format as the
+        get_etabs_data method in etabs_utilities (a ModelData container), so
+        the rest of the library (and the benchmarks) can be used without ETABS.
+        The beam hinges are named after the sections in the NL Properties 
+        Summary worksheet.
+
+'''
+
+import numpy as np
+import pandas as pd
+from etabs_utilities import remap_hinge_joints, remap_frame_joints, FRAME_DATA_COLS, FRAME_PROP_COLS
+from model_data import ModelData
+
+# default geometry of the synthetic building (kip, in)
+STORY_HEIGHT = 156.0
+BAY_WIDTH = 360.0
+HINGE_OFFSET = 18.0     # distance of the hinge from the column centerline
+LINK_LENGTH = 1.0       # length of the link between the real and the dummy hinge joint in ETABS
+FLOOR_MASS = 0.5        # floor mass (kip-s^2/in) per column line
+COLUMN_LOAD = 50.0      # dead load (kip) per column per floor
+
+# beam sections from the bottom to the top of the building, the names match the 'Hinge NAME' in the 
+# NL Properties Summary worksheet
+BEAM_SECTIONS = ['W24X176', 'W24X131', 'W24X117', 'W24X84', 'W24X68']
+COLUMN_SECTIONS = ['W14X311', 'W14X233', 'W14X159']
+
+# AISC section properties (in, in^2, in^3, in^4): Area, As2, As3, J, I22, I33, S22Pos, S33Pos, Z22, Z33, R22, R33
+SECTION_PROPS = {'W24X68'  : [20.1, 9.84 , 8.75 , 1.87, 70.4, 1830, 15.7, 154, 24.5, 177, 1.87, 9.55],
+                 'W24X84'  : [24.7, 11.33, 11.57, 3.70, 94.4, 2370, 20.9, 196, 32.6, 224, 1.95, 9.79],
+                 'W24X117' : [34.4, 13.37, 18.13, 6.72, 297 , 3540, 46.5, 291, 71.4, 327, 2.94, 10.1],
+                 'W24X131' : [38.6, 14.82, 20.64, 9.50, 340 , 4020, 53.0, 329, 81.5, 370, 2.97, 10.2],
+                 'W24X176' : [51.7, 18.90, 28.81, 23.9, 479 , 5680, 74.3, 450, 115 , 511, 3.04, 10.5],
+                 'W14X159' : [46.7, 11.18, 30.94, 19.7, 748 , 1900, 96.2, 254, 146 , 287, 4.00, 6.38],
+                 'W14X233' : [68.5, 17.12, 45.58, 59.5, 1150, 3010, 144 , 375, 217 , 436, 4.10, 6.63],
+                 'W14X311' : [91.4, 24.11, 61.02, 136 , 1610, 4330, 199 , 506, 304 , 603, 4.20, 6.88],
+                 }
+
+# PICK A SECTION FOR A STORY SUCH THAT THE SECTIONS GET LIGHTER UP THE HEIGHT OF THE BUILDING
+def section_for_story(sections, story, num_stories):
+    return sections[min(len(sections) - 1, (story - 1) * len(sections) // num_stories)]
+
+# NUMBER OF DEGREES OF FREEDOM IN THE OPENSEES MODEL OF A SYNTHETIC BUILDING
+def count_dofs(num_stories, num_bays, num_frames):
+    num_col_lines = (num_bays + 1) * num_frames
+    num_beams = num_bays * num_frames + (num_bays + 1) * (num_frames - 1)
+    num_joints = (num_stories + 1) * num_col_lines + num_stories + 4 * num_stories * num_beams
+    return 6 * num_joints
+
+# GENERATE THE ETABS TABLES (BEFORE THE HINGE JOINTS ARE RENAMED) OF A SYNTHETIC MOMENT FRAME BUILDING
+def generate_etabs_tables(num_stories, num_bays, num_frames, story_height=STORY_HEIGHT, bay_width=BAY_WIDTH):
+    """
+    num_stories         number of stories (N)
+    num_bays            number of bays of each moment frame along the X axis (M)
+    num_frames          number of moment frames along the Y axis (K), adjacent frames are connected by
+                        moment connected beams along the Y axis at each column line
+    
+    Every beam is modeled in the same manner as the ETABS model: a short stub from the column to the real
+    hinge joint, a link from the real hinge joint to a dummy joint (prefix "N") and the beam between the two 
+    dummy joints. The joint and frame tables are returned in the format obtained from the ETABS API, i.e.
+    before remap_hinge_joints and remap_frame_joints are applied.
+    """
+    
+    # center of mass joints are added first so that they become the master node of the rigid diaphragm
+    joints = []     # UniqueName, Story, IsAuto, X, Y, Z, Restraints
+    frames = []     # UniqueName, Label, Prop, Story, PointI, PointJ, Angle
+    next_joint = 1
+    for story in range(1, num_stories + 1):
+        joints.append([str(next_joint), f'Story{story}', 'Yes', 0.5 * num_bays * bay_width, 
+                       0.5 * (num_frames - 1) * bay_width, story * story_height, (False,) * 6])
+        next_joint += 1
+    
+    # column joints: col_joint[story, bay, frame]
+    col_joint = np.arange(next_joint, next_joint + (num_stories + 1) * (num_bays + 1) * num_frames).reshape(
+                                                                        num_stories + 1, num_bays + 1, num_frames)
+    next_joint = col_joint.max() + 1
+    for (story, bay, frame), joint in np.ndenumerate(col_joint):
+        joints.append([str(joint), f'Story{story}' if story else 'Base', 'No', bay * bay_width, frame * bay_width, 
+                       story * story_height, (story == 0,) * 6])
+    
+    # columns
+    for story in range(1, num_stories + 1):
+        prop = section_for_story(COLUMN_SECTIONS, story, num_stories)
+        for bay in range(num_bays + 1):
+            for frame in range(num_frames):
+                frames.append([f'C{len(frames) + 1}', prop, f'Story{story}', col_joint[story - 1, bay, frame], 
+                               col_joint[story, bay, frame], 0.0])
+    
+    # beams between two column joints along with the hinge joints at both the ends
+    def add_beam(joint_I, joint_J, story, prop):
+        nonlocal next_joint
+        xyz_I = np.array(joints[joint_I - 1][3:6], dtype=float)
+        xyz_J = np.array(joints[joint_J - 1][3:6], dtype=float)
+        unit = (xyz_J - xyz_I) / np.linalg.norm(xyz_J - xyz_I)
+        
+        hinge_I, hinge_J = next_joint, next_joint + 1
+        next_joint += 2
+        for hinge, xyz, dirn in [(hinge_I, xyz_I, unit), (hinge_J, xyz_J, -unit)]:
+            joints.append([str(hinge), f'Story{story}', 'No', *(xyz + HINGE_OFFSET * dirn), (False,) * 6])
+            joints.append(['N' + str(hinge), f'Story{story}', 'No', *(xyz + (HINGE_OFFSET + LINK_LENGTH) * dirn), (False,) * 6])
+        
+        frames.append([f'B{len(frames) + 1}', prop, f'Story{story}', joint_I, hinge_I, 0.0])
+        frames.append([f'B{len(frames) + 1}', prop, f'Story{story}', 'N' + str(hinge_I), 'N' + str(hinge_J), 0.0])
+        frames.append([f'B{len(frames) + 1}', prop, f'Story{story}', hinge_J, joint_J, 0.0])
+        return
+    
+    for story in range(1, num_stories + 1):
+        prop = section_for_story(BEAM_SECTIONS, story, num_stories)
+        for bay in range(num_bays + 1):
+            for frame in range(num_frames):
+                if bay < num_bays:
+                    add_beam(col_joint[story, bay, frame], col_joint[story, bay + 1, frame], story, prop)
+                if frame < num_frames - 1:
+                    add_beam(col_joint[story, bay, frame], col_joint[story, bay, frame + 1], story, prop)
+    
+    # joint table in the format of the 'Point Object Connectivity' table (strings, as returned by the ETABS API)
+    joints_df = pd.DataFrame(joints, columns=['UniqueName', 'Story', 'IsAuto', 'X', 'Y', 'Z', 'Restraints'], dtype=object)
+    joints_df[['X', 'Y', 'Z']] = joints_df[['X', 'Y', 'Z']].map(lambda x: f'{x:.4f}')
+    
+    # frame table in the format of FrameObj.GetAllFrames
+    frames_df = pd.DataFrame([[str(i + 1), prop, story, str(pt_I), str(pt_J)] + [0.0] * 6 + [angle] + [0.0] * 6 + [10] 
+                              for i, (label, prop, story, pt_I, pt_J, angle) in enumerate(frames)], columns=FRAME_DATA_COLS, dtype=object)
+    frames_df['Label'] = [frame[0] for frame in frames]
+    
+    # dead loads on the column joints
+    pts_loads_df = pd.DataFrame({'UniqueName': col_joint[1:].ravel(), 'LoadPattern': 'Dead', 'Step': 0, 'CSys': 'Global', 
+                                 'F1': 0.0, 'F2': 0.0, 'F3': -COLUMN_LOAD, 'M1': 0.0, 'M2': 0.0, 'M3': 0.0})
+    
+    # floor masses are lumped at the center of mass joints
+    com_joints = joints_df[joints_df.IsAuto == 'Yes'].astype({'UniqueName': int, 'X': float, 'Y': float, 'Z': float})
+    floor_mass = FLOOR_MASS * (num_bays + 1) * num_frames
+    floor_inertia = floor_mass * ((num_bays * bay_width)**2 + ((num_frames - 1) * bay_width)**2) / 12
+    mass_df = pd.DataFrame({'Story': com_joints.Story.values, 'PointElm': com_joints.UniqueName.values, 'UX': floor_mass, 'UY': floor_mass, 'UZ': 0.0, 
+                            'RX': 0.0, 'RY': 0.0, 'RZ': floor_inertia, 'X': com_joints.X.values, 'Y': com_joints.Y.values, 
+                            'Z': com_joints.Z.values})
+    
+    # frame section properties in the format of get_frame_props_from_db_table
+    frame_props_df = pd.DataFrame([[name, 'A992Fy50', 'Steel I/Wide Flange'] + props[:3] + [props[3]] + props[4:] + [1.0] 
+                                   for name, props in SECTION_PROPS.items()], columns=FRAME_PROP_COLS).set_index('Name')
+    frame_props_df = frame_props_df.astype({col: float for col in FRAME_PROP_COLS[3:]})
+    
+    return joints_df, frames_df, pts_loads_df, mass_df, frame_props_df
+
+# GENERATE THE DATA OF A SYNTHETIC MOMENT FRAME BUILDING IN THE SAME FORMAT AS get_etabs_data (ModelData)
+def generate_etabs_data(num_stories, num_bays, num_frames, story_height=STORY_HEIGHT, bay_width=BAY_WIDTH):
+    
+    joints_df, frames_df, pts_loads_df, mass_df, frame_props_df = generate_etabs_tables(num_stories, num_bays, num_frames, 
+                                                                                         story_height, bay_width)
+    
+    # process the joints and frames in the same manner as the data obtained from ETABS
+    joints_df, dict_of_hinges, dict_of_hinges_1, list_new_joints = remap_hinge_joints(joints_df)
+    frames_df, dict_of_hinges_2 = remap_frame_joints(frames_df, dict_of_hinges_1)
+    
+    # there is no ETABS modal analysis to compare with
+    return ModelData.from_etabs_data(joints_df, pts_loads_df, frames_df, mass_df, frame_props_df, dict_of_hinges, dict_of_hinges_2)
@@ -0,0 +1,303 @@
+'''
+    MIT License
+    
+    Copyright (c) 2020 OpenSeesPro
+    
+    Permission is hereby granted, free of charge, to any person obtaining a copy
+    of this software and associated documentation files (the "Software"), to deal
+    in the Software without restriction, including without limitation the rights
+    to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+    copies of the Software, and to permit persons to whom the Software is
+    furnished to do so, subject to the following conditions:
+    
+    The above copyright notice and this permission notice shall be included in all
+    copies or substantial portions of the Software.
+    
+    THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+    IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+    FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+    AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+    LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+    OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+    SOFTWARE.
+
+    Developed by:
+        Ayush Singhania (ayushs@stanford.edu)
+        Pearl Ranchal (ranchal@berkeley.edu)
+      
+    Publication:
+        Goings, C. B., Singhania, A., Ranchal, P., Weaver B., 2020, “Industrial 
+        Scale NLRH Analysis Using OpenSees and Comparison with Perform3D,” 
+        Proceedings of 2020 SEAOC Virtual Convention, SEAOC, CA
+
+    
+    Description of the script - 
+        This is a supporting script to run the response history analysis of large
+        models in parallel with OpenSeesMP (the parallel interpreter of OpenSeesPy)
+        e.g. mpirun -np 4 python opensees_parallel.py
+        The model is decomposed by bands of floors: every floor (its joints, beams,
+        hinges, rigid diaphragm and the columns below it) belongs to one partition,
+        so that all the constraints are inside one partition, and the joints of
+        the floor below a band are shared with the partition underneath. The
+        system of equations is solved with Mumps and the recorder output of the
+        partitions is merged in the same files as the serial analysis.
+        The parallel analysis is experimental: compare its results with the serial
+        analysis (benchmark_parallel.py) before using them.
+
+'''
+
+import os
+import sys
+import math
+import json
+import time
+import shutil
+import argparse
+import numpy as np
+import openseespy.opensees as op
+import opensees_utilities as osu
+from model_data import ModelData
+
+# settings used for the parallel analysis
+parallelNumberer = 'ParallelRCM'
+parallelSystem = 'Mumps'
+
+# the penalty method keeps all the DOFs of the shared joints in every partition (the transformation method removes the 
+# constrained DOFs, which would then differ between the partitions sharing a joint of a rigid diaphragm)
+parallelConstraints = ('Penalty', 1.0e12, 1.0e12)
+
+# stacked recorders whose columns are written by several partitions and merged after the analysis
+STACKED_OUTPUTS = ['floor_disp', 'hinge_def', 'hinge_frc']
+
+# environment variables set by the MPI launchers (Open MPI, MPICH/Intel MPI)
+MPI_SIZE_VARS = ['OMPI_COMM_WORLD_SIZE', 'PMI_SIZE']
+MPI_RANK_VARS = ['OMPI_COMM_WORLD_RANK', 'PMI_RANK']
+
+# RANK GIVEN BY THE MPI LAUNCHER (0 WITHOUT A LAUNCHER), AVAILABLE EVEN IF OPENSEES IS NOT PARALLEL
+def get_launcher_rank():
+    return max([int(os.environ.get(var, 0)) for var in MPI_RANK_VARS])
+
+# RANK OF THIS PROCESS AND NUMBER OF PROCESSES, RAISES RuntimeError IF MPI WAS LAUNCHED BUT OPENSEES IS NOT PARALLEL
+def get_rank_and_size():
+    rank, size = op.getPID(), op.getNP()
+    launched = max([int(os.environ.get(var, 1)) for var in MPI_SIZE_VARS])
+    if size == 1 and launched > 1:
+        raise RuntimeError(f'Launched with {launched} MPI processes but OpenSeesPy reports a single process, the installed '
+                           'OpenSeesPy is not built with MPI support')
+    return rank, size
+
+# FLOOR OF EACH ELEVATION (-1 FOR THE LOWEST LEVEL)
+def floor_of(model_data, z):
+    return np.searchsorted(np.concatenate([[model_data.joints['z'].min()], model_data.floor_levels]), z) - 1
+
+# DECOMPOSE THE MODEL IN BANDS OF FLOORS
+def partition_model(model_data, num_parts):
+    """
+    returns the partition (rank) of each floor, joint, frame and hinge (in the order of the rows of model_data)
+    
+    Each floor is assigned, with its joints, beams, hinges and the columns below it, to one partition. The floors are 
+    split in contiguous bands with about the same number of elements, the joints at the lowest level belong to the 
+    partition of the first floor.
+    """
+    joints, frames, hinges = model_data.joints, model_data.frames, model_data.hinges
+    num_floors = len(model_data.floor_levels)
+    if num_floors < num_parts:
+        raise ValueError(f'Cannot split {num_floors} floors in {num_parts} partitions')
+    
+    joint_floor = np.maximum(floor_of(model_data, joints['z']), 0)
+    frame_floor = np.maximum(joint_floor[model_data.joint_rows(frames['node_i'])], joint_floor[model_data.joint_rows(frames['node_j'])])
+    hinge_floor = joint_floor[model_data.joint_rows(hinges['node'])]
+    
+    # contiguous bands of floors with about the same number of elements (the middle of each floor sets its band)
+    weight = np.bincount(frame_floor, minlength=num_floors) + np.bincount(hinge_floor, minlength=num_floors)
+    middle = np.cumsum(weight) - weight / 2
+    floor_part = np.minimum((middle / weight.sum() * num_parts).astype(int), num_parts - 1)
+    
+    # every partition needs at least one floor, otherwise one floor per partition from the top
+    if len(np.unique(floor_part)) < num_parts:
+        floor_part = np.maximum(np.arange(num_floors) - (num_floors - num_parts), 0)
+    
+    return {'floor': floor_part, 'joint': floor_part[joint_floor], 'frame': floor_part[frame_floor], 
+            'hinge': floor_part[hinge_floor]}
+
+# MODEL DATA OF ONE PARTITION: ITS ELEMENTS, ALL THE JOINTS THEY CONNECT AND THE MASSES AND LOADS OF THE JOINTS IT OWNS
+def get_partition_data(model_data, partition, rank):
+    frames = model_data.frames[partition['frame'] == rank]
+    hinges = model_data.hinges[partition['hinge'] == rank]
+    owned = model_data.joints['id'][partition['joint'] == rank]
+    
+    # the masses and loads of the shared joints are only added in the partition that owns the joint
+    needed = np.unique(np.concatenate([owned, frames['node_i'], frames['node_j'], hinges['node'], hinges['new_node']]))
+    joints = model_data.joints[np.isin(model_data.joints['id'], needed)]
+    masses = model_data.masses[np.isin(model_data.masses['id'], owned)]
+    loads = model_data.loads[np.isin(model_data.loads['id'], owned)]
+    
+    return ModelData(joints, frames, model_data.sections, model_data.section_names, masses, loads, hinges, 
+                     model_data.hinge_names, model_data.etabs_periods)
+
+# BUILD THE PARTITION OF THIS PROCESS
+def setup_partition_model(model_data, partition, rank, hinge_params=None):
+    if hinge_params is None:
+        hinge_params = osu.get_hinge_params(model_data)
+    local_data = get_partition_data(model_data, partition, rank)
+    
+    osu.initiate_model()
+    osu.add_nodes(local_data, diaphragm_levels=model_data.floor_levels[partition['floor'] == rank].tolist())
+    osu.add_frames(local_data)
+    osu.add_beam_hinges(local_data, hinge_params[partition['hinge'] == rank])
+    return local_data
+
+# SETUP TO RECORD THE OUTPUT OF THE JOINTS AND HINGES OWNED BY THIS PARTITION
+def setup_partition_recorders(model_data, partition, rank, initialOrTangent):
+    owned = model_data.joints['id'][partition['joint'] == rank]
+    
+    # individual files, each joint/hinge is recorded by exactly one partition
+    for node in np.intersect1d(osu.recordedDispNodes, np.intersect1d(owned, model_data.disp_nodes)).tolist():
+        op.recorder('Node', '-file', f'node_{node}_disp_{initialOrTangent}.out', '-node', node, '-dof', 1,2,3,4,5,6, 'disp')
+    for node in np.intersect1d(model_data.rxn_nodes, owned).tolist():
+        op.recorder('Node', '-file', f'node_{node}_rxn_{initialOrTangent}.out', '-node', node, '-dof', 1,2,3,4,5,6, 'reaction')
+    for rec in np.intersect1d(osu.recordedHinges, model_data.hinges['ele'][partition['hinge'] == rank]).tolist():
+        op.recorder('Element', '-file', f'ele_def_{rec}_{initialOrTangent}.out', '-ele', rec, 'deformations')
+        op.recorder('Element', '-file', f'ele_frc_{rec}_{initialOrTangent}.out', '-ele', rec, '-dof', 1,2,3,4,5,6, 'force')
+    
+    # stacked files with the columns of this partition, merged by merge_partition_outputs
+    floor_nodes = model_data.floor_nodes[partition['floor'] == rank].tolist()
+    hinge_eles = model_data.hinges['ele'][partition['hinge'] == rank].tolist()
+    if floor_nodes:
+        op.recorder('Node', '-file', f'floor_disp_{initialOrTangent}.p{rank}.out', '-node', *floor_nodes, '-dof', 1, 2, 'disp')
+    if hinge_eles:
+        op.recorder('Element', '-file', f'hinge_def_{initialOrTangent}.p{rank}.out', '-ele', *hinge_eles, 'deformations')
+        op.recorder('Element', '-file', f'hinge_frc_{initialOrTangent}.p{rank}.out', '-ele', *hinge_eles, 'basicForce')
+    return
+
+# MERGE THE STACKED OUTPUT OF THE PARTITIONS IN THE FILES OF THE SERIAL ANALYSIS (COLUMNS IN THE ORDER OF MODEL_DATA)
+def merge_partition_outputs(partition, num_parts, initialOrTangent, dir_='.'):
+    # columns of each item in the stacked files (two per floor, one per hinge)
+    item_parts = {'floor_disp': np.repeat(partition['floor'], 2), 'hinge_def': partition['hinge'], 'hinge_frc': partition['hinge']}
+    
+    for name in STACKED_OUTPUTS:
+        parts = item_parts[name]
+        columns = {}
+        for rank in range(num_parts):
+            fpath = os.path.join(dir_, f'{name}_{initialOrTangent}.p{rank}.out')
+            if os.path.exists(fpath):
+                columns[rank] = np.loadtxt(fpath, ndmin=2)
+                os.remove(fpath)
+        if not columns:
+            continue
+        
+        # the recorders of the partitions may have written a different number of lines if the analysis was interrupted
+        num_steps = min(len(values) for values in columns.values())
+        merged = np.empty((num_steps, len(parts)))
+        for rank, values in columns.items():
+            merged[:, parts == rank] = values[:num_steps]
+        np.savetxt(os.path.join(dir_, f'{name}_{initialOrTangent}.out'), merged, fmt='%.10g')
+    return
+
+# EIGENVALUES OF THE COMPLETE MODEL, COMPUTED BY THE FIRST PROCESS AND SENT TO ALL THE PROCESSES
+def get_parallel_eigenvalues(model_data, rank, hinge_params=None):
+    # the other processes wait in Bcast until the first process sends the eigenvalues, so it always sends numEigen values
+    # (zeros if the model or the eigen analysis failed) and all the processes stop with the same error
+    if rank == 0:
+        try:
+            osu.setup_opensees_model(model_data, hinge_params)
+            eigenValues = list(osu.modal_response(osu.numEigen))
+        except Exception as error:
+            print(f'error: eigen analysis of the complete model failed: {error}')
+            eigenValues = []
+        op.wipe()
+        if len(eigenValues) != osu.numEigen:
+            eigenValues = [0.0] * osu.numEigen
+        eigenValues = list(op.Bcast(*eigenValues))
+    else:
+        eigenValues = list(op.Bcast())
+
+    if len(eigenValues) != osu.numEigen or min(eigenValues) <= 0:
+        raise RuntimeError('The eigen analysis of the complete model failed on the first process')
+    return eigenValues
+
+# RUN NLRHA USING RAYLEIGH DAMPING WITH THE MODEL DECOMPOSED ON ALL THE MPI PROCESSES
+def run_parallel_dynamic_analysis(model_data, zeta, initialOrTangent='initial', parent_dir=os.getcwd(), total_run_time=50, 
+                                  time_step=0.01, record_file='BM68elc.acc', scale_factor=3.0, eigenValues=None, 
+                                  hinge_params=None):
+    """
+    Same arguments and results as opensees_utilities.run_dynamic_analysis_w_rayleigh_damping, every MPI process must call 
+    this function. With a single process the serial analysis is run.
+    """
+    rank, num_parts = get_rank_and_size()
+    if num_parts == 1:
+        osu.setup_opensees_model(model_data, hinge_params)
+        return osu.run_dynamic_analysis_w_rayleigh_damping(model_data, zeta, initialOrTangent, parent_dir, total_run_time, 
+                                                           time_step, record_file, scale_factor, eigenValues)
+    
+    if hinge_params is None:
+        hinge_params = osu.get_hinge_params(model_data)
+    if eigenValues is None:
+        eigenValues = get_parallel_eigenvalues(model_data, rank, hinge_params)
+    periods = 2 * math.pi / np.sqrt(eigenValues)
+    
+    partition = partition_model(model_data, num_parts)
+    setup_partition_model(model_data, partition, rank, hinge_params)
+    
+    osu.add_ground_motion(record_file, scale_factor)
+    osu.define_transient_analysis(parallelConstraints, parallelNumberer, parallelSystem)
+    osu.add_rayleigh_damping(eigenValues, zeta, initialOrTangent, verbose=rank == 0)
+    setup_partition_recorders(model_data, partition, rank, initialOrTangent)
+    
+    # all the processes step together, the convergence test (and so the choice of the algorithm) is the same on all of them,
+    # only the first process reports the progress and the fallback algorithms
+    failed, end_time = osu.run_execution_loop(total_run_time, time_step, verbose=rank == 0)
+    
+    # the recorders are closed when the model is wiped
+    op.wipe()
+    op.barrier()
+    
+    if rank == 0:
+        merge_partition_outputs(partition, num_parts, initialOrTangent)
+        
+        # move output files to results directory
+        list_of_out_files = [fname for fname in os.listdir() if fname.endswith('.out')]
+        for fname in list_of_out_files:
+            shutil.move(os.path.join(os.getcwd(), fname), os.path.join(parent_dir, fname))
+    op.barrier()
+    return periods, eigenValues, {'failed': bool(failed), 'time': end_time}
+
+# RUN ONE ANALYSIS OF A SYNTHETIC BUILDING AND REPORT THE WALL TIME (USED BY benchmark_parallel.py)
+if __name__ == '__main__':
+    from model_generator import generate_etabs_data
+    
+    parser = argparse.ArgumentParser(description='Parallel NLRHA of a synthetic building, run with mpirun -np <n>.')
+    parser.add_argument('--size', type=int, nargs=3, default=[12, 4, 3], metavar=('N', 'M', 'K'), 
+                        help='stories, bays of each frame and number of frames of the synthetic building')
+    parser.add_argument('--run-time', type=float, default=1.0)
+    parser.add_argument('--time-step', type=float, default=0.01)
+    parser.add_argument('--results-dir', default=os.path.join(os.path.dirname(os.getcwd()), 'results', 'parallel'))
+    parser.add_argument('--timing-file', default=None, help='json file where the first process writes the timings')
+    args = parser.parse_args()
+    
+    # every process fails the same way if OpenSees is not parallel, only the first one reports it
+    try:
+        rank, num_parts = get_rank_and_size()
+    except RuntimeError as error:
+        if get_launcher_rank() == 0:
+            print(f'error: {error}')
+        sys.exit(1)
+    
+    model_data = generate_etabs_data(*args.size)
+    hinge_params = osu.get_hinge_params(model_data)
+    if rank == 0:
+        os.makedirs(args.results_dir, exist_ok=True)
+    
+    start = time.perf_counter()
+    periods, _, status = run_parallel_dynamic_analysis(model_data, 0.05, 'tangent', args.results_dir, args.run_time, args.time_step, 
+                                               os.path.abspath('BM68elc.acc'), hinge_params=hinge_params)
+    wall_time = time.perf_counter() - start
+    
+    if rank == 0:
+        print(f'{num_parts} processes, {model_data.num_dofs} DOF, periods {np.round(periods, 3)}, {wall_time:.2f} s'
+              f'{", FAILED at t = %.3f s" % status["time"] if status["failed"] else ""}')
+        if args.timing_file:
+            with open(args.timing_file, 'w') as f:
+                json.dump({'num_procs': num_parts, 'num_dofs': model_data.num_dofs, 'wall_time': wall_time, 
+                           'periods': list(periods), 'failed': status['failed']}, f)
+    sys.exit(0)
@@ -43,39 +43,127 @@ import pandas as pd
 
 COLS = ['FX', 'FY', 'FZ', 'MX', 'MY', 'MZ']
 COL_DICT = {i:col for i, col in zip(range(6), COLS)}
+LIMIT_COLS = ['IO (θy)', 'LS (θy)', 'CP (θy)']
 
-def post_process(initialOrTangent, dir_):
-    fpath = os.path.join(dir_, f'ele_frc_20279_{initialOrTangent}.out')
-    fpath2 = os.path.join(dir_, f'ele_def_20279_{initialOrTangent}.out')
-        
-    df = pd.DataFrame([s.split() for s in open(fpath, 'r').readlines()])
-    df['RY'] = pd.DataFrame([s.split() for s in open(fpath2, 'r').readlines()])[0]
-    df = df.astype(float).rename(columns=COL_DICT)
-    
-    ax = df.plot(x='RY', y='MY', grid=True, figsize=(15,5))
-    ax.set_axisbelow(True)
-    
-    df.to_excel(os.path.join(dir_, f'hinge_hyst-{initialOrTangent}.xlsx'))
+def post_process(initialOrTangent, dir_, ele=20279, plot=False, export=True):
+    fpath = os.path.join(dir_, f'ele_frc_{ele}_{initialOrTangent}.out')
+    fpath2 = os.path.join(dir_, f'ele_def_{ele}_{initialOrTangent}.out')
+    
+    df = pd.DataFrame(np.loadtxt(fpath, ndmin=2)).rename(columns=COL_DICT)
+    df['RY'] = np.loadtxt(fpath2, ndmin=2)[:, 0]
+    
+    # plotting is opt-in so that headless batch runs never load a rendering backend
+    if plot:
+        ax = df.plot(x='RY', y='MY', grid=True, figsize=(15,5))
+        ax.set_axisbelow(True)
+    
+    if export:
+        df.to_excel(os.path.join(dir_, f'hinge_hyst-{initialOrTangent}.xlsx'))
     return df.copy()
 
-def base_shear(dir_, dict_of_rxn_nodes, initialOrTangent):
-    df_shear_x = pd.DataFrame(columns = [])
-    df_shear_x['t'] = np.arange(0,50.01,0.01)
-    df_shear_y = df_shear_x.copy()
+# READ THE DEFORMATION AND FORCE HISTORIES OF ALL HINGES FROM THE STACKED RECORDERS
+def read_hinge_histories(initialOrTangent, dir_):
+    # arrays of shape (number of hinges, number of steps), rows in the order of model_data.hinges
+    rotations = np.loadtxt(os.path.join(dir_, f'hinge_def_{initialOrTangent}.out'), ndmin=2).T
+    moments = np.loadtxt(os.path.join(dir_, f'hinge_frc_{initialOrTangent}.out'), ndmin=2).T
+    
+    # guard against a partially written last line if the analysis was interrupted
+    num_steps = min(rotations.shape[1], moments.shape[1])
+    return rotations[:, :num_steps], moments[:, :num_steps]
+
+# COMPUTE HYSTERESIS METRICS FOR A STACK OF HINGE HISTORIES
+def compute_hinge_metrics(rotations, moments, K0, limits):
+    """
+    rotations           hinge rotation histories, shape (number of hinges, number of steps)
+    moments             hinge moment histories (basic force), same shape as rotations
+    K0                  elastic stiffness of each hinge, shape (number of hinges,)
+    limits              acceptance criteria of each hinge (IO, LS, CP), shape (number of hinges, 3)
+    """
+    K0 = np.asarray(K0, dtype=float)
+    
+    # peak absolute rotation of each hinge
+    peak_rotation = np.abs(rotations).max(axis=1)
+    
+    # cumulative plastic rotation is the total path length of the plastic component of the rotation
+    plastic_rotation = rotations - moments / K0[:, None]
+    cum_plastic_rotation = np.abs(np.diff(plastic_rotation, axis=1)).sum(axis=1)
+    
+    # dissipated energy is the work of the moment on the plastic rotation increments (trapezoidal rule), for an elastic hinge
+    # the plastic rotation is only the rounding of the recorded values, so the small negative sums are clipped at 0
+    hysteretic_energy = (0.5 * (moments[:, 1:] + moments[:, :-1]) * np.diff(plastic_rotation, axis=1)).sum(axis=1)
+    hysteretic_energy = np.maximum(hysteretic_energy, 0.0)
+    
+    # the acceptance criteria are plastic rotations, so they are compared with the peak absolute plastic rotation
+    peak_plastic_rotation = np.abs(plastic_rotation).max(axis=1)
+    acceptance_ratio = peak_plastic_rotation[:, None] / np.asarray(limits, dtype=float)
+    
+    return peak_rotation, peak_plastic_rotation, cum_plastic_rotation, hysteretic_energy, acceptance_ratio
+
+# HYSTERESIS ANALYTICS FOR ALL THE HINGES IN THE MODEL
+def hinge_analytics(model_data, initialOrTangent, dir_, hinge_props=None):
     
-    for rxn_node in dict_of_rxn_nodes:
+    if hinge_props is None:
+        from opensees_utilities import read_nonlinear_hinge_properties
+        hinge_props = read_nonlinear_hinge_properties()
+    
+    # properties of each hinge name, gathered for every hinge in the order of the stacked recorders
+    props = hinge_props.set_index('Hinge NAME').loc[model_data.hinge_names]
+    codes = model_data.hinges['hinge']
+    
+    rotations, moments = read_hinge_histories(initialOrTangent, dir_)
+    peak_rotation, peak_plastic_rotation, cum_plastic_rotation, hysteretic_energy, acceptance_ratio = \
+        compute_hinge_metrics(rotations, moments, props['K0'].values[codes], props[LIMIT_COLS].values[codes])
+    
+    df = pd.DataFrame({'Hinge NAME'             : model_data.hinge_name_of(),
+                       'Peak Rotation'          : peak_rotation,
+                       'Peak Plastic Rotation'  : peak_plastic_rotation,
+                       'Cum. Plastic Rotation'  : cum_plastic_rotation,
+                       'Hysteretic Energy'      : hysteretic_energy,
+                       'IO Ratio'               : acceptance_ratio[:, 0],
+                       'LS Ratio'               : acceptance_ratio[:, 1],
+                       'CP Ratio'               : acceptance_ratio[:, 2],
+                       }, index=pd.Index(model_data.hinges['ele'], name='Hinge ID'))
+    return df
+
+# BASE SHEAR HISTORIES (Vx, Vy) AS AN ARRAY OF SHAPE (NUMBER OF STEPS, 2)
+def read_base_shear(model_data, initialOrTangent, dir_):
+    shear = None
+    for rxn_node in model_data.rxn_nodes.tolist():
+        rxn = np.loadtxt(os.path.join(dir_, f'node_{rxn_node}_rxn_{initialOrTangent}.out'), ndmin=2)[:, :2]
+        shear = rxn if shear is None else shear[:len(rxn)] + rxn[:len(shear)]
+    return shear
+
+# STORY DRIFT RATIO HISTORIES (X, Y) AS AN ARRAY OF SHAPE (NUMBER OF STEPS, NUMBER OF FLOORS, 2)
+def read_story_drifts(model_data, initialOrTangent, dir_):
+    levels = model_data.floor_levels
+    disp = np.loadtxt(os.path.join(dir_, f'floor_disp_{initialOrTangent}.out'), ndmin=2).reshape(-1, len(levels), 2)
+    
+    # interstory displacement divided by the story height (the lowest level does not move)
+    story_disp = np.diff(disp, axis=1, prepend=0.0)
+    story_height = np.diff(levels, prepend=model_data.joints['z'].min())
+    return story_disp / story_height[None, :, None]
+
+def base_shear(dir_, model_data, initialOrTangent, out_dir=None, time_step=0.01):
+    # time_step is the time step of the analysis, line k of the recorders is written at time (k + 1) * time_step
+    rxns = {}
+    for rxn_node in model_data.rxn_nodes.tolist():
         fpath = os.path.join(dir_, 'node_' + str(rxn_node) + '_rxn_' + initialOrTangent + '.out')
-        df = pd.DataFrame([s.split() for s in open(fpath, 'r').readlines()])
-        df = df.astype(float).rename(columns=COL_DICT)
-        
-        df_shear_x[f'X - {rxn_node}'] = df.FX
-        df_shear_y[f'Y - {rxn_node}'] = df.FY
-        
-    df_shear_x['Vx'] = df_shear_x.sum(axis = 1)
-    df_shear_y['Vy'] = df_shear_y.sum(axis = 1)
-    
-    df_shear_x.to_excel(os.path.join(dir_, f'base shear x-{initialOrTangent}.xlsx'))
-    df_shear_y.to_excel(os.path.join(dir_, f'base shear y-{initialOrTangent}.xlsx'))
+        rxns[rxn_node] = pd.DataFrame(np.loadtxt(fpath, ndmin=2)).rename(columns=COL_DICT)
+    num_steps = min(len(df) for df in rxns.values()) if rxns else 0
+    
+    df_shear_x = pd.DataFrame({'t': time_step * np.arange(1, num_steps + 1)})
+    df_shear_y = df_shear_x.copy()
+    for rxn_node, df in rxns.items():
+        df_shear_x[f'X - {rxn_node}'] = df.FX.values[:num_steps]
+        df_shear_y[f'Y - {rxn_node}'] = df.FY.values[:num_steps]
+    
+    # sum of the reactions (the time column is not a reaction)
+    df_shear_x['Vx'] = df_shear_x.drop(columns='t').sum(axis = 1)
+    df_shear_y['Vy'] = df_shear_y.drop(columns='t').sum(axis = 1)
+    
+    # the tables are written next to the recorder output unless another directory is given
+    out_dir = dir_ if out_dir is None else out_dir
+    df_shear_x.to_excel(os.path.join(out_dir, f'base shear x-{initialOrTangent}.xlsx'))
+    df_shear_y.to_excel(os.path.join(out_dir, f'base shear y-{initialOrTangent}.xlsx'))
     
     return
-        
\ No newline at end of file
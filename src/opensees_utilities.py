@@ -38,12 +38,10 @@
 '''
 
 import openseespy.opensees as op
-import openseespy.postprocessing.Get_Rendering as opp
 import pandas as pd
 import numpy as np
 import math
 import os, shutil
-from tqdm import tqdm
 
 # some constants that may be used for OpenSees model creation
 g = 386.4 
@@ -58,6 +56,32 @@ coordTransf = "Linear"  # Can be {Linear, PDelta, Corotational}
 massType = "-lMass"     # Can be {-lMass, -cMass}
 tol = 1e-3
 
+# settings used for the response history analysis
+numbererType = 'RCM'
+systemType = 'UmfPack'
+testArgs = ['EnergyIncr', 1e-4, 10000, 0, 2]
+hhtAlpha = 0.67
+rayleighFreqRatio = 0.384   # ratio of the first mode frequency to the second frequency at which the damping ratio is zeta
+defaultAlgoArgs = ['KrylovNewton', 'maxDim', 3]
+# algorithms tried in this order when the default algorithm fails to converge on a step
+backupAlgos = {'Modified Newton w/ Initial Stiffness': ['ModifiedNewton', '-initial'],
+               'Newton with Line Search': ['NewtonLineSearch', 'tol', 1e-3, 'maxIter', 1e5, 'maxEta', 10, 'minEta', 1e-2],
+               }
+recordDt = 0.01         # time step of the ground motion record (seconds)
+gmTags = {1: 2, 2: 3}   # tag of the time series and the pattern of the ground motion in each direction (1: X, 2: Y)
+
+# joints and hinges (zero length elements) whose response is recorded in individual files
+recordedDispNodes = [61, 62, 63, 64, 65, 241, 242, 243, 244, 245]
+recordedHinges = [20271, 20275, 20279, 20283, 20253, 20672, 20673, 20674, 20675, 20676]
+
+# parameters of the Bilin material in the order of the uniaxialMaterial command (see read_nonlinear_hinge_properties)
+BILIN_PARAMS = ['K0', 'as_Plus', 'as_Neg', 'My_Plus', 'My_Neg', 'Lamda_S', 'Lamda_C', 'Lamda_A', 'Lamda_K', 'c_S', 'c_C', 'c_A', 
+                'c_K', 'theta_p_Plus', 'theta_p_Neg', 'theta_pc_Plus', 'theta_pc_Neg', 'Res_Pos', 'Res_Neg', 'theta_u_Plus', 
+                'theta_u_Neg', 'D_Plus', 'D_Neg', 'nFactor']
+
+# path to the worksheet with the nonlinear properties of the moment hinges
+hinge_props_fpath = os.path.join(os.path.dirname(os.getcwd()), 'worksheets', 'NL Properties Summary.xlsx')
+
 # INITIATE A OPENSEES MODEL
 def initiate_model():
     # remove existing model
@@ -68,75 +92,71 @@ def initiate_model():
     return
 
 # ADD NODES TO THE OPENSEES MODEL USING THE DATA FROM ETABS
-def add_nodes(joints_df, mass_df, list_new_joints, dict_of_hinges):
-    
-    # Identify the joints that were auto created by ETABS (like COM joints)
-    points_df = joints_df[joints_df.IsAuto == 'Yes'].copy()
+def add_nodes(model_data, diaphragm_levels=None):
+    # diaphragm_levels are the elevations of the floors where a rigid diaphragm is defined (all the floors by default)
+    joints = model_data.joints
     
     # create joints in opensees mdoel
-    joints_df.apply(lambda row: op.node(row.UniqueName, row.X, row.Y, row.Z), axis='columns')
-    # add restraints to the joints
-    joints_df.apply(lambda row: op.fix (row.UniqueName, *[int(r) for r in row.Restraints]), axis='columns')
-    # special joint restraints for the COM joints
-    points_df.apply(lambda row: op.fix (row.UniqueName, *[0, 0, 1, 1, 1, 0]), axis='columns')
+    for tag, x, y, z in zip(joints['id'].tolist(), joints['x'].tolist(), joints['y'].tolist(), joints['z'].tolist()):
+        op.node(tag, x, y, z)
+    
+    # add restraints to the joints (joints without any restraint are skipped)
+    restrained = joints['restraints'].any(axis=1)
+    for tag, restraints in zip(joints['id'][restrained].tolist(), joints['restraints'][restrained].tolist()):
+        op.fix(tag, *restraints)
+    
+    # special joint restraints for the joints that were auto created by ETABS (like COM joints)
+    for tag in joints['id'][joints['is_auto']].tolist():
+        op.fix(tag, *[0, 0, 1, 1, 1, 0])
     
     op.constraints('Transformation')
     
     # if the model diaphragm is rigid, define rigidity on each floor
     if rigid_dia:
         
-        # obtain the list of floors in terms of the elevation (Z coordinate)
-        floor_list = set(joints_df[joints_df.Z > joints_df.Z.min()].Z)
-        
-        # iterate through each floor to define rigid diaphragm
-        for floor in floor_list:
-            nodes_list = list(joints_df.loc[joints_df.Z == floor]['UniqueName'])
-            remove_list = list(set(nodes_list) & set(list_new_joints)) + list(dict_of_hinges.keys())
-            nodes = [i for i in nodes_list if i not in remove_list] 
-            op.rigidDiaphragm(3, *nodes)
+        # iterate through each floor (in terms of the elevation i.e. the Z coordinate) to define rigid diaphragm
+        for level, nodes in zip(model_data.floor_levels.tolist(), model_data.diaphragm_nodes()):
+            if diaphragm_levels is None or level in diaphragm_levels:
+                op.rigidDiaphragm(3, *nodes.tolist())
     
     # apply mass to the respective nodes
-    mass_df.apply(lambda row: op.mass(row.PointElm, row.UX, row.UY, row.UZ, row.RX, row.RY, row.RZ), axis = 'columns')
+    for tag, mass in zip(model_data.masses['id'].tolist(), model_data.masses['mass'].tolist()):
+        op.mass(tag, *mass)
     
     return
 
 # ADD FRAMES OBJECTS TO THE OPENSEES MODEL
-def add_frames(frames_df, frame_props_df):
-    
-    # function to identify and assign beam and columns their respective tags
-    def determine_tag(label):
-        if 'C' in label:
-            tag = col_transf_tag
-        else:
-            tag = beam_transf_tag
-        return tag
+def add_frames(model_data):
+    frames, sections = model_data.frames, model_data.sections
     
     # construct a coordinate-transformation object, which transforms beam and column element 
     # stiffness and resisting force from the basic system to the global-coordinate system.
     op.geomTransf(coordTransf, col_transf_tag,  1, 0, 0)
     op.geomTransf(coordTransf, beam_transf_tag, 0, 0, 1)
     
-    # add all the frame elements which are oriented with the major axis
-    frames_df[frames_df.Angle == 0.00].apply(lambda row: op.element('ElasticTimoshenkoBeam'     , row.UniqueName,                           \
-                                                         row.PointI                             , row.PointJ,                               \
-                                                         E, G                                   , frame_props_df.loc[row.Prop, 'Area'],     \
-                                                         frame_props_df.loc[row.Prop, 'J']      , frame_props_df.loc[row.Prop, 'I33'] ,     \
-                                                         frame_props_df.loc[row.Prop, 'I22']    , frame_props_df.loc[row.Prop, 'As3'] ,     \
-                                                         frame_props_df.loc[row.Prop, 'As2']    , determine_tag(row.Label)            ,     \
-                                                         '-mass'                                , M, massType), axis='columns')
-    
-        # add all the frame elements which are oriented perpandicular to the major axis by switching the properties in the two aixs
-    frames_df[frames_df.Angle == 90.0].apply(lambda row: op.element('ElasticTimoshenkoBeam'     , row.UniqueName,                           \
-                                                         row.PointI                             , row.PointJ,                               \
-                                                         E, G                                   , frame_props_df.loc[row.Prop, 'Area'],     \
-                                                         frame_props_df.loc[row.Prop, 'J']      , frame_props_df.loc[row.Prop, 'I22'] ,     \
-                                                         frame_props_df.loc[row.Prop, 'I33']    , frame_props_df.loc[row.Prop, 'As2'] ,     \
-                                                         frame_props_df.loc[row.Prop, 'As3']    , determine_tag(row.Label)            ,     \
-                                                         '-mass'                                , M, massType), axis='columns')
+    # lumped mass is the default, newer versions of OpenSees do not accept the -lMass flag
+    mass_args = ['-mass', M] if massType == '-lMass' else ['-mass', M, massType]
+    
+    # section properties of each frame element (A, J, Iz, Iy, Avy, Avz) for the frame elements which are oriented with 
+    # the major axis, the properties in the two axis are switched for the elements oriented perpandicular to the major axis
+    props = sections[frames['section']]
+    major = (frames['angle'] == 0.0)[:, None]
+    props = np.column_stack([props['area'], props['j'], 
+                             np.where(major[:, 0], props['i33'], props['i22']), np.where(major[:, 0], props['i22'], props['i33']), 
+                             np.where(major[:, 0], props['as3'], props['as2']), np.where(major[:, 0], props['as2'], props['as3'])])
+    
+    # assign beam and columns their respective tags
+    transf_tags = np.where(frames['is_column'], col_transf_tag, beam_transf_tag)
+    
+    # only the frame elements oriented at 0 or 90 degrees are added
+    added = (frames['angle'] == 0.0) | (frames['angle'] == 90.0)
+    for tag, node_I, node_J, prop, transf_tag in zip(frames['id'][added].tolist(), frames['node_i'][added].tolist(), 
+                                                     frames['node_j'][added].tolist(), props[added].tolist(), transf_tags[added].tolist()):
+        op.element('ElasticTimoshenkoBeam', tag, node_I, node_J, E, G, *prop, transf_tag, *mass_args)
     return
 
 # ADD NODAL LOADS TO OPENSEES
-def add_nodal_loads(loads_df):
+def add_nodal_loads(model_data):
     
     # create TimeSeries
     op.timeSeries('Linear', 1) 
@@ -145,7 +165,8 @@ def add_nodal_loads(loads_df):
     op.pattern('Plain', 1, 1)  
     
     # apply loads to the mdoel in opensees
-    loads_df.apply(lambda row: op.load(*row[['UniqueName', 'F1', 'F2', 'F3', 'M1', 'M2', 'M3']].tolist()), axis='columns')
+    for tag, force in zip(model_data.loads['id'].tolist(), model_data.loads['force'].tolist()):
+        op.load(tag, *force)
     return
 
 # PERFORM MODAL ANALYSIS IN OPENSEES
@@ -157,83 +178,98 @@ def modal_response(numEigen):
 
 # PLOT MODE SHAPES OPTAINED FROM MODAL ANALYSIS IS OPENSEES
 def plot_opensees_mode_shapes():
+    # the rendering module pulls in matplotlib, import it only when a plot is requested
+    import openseespy.postprocessing.Get_Rendering as opp
+    
     opp.plot_model()
     for i in range(1, numEigen+1):
         opp.plot_modeshape(i, 50)
     return
 
 # ADD NON-LINEAR MOMENT HINGE TO THE MODEL
-def add_beam_hinges(dict_of_hinges, dict_of_hinges_2):
+def add_beam_hinges(model_data, hinge_params=None):
     
-    # obtain nonlinear hinge properties
-    data = read_nonlinear_hinge_properties()
+    # obtain nonlinear hinge properties of each hinge, shape (number of hinges, number of Bilin parameters)
+    if hinge_params is None:
+        hinge_params = get_hinge_params(model_data)
+    
+    add_hinge_elements(model_data, hinge_params)
+    add_hinge_constraints(model_data)
+    return
+
+# ADD THE UNIAXIAL MATERIAL AND ZERO LENGTH ELEMENT OF EACH HINGE TO THE OPENSEES MODEL
+def add_hinge_elements(model_data, hinge_params, mat_tags=None):
+    hinges = model_data.hinges
     
-    #    dict_of_hinges = {real joint: (new joint, zero length element ID, orientation)}
+    # by default the material tag of a hinge is the tag of its zero length element
+    if mat_tags is None:
+        mat_tags = hinges['ele']
     
     # iterate through all the hinges and add the uniaxial material and zero length element to the opensees model
-    for key, value in dict_of_hinges.items():
-        node_R = key
-        node_C = value[0]
-        matTag = value[1]
-        dirn = value[2]
-        
-        row = data.loc[data['Hinge NAME'] == dict_of_hinges_2[matTag]]
-        K0 = row['K0'].values[0]
-        as_Plus = row['as_Plus'].values[0]
-        as_Neg = row['as_Neg'].values[0]
-        My_Plus = row['My_Plus'].values[0]
-        My_Neg = row['My_Neg'].values[0]
-        Lamda_S = row['Lamda_S'].values[0]
-        Lamda_C = row['Lamda_C'].values[0]
-        Lamda_A = row['Lamda_A'].values[0]
-        Lamda_K = row['Lamda_K'].values[0]
-        c_S = row['c_S'].values[0]
-        c_C = row['c_C'].values[0]
-        c_A = row['c_A'].values[0]
-        c_K = row['c_K'].values[0]
-        theta_p_Plus = row['theta_p_Plus'].values[0]
-        theta_p_Neg = row['theta_p_Neg'].values[0]
-        theta_pc_Plus = row['theta_pc_Plus'].values[0]
-        theta_pc_Neg = row['theta_pc_Neg'].values[0]
-        Res_Pos = row['Res_Pos'].values[0]
-        Res_Neg = row['Res_Neg'].values[0]
-        theta_u_Plus = row['theta_u_Plus'].values[0]
-        theta_u_Neg = row['theta_u_Neg'].values[0]
-        D_Plus = row['D_Plus'].values[0]
-        D_Neg = row['D_Neg'].values[0]
-        nFactor = row['nFactor'].values[0]
+    for node_R, node_C, eleTag, matTag, dirn, params in zip(hinges['node'].tolist(), hinges['new_node'].tolist(), hinges['ele'].tolist(), 
+                                                            np.asarray(mat_tags).tolist(), hinges['dirn'].tolist(), hinge_params.tolist()):
         
-        # define the uniaxial material 
-        op.uniaxialMaterial('Bilin'     ,   matTag      ,   K0          ,   as_Plus         ,   as_Neg      ,   My_Plus ,   My_Neg      ,
-                            Lamda_S     ,   Lamda_C     ,   Lamda_A     ,   Lamda_K         ,   c_S         ,   c_C     ,   c_A         ,
-                            c_K         ,   theta_p_Plus,   theta_p_Neg ,   theta_pc_Plus   ,   theta_pc_Neg,   Res_Pos ,   Res_Neg     ,
-                            theta_u_Plus,   theta_u_Neg ,   D_Plus      ,   D_Neg           ,   nFactor
-                            )
+        # define the uniaxial material (parameters in the order of BILIN_PARAMS)
+        op.uniaxialMaterial('Bilin', matTag, *params)
         
         # add the zero length element 
-        op.element('zeroLength', matTag, node_R, node_C, '-mat', matTag, '-dir', dirn, '-doRayleigh', 1)
+        op.element('zeroLength', eleTag, node_R, node_C, '-mat', matTag, '-dir', dirn, '-doRayleigh', 1)
+    return
+
+# REPLACE THE MATERIALS OF ALL THE HINGES, OPENSEES CANNOT REDEFINE A MATERIAL SO NEW (UNUSED) MATERIAL TAGS ARE REQUIRED
+def replace_hinge_materials(model_data, hinge_params, mat_tags):
+    for eleTag in model_data.hinges['ele'].tolist():
+        op.remove('element', eleTag)
+    add_hinge_elements(model_data, hinge_params, mat_tags)
+    return
+
+# CONSTRAIN THE NODES OF EACH HINGE
+def add_hinge_constraints(model_data):
+    hinges = model_data.hinges
+    for node_R, node_C, matTag, dirn in zip(hinges['node'].tolist(), hinges['new_node'].tolist(), hinges['ele'].tolist(), 
+                                            hinges['dirn'].tolist()):
         
         # constrain the nodes connecting the rero lengrth element - all DOFs are constrained except the major bending 
         op.equalDOF(node_R, node_C, 1,2,3,int(9-dirn),6)
-        op.region(key, matTag)
+        op.region(node_R, matTag)
     return
 
+# PARAMETERS OF THE BILIN MATERIAL OF EACH HINGE, SHAPE (NUMBER OF HINGES, NUMBER OF BILIN PARAMETERS)
+def get_hinge_params(model_data, data=None):
+    if data is None:
+        data = read_nonlinear_hinge_properties()
+    
+    # parameters of each hinge name, then gathered for every hinge using the categorical hinge names
+    params = data.set_index('Hinge NAME').loc[model_data.hinge_names, BILIN_PARAMS].values.astype(float)
+    return params[model_data.hinges['hinge']]
+
 # SETUP TO RECORD ANALYSIS OUTPUT
-def setup_recorders(dict_of_disp_nodes, dict_of_rxn_nodes, dict_of_hinges, initialOrTangent, parent_dir):
-    # set up node displacement recorders   
-    dict_of_disp_nodes = [61, 62, 63, 64, 65, 241, 242, 243, 244, 245]
-    for node in dict_of_disp_nodes:
+def setup_recorders(model_data, initialOrTangent, parent_dir):
+    # set up node displacement recorders (only the nodes of interest which are present in the model)
+    list_of_disp_nodes = np.array(recordedDispNodes)[np.isin(recordedDispNodes, model_data.disp_nodes)].tolist()
+    for node in list_of_disp_nodes:
         op.recorder('Node', '-file', f'node_{node}_disp_{initialOrTangent}.out', '-node', node, '-dof', 1,2,3,4,5,6, 'disp')
         
     # set up node rxn recorders    
-    for node in dict_of_rxn_nodes.keys():
+    for node in model_data.rxn_nodes.tolist():
         op.recorder('Node', '-file', f'node_{node}_rxn_{initialOrTangent}.out', '-node', node, '-dof', 1,2,3,4,5,6, 'reaction')
     
     # setup rot spring recorders
-    list_of_hinges = [20271, 20275, 20279, 20283, 20253, 20672, 20673, 20674, 20675, 20676]
+    list_of_hinge_eles = model_data.hinges['ele'].tolist()
+    list_of_hinges = np.array(recordedHinges)[np.isin(recordedHinges, model_data.hinges['ele'])].tolist()
     for rec in list_of_hinges:
         op.recorder('Element', '-file', f'ele_def_{rec}_{initialOrTangent}.out', '-ele', rec, 'deformations')
         op.recorder('Element', '-file', f'ele_frc_{rec}_{initialOrTangent}.out', '-ele', rec, '-dof', 1,2,3,4,5,6, 'force')
+    
+    # setup a stacked recorder for the displacement (X and Y) of each floor (two columns per floor, sorted by elevation)
+    op.recorder('Node', '-file', f'floor_disp_{initialOrTangent}.out', '-node', *model_data.floor_nodes.tolist(), 
+                '-dof', 1, 2, 'disp')
+    
+    # setup stacked recorders for all the rot springs (one column per hinge, in the order of model_data.hinges)
+    # the basic force of the zero length element has the same sign convention as its deformation
+    if list_of_hinge_eles:
+        op.recorder('Element', '-file', f'hinge_def_{initialOrTangent}.out', '-ele', *list_of_hinge_eles, 'deformations')
+        op.recorder('Element', '-file', f'hinge_frc_{initialOrTangent}.out', '-ele', *list_of_hinge_eles, 'basicForce')
     return
 
 # READ NONLINEAR PROPERTIES OF MOMENT HINGES FROM EXCEL SHEET AND FORMAT/ADD DATA FOR OPENSEES DEFINITION
@@ -271,8 +307,9 @@ def read_nonlinear_hinge_properties():
     """
     
     # read properties from Excel
-    data = pd.read_excel(os.path.join(os.path.dirname(os.getcwd()), 'worksheets', 'NL Properties Summary.xlsx'), sheet_name = 'WUF hinge')
-    data.drop(columns = ['IO (θy)','LS (θy)','CP (θy)', 'Beam Standard Section?'], inplace = True)
+    data = pd.read_excel(hinge_props_fpath, sheet_name = 'WUF hinge')
+    # the acceptance criteria (IO, LS, CP) are retained for the post-processing of the hinge rotations
+    data.drop(columns = ['Beam Standard Section?'], inplace = True)
     
     # generate properties for OpenSees Input
     data['K0'] = 1e7
@@ -312,72 +349,75 @@ def read_nonlinear_hinge_properties():
     
     return data
 
-# RUN NLRHA USING RAYLEIGH DAMPING IN ETABS
-def run_dynamic_analysis_w_rayleigh_damping(dict_of_hinges, dict_of_disp_nodes, dict_of_rxn_nodes, zeta, initialOrTangent='initial', parent_dir=os.getcwd()):
-    
-    # remove any existing analysis data
-    op.wipeAnalysis ()
-    
-    # define a time series to add the ground motion
-    op.timeSeries('Path', 2, '-dt', 0.01, '-filePath', 'BM68elc.acc', '-factor', 3.0*g)
-    op.pattern('UniformExcitation', 2, 1, '-accel', 2)
-    
-    # uncomment/comment the code below to run bideirectional/unidirectional ground motion analysis
-#    op.timeSeries('Path', 3, '-dt', 0.01, '-filePath', 'BM68elc.acc', '-factor', 1.0*g)
-#    op.pattern('UniformExcitation', 3, 2, '-accel', 3)
-    
-    op.constraints('Transformation')
-    op.numberer('RCM')
-    op.system('UmfPack')
-#    op.test('NormDispIncr', 1e-2, 100000, 0, 0)
-    op.test('EnergyIncr', 1e-4, 1e4, 0, 2)
+# SCALE FACTOR OF THE GROUND MOTION IN EACH DIRECTION, scale_factor IS A NUMBER (SAME FACTOR IN ALL THE DIRECTIONS) OR A 
+# DICT WITH THE FACTOR OF EACH DIRECTION e.g. {1: 3.0, 2: 1.0}
+def get_scale_factors(scale_factor, directions=(1,)):
+    if isinstance(scale_factor, dict):
+        missing = [dirn for dirn in directions if dirn not in scale_factor]
+        if missing:
+            raise ValueError(f'No scale factor given for the ground motion directions {missing}')
+        return {dirn: float(scale_factor[dirn]) for dirn in directions}
+    return {dirn: float(scale_factor) for dirn in directions}
+
+# ADD THE GROUND MOTION TO THE MODEL (UNIFORM EXCITATION IN EACH OF THE GIVEN DIRECTIONS)
+def add_ground_motion(record_file, scale_factor, directions=(1,)):
+    # define a time series and a pattern for each direction, use directions=(1, 2) to run bidirectional ground motion analysis
+    # and e.g. scale_factor={1: 3.0, 2: 1.0} to scale the record differently in each direction
+    for dirn, factor in get_scale_factors(scale_factor, directions).items():
+        op.timeSeries('Path', gmTags[dirn], '-dt', recordDt, '-filePath', record_file, '-factor', factor*g)
+        op.pattern('UniformExcitation', gmTags[dirn], dirn, '-accel', gmTags[dirn])
+    return
 
-    # available set of algorithms if the default fails
-    backup_algos = {'Modified Newton w/ Initial Stiffness': ['ModifiedNewton', '-initial'],
-                    'Newton with Line Search': ['NewtonLineSearch', 'tol', 1e-3, 'maxIter', 1e5, 'maxEta', 10, 'minEta', 1e-2],
-                    }
+# DEFINE THE SOLUTION STRATEGY OF THE RESPONSE HISTORY ANALYSIS
+def define_transient_analysis(constraints=('Transformation',), numberer=None, system=None):
+    op.constraints(*constraints)
+    op.numberer(numberer or numbererType)
+    op.system(system or systemType)
+#    op.test('NormDispIncr', 1e-2, 100000, 0, 0)
+    op.test(*testArgs)
     
     # define the default algorithm to be used for this analysis
-    op.algorithm('KrylovNewton', 'maxDim', 3)
+    op.algorithm(*defaultAlgoArgs)
     
     # define the integrator to be used for this analysis from the set of available integrators in opensees
-    alpha = 0.67
-    op.integrator('HHT', alpha)         # can be either of: ('HHT', alpha), ('Newmark', 0.5, 0.25)
+    op.integrator('HHT', hhtAlpha)      # can be either of: ('HHT', alpha), ('Newmark', 0.5, 0.25)
 
     # define the type of analysis to be performed
     op.analysis('Transient')
-    
-    # obtain the modal analysis
-    eigenValues = modal_response(numEigen)
-    # get periods from the modal analsis
-    periods = 2 * math.pi / np.sqrt(eigenValues)
+    return
 
+# ADD RAYLEIGH DAMPING TO THE MODEL USING THE EIGENVALUE OF THE FIRST MODE
+def add_rayleigh_damping(eigenValues, zeta, initialOrTangent, verbose=True):
     w1 = (eigenValues[0]**0.5)
-    w2 = (eigenValues[0]**0.5)/0.384
+    w2 = (eigenValues[0]**0.5)/rayleighFreqRatio
     a0 = zeta*2*w1*w2/(w1+w2)
     a1 = zeta*2/(w1+w2)
     
-    print('\nRayleigh Damping Coefficients:')
-    print(f'\talpha: {a0}')
-    print(f'\tbeta : {a1}\n')
+    if verbose:
+        print('\nRayleigh Damping Coefficients:')
+        print(f'\talpha: {a0}')
+        print(f'\tbeta : {a1}\n')
     
     if initialOrTangent == 'tangent':
         op.rayleigh(a0, a1, 0, 0)
     else: 
         op.rayleigh(a0, 0, a1, 0)
+    return a0, a1
+
+# RUN THE STEPS OF THE RESPONSE HISTORY ANALYSIS, RETURNS A NON ZERO VALUE IF THE ANALYSIS COULD NOT BE COMPLETED
+def run_execution_loop(total_run_time, time_step, metrics=None, verbose=True):
     
-    # setup to record analysis data
-    setup_recorders(dict_of_disp_nodes, dict_of_rxn_nodes, dict_of_hinges, initialOrTangent, parent_dir)
-    
-    total_run_time = 50 # seconds
-    time_step = 0.01 # seconds
+    # total_run_time and time_step are in seconds
     total_num_of_steps = total_run_time / time_step
     
     # default initialization of constants to be used in the execution loop
     failed = 0
     time = 0
     algo = 'Krylov-Newton'
-    pbar = tqdm(total=total_num_of_steps)
+    from tqdm import tqdm
+    pbar = tqdm(total=total_num_of_steps, disable=not verbose)
+    if metrics is not None:
+        metrics.start(total_run_time)
     
     # execution loop
     # this execution loop tries to use krylov-Newton until it works, when this fails it iterate through set of 
@@ -387,10 +427,14 @@ def run_dynamic_analysis_w_rayleigh_damping(dict_of_hinges, dict_of_disp_nodes,
         failed = op.analyze(1, time_step)
         
         if failed:
-            print(f'\n{algo} failed. Trying other algorithms...')
+            if verbose:
+                print(f'\n{algo} failed. Trying other algorithms...')
             
-            for alg, algo_args in backup_algos.items():
-                print(f'\nTrying {alg}...')
+            for alg, algo_args in backupAlgos.items():
+                if verbose:
+                    print(f'\nTrying {alg}...')
+                if metrics is not None:
+                    metrics.fallback(alg)
                 op.algorithm(*algo_args)
                 failed = op.analyze(1, time_step)
                 
@@ -398,23 +442,94 @@ def run_dynamic_analysis_w_rayleigh_damping(dict_of_hinges, dict_of_disp_nodes,
                     continue
                 else:
                     algo = 'Krylov-Newton'
-                    print(f'\n{alg} worked.\n\nMoving back to {algo}')
-                    op.algorithm('KrylovNewton', 'maxDim', 3)
+                    if verbose:
+                        print(f'\n{alg} worked.\n\nMoving back to {algo}')
+                    op.algorithm(*defaultAlgoArgs)
+                    if metrics is not None:
+                        metrics.recovered()
                     break
                 
-            print(''.center(100, '-'))
+            if verbose:
+                print(''.center(100, '-'))
             
         pbar.update(1)
         time = op.getTime()
+        if metrics is not None:
+            metrics.step(time, op.testIter())
     
-    op.wipe()
+    pbar.close()
+    if metrics is not None:
+        metrics.finish(failed)
+    
+    # failed is non-zero if the loop stopped because no algorithm converged, time is the analysis time reached
+    return failed, time
+
+# RUN NLRHA USING RAYLEIGH DAMPING IN ETABS
+def run_dynamic_analysis_w_rayleigh_damping(model_data, zeta, initialOrTangent='initial', parent_dir=os.getcwd(),
+                                            total_run_time=50, time_step=0.01, record_file='BM68elc.acc', scale_factor=3.0, 
+                                            eigenValues=None, wipe_model=True, metrics=None, edp_stream=None, directions=(1,)):
+    
+    # scale_factor is a number or a dict with the factor of each of the directions (see get_scale_factors)
+    
+    # remove any existing analysis data
+    op.wipeAnalysis ()
+    
+    add_ground_motion(record_file, scale_factor, directions)
+    define_transient_analysis()
+    
+    # obtain the modal analysis (unless the eigenvalues of the model are already known)
+    if eigenValues is None:
+        eigenValues = modal_response(numEigen)
+    # get periods from the modal analsis
+    periods = 2 * math.pi / np.sqrt(eigenValues)
+    
+    add_rayleigh_damping(eigenValues, zeta, initialOrTangent)
+    
+    # setup to record analysis data
+    setup_recorders(model_data, initialOrTangent, parent_dir)
+    
+    # envelopes of the response updated from the recorder files while the analysis runs (see streaming_postprocessor)
+    if edp_stream is not None:
+        edp_stream.start(initialOrTangent)
+    
+    try:
+        failed, end_time = run_execution_loop(total_run_time, time_step, metrics)
+    finally:
+        if wipe_model:
+            op.wipe()
+        else:
+            reset_model()
+        
+        # the recorders are closed, so only the last rows remain to be read
+        if edp_stream is not None:
+            edp_stream.finish()
     
     # move output files to results directory
     list_of_out_files = [fname for fname in os.listdir() if fname.endswith('.out')]
     for fname in list_of_out_files:
         shutil.move(os.path.join(os.getcwd(), fname), os.path.join(parent_dir, fname))
     
-    return periods, eigenValues
+    # a failed analysis is truncated at the time reached, its results must not be used as the response to the full record
+    status = {'failed': bool(failed), 'time': end_time}
+    return periods, eigenValues, status
+
+# REMOVE THE ANALYSIS, RECORDERS AND GROUND MOTION AND REVERT THE MODEL TO ITS INITIAL STATE SO IT CAN BE ANALYZED AGAIN
+def reset_model():
+    op.wipeAnalysis()
+    op.remove('recorders')
+    for tag in gmTags.values():
+        op.remove('loadPattern', tag)
+        op.remove('timeSeries', tag)
+    op.reset()
+    op.setTime(0.0)
+    return
+
+# SETTINGS THAT AFFECT THE OPENSEES MODEL AND THE ANALYSIS RESULTS
+def get_analysis_settings():
+    return {'g': g, 'M': M, 'E': E, 'G': G, 'numEigen': numEigen, 'rigid_dia': rigid_dia, 'coordTransf': coordTransf, 
+            'massType': massType, 'numbererType': numbererType, 'systemType': systemType, 'testArgs': testArgs, 
+            'hhtAlpha': hhtAlpha, 'recordDt': recordDt, 'rayleighFreqRatio': rayleighFreqRatio, 
+            'defaultAlgoArgs': defaultAlgoArgs, 'backupAlgos': backupAlgos}
 
 # COMPARES MODAL ANALYSIS PERIODS OBTAINED FROM ETABS AND OPENSEES
 def perform_modal_analysis_and_comparison(etabs_periods):
@@ -432,15 +547,17 @@ def perform_modal_analysis_and_comparison(etabs_periods):
     return
 
 # EXECUTE ANALYSIS IN OPENSEES
-def run_opensees_model(dict_of_hinges={}, dict_of_disp_nodes={}, dict_of_rxn_nodes={}, zeta=0.05, initialOrTangent='', parent_dir=os.getcwd()):
+def run_opensees_model(model_data, zeta=0.05, initialOrTangent='', parent_dir=os.getcwd()):
 #    opp.plot_model()
-    periods, eigenValues = run_dynamic_analysis_w_rayleigh_damping(dict_of_hinges, dict_of_disp_nodes, dict_of_rxn_nodes, zeta, initialOrTangent, parent_dir)
+    periods, eigenValues, status = run_dynamic_analysis_w_rayleigh_damping(model_data, zeta, initialOrTangent, parent_dir)
+    if status['failed']:
+        print(f'\nAnalysis failed at t = {status["time"]:.3f} s, the results are truncated')
     return periods, eigenValues
 
 # SETUP OPENSEES MODEL
-def setup_opensees_model(joints_df, frames_df, frame_props_df, pts_loads_df, mass_df, dict_of_hinges, dict_of_hinges_2, list_new_joints):
+def setup_opensees_model(model_data, hinge_params=None):
     initiate_model()
-    add_nodes(joints_df.copy(), mass_df.copy(), list_new_joints, dict_of_hinges)
-    add_frames(frames_df.copy(), frame_props_df.copy())
-    add_beam_hinges(dict_of_hinges, dict_of_hinges_2)
+    add_nodes(model_data)
+    add_frames(model_data)
+    add_beam_hinges(model_data, hinge_params)
     return
@@ -0,0 +1,254 @@
+'''
+    MIT License
+    
+    Copyright (c) 2020 OpenSeesPro
+    
+    Permission is hereby granted, free of charge, to any person obtaining a copy
+    of this software and associated documentation files (the "Software"), to deal
+    in the Software without restriction, including without limitation the rights
+    to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+    copies of the Software, and to permit persons to whom the Software is
+    furnished to do so, subject to the following conditions:
+    
+    The above copyright notice and this permission notice shall be included in all
+    copies or substantial portions of the Software.
+    
+    THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+    IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+    FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+    AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+    LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+    OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+    SOFTWARE.
+
+    Developed by:
+        Ayush Singhania (ayushs@stanford.edu)
+        Pearl Ranchal (ranchal@berkeley.edu)
+      
+    Publication:
+        Goings, C. B., Singhania, A., Ranchal, P., Weaver B., 2020, “Industrial 
+        Scale NLRH Analysis Using OpenSees and Comparison with Perform3D,” 
+        Proceedings of 2020 SEAOC Virtual Convention, SEAOC, CA
+
+    
+    Description of the script - 
+        This is a supporting script to compare the response obtained with OpenSees
+        with the response obtained with Perform3D (periods, story drifts, base
+        shear and hinge rotations). The histories of both programs are resampled
+        on the same time grid and all the error metrics of a run are computed in
+        one vectorized pass over a single (steps x items) array.
+        
+        The Perform3D histories are read from the tables exported from Perform3D
+        (time in the first column and one column per item, with the labels in the
+        header line). The OpenSees items (story drift, base shear direction and 
+        hinge ID) are matched with the columns of these tables by an item map, a
+        csv file with the Perform3D label of each OpenSees item. The default map
+        uses the drift names of the Perform3D model, the base cut section and,
+        for the hinges, the Perform3D element (group, element number and end)
+        read from the structure file. Write it with --write-item-map and edit
+        the labels to the headers of the exported tables if they differ.
+'''
+
+import os
+import sys
+import argparse
+import numpy as np
+import pandas as pd
+from campaign_statistics import open_run
+from perform3d_utilities import map_hinges_to_perform3d
+
+# quantities compared for each run
+QUANTITIES = ['drift', 'base_shear', 'hinge_rotation']
+
+# READ A TABLE OF HISTORIES EXPORTED FROM PERFORM3D, RETURNS THE TIME, THE LABELS AND THE VALUES (STEPS x ITEMS)
+def read_perform3d_histories(fpath):
+    # the columns are separated by commas (csv) or by white space
+    with open(fpath) as f:
+        header = f.readline()
+    delimiter = ',' if ',' in header else None
+    labels = [label.strip() for label in header.split(delimiter)[1:]]
+    
+    data = np.loadtxt(fpath, delimiter=delimiter, skiprows=1, ndmin=2)
+    return data[:, 0], np.array(labels), data[:, 1:]
+
+# columns of the item map (one row per OpenSees item, the items with an empty Perform3D label are not compared)
+ITEM_MAP_COLUMNS = ['Quantity', 'OpenSees Item', 'Perform3D Label']
+ITEM_MAP_FNAME = 'perform3d_items.csv'
+
+# structure section of the base shear in the shipped Perform3D model
+BASE_SECTION = 'Frame Base Cut'
+
+# ITEMS OF EACH QUANTITY IN THE OPENSEES RESULTS (IN THE ORDER OF THE COLUMNS OF THE FLATTENED ARRAYS)
+def opensees_items(model_data):
+    floors = np.arange(1, len(model_data.floor_levels) + 1)
+    return {'drift': np.array([f'Story{floor} H{direction}' for floor in floors.tolist() for direction in [1, 2]]),
+            'base_shear': np.array(['H1', 'H2']),
+            'hinge_rotation': model_data.hinges['ele'].astype(str),
+            }
+
+# DEFAULT ITEM MAP: DRIFT NAMES AND BASE CUT OF THE SHIPPED PERFORM3D MODEL, HINGES AT THE END OF THEIR PERFORM3D ELEMENT
+def default_item_map(model_data, nodes=None, elements=None):
+    items = opensees_items(model_data)
+    
+    # the drift of the story below level Lnn is named 'Lnn_H1 Drift' (the first story is below L02)
+    floors = np.arange(1, len(model_data.floor_levels) + 1)
+    drift = [f'L{floor + 1:02d}_H{direction} Drift' for floor in floors.tolist() for direction in [1, 2]]
+    
+    # hinges: '<element group> <element number> <end>' e.g. 'ElemSteelBeam 17 I' (empty if the element is not found)
+    hinges = map_hinges_to_perform3d(model_data, nodes, elements)
+    hinge = np.where(hinges['Element'] > 0, hinges['Group'] + ' ' + hinges['Element'].astype(str) + ' ' + hinges['End'], '')
+    
+    labels = {'drift': drift, 'base_shear': [f'{BASE_SECTION} H1', f'{BASE_SECTION} H2'], 'hinge_rotation': hinge}
+    return pd.DataFrame({'Quantity': np.concatenate([[quantity] * len(items[quantity]) for quantity in QUANTITIES]), 
+                         'OpenSees Item': np.concatenate([items[quantity] for quantity in QUANTITIES]),
+                         'Perform3D Label': np.concatenate([np.asarray(labels[quantity], dtype=str) for quantity in QUANTITIES])})
+
+def write_item_map(fpath, item_map):
+    item_map[ITEM_MAP_COLUMNS].to_csv(fpath, index=False)
+    return
+
+def read_item_map(fpath):
+    item_map = pd.read_csv(fpath, dtype=str, keep_default_na=False)
+    missing = [col for col in ITEM_MAP_COLUMNS if col not in item_map.columns]
+    if missing:
+        raise ValueError(f'Columns {missing} not found in the item map {fpath}')
+    return item_map
+
+# PERFORM3D LABEL OF EACH ITEM OF EACH QUANTITY IN THE OPENSEES RESULTS (EMPTY IF THE ITEM IS NOT IN THE ITEM MAP)
+def opensees_labels(model_data, item_map):
+    labels = {}
+    for quantity, items in opensees_items(model_data).items():
+        rows = item_map[item_map['Quantity'] == quantity]
+        labels[quantity] = pd.Series(rows['Perform3D Label'].values, index=rows['OpenSees Item'].values).reindex(items).fillna('').values.astype(str)
+    return labels
+
+# RESAMPLE HISTORIES (ONE ROW PER TIME) ON A TIME GRID, VECTORIZED OVER ALL THE COLUMNS
+def resample(time, values, grid):
+    i0 = np.clip(np.searchsorted(time, grid, side='right') - 1, 0, len(time) - 2)
+    weight = np.clip((grid - time[i0]) / (time[i0 + 1] - time[i0]), 0.0, 1.0)[:, None]
+    return values[i0] + (values[i0 + 1] - values[i0]) * weight
+
+# ERROR METRICS OF EACH COLUMN OF TWO STACKS OF HISTORIES ON THE SAME TIME GRID, SHAPE (STEPS x ITEMS)
+def history_errors(os_values, p3d_values):
+    os_peak = np.abs(os_values).max(axis=0)
+    p3d_peak = np.abs(p3d_values).max(axis=0)
+    
+    with np.errstate(invalid='ignore', divide='ignore'):
+        # root mean square of the difference normalized by the Perform3D peak
+        nrmse = np.sqrt(np.mean((os_values - p3d_values)**2, axis=0)) / p3d_peak
+        
+        # correlation coefficient of the two histories
+        os_dev = os_values - os_values.mean(axis=0)
+        p3d_dev = p3d_values - p3d_values.mean(axis=0)
+        correlation = (os_dev * p3d_dev).sum(axis=0) / np.sqrt((os_dev**2).sum(axis=0) * (p3d_dev**2).sum(axis=0))
+        
+        return {'OpenSees Peak': os_peak, 'Perform3D Peak': p3d_peak, 'Peak Ratio': os_peak / p3d_peak, 
+                'Peak Error (%)': (os_peak / p3d_peak - 1) * 100, 'NRMSE': nrmse, 'Correlation': correlation}
+
+# COMPARE THE PERIODS OF THE MODES
+def compare_periods(os_periods, p3d_periods):
+    num_modes = min(len(os_periods), len(p3d_periods))
+    os_periods, p3d_periods = np.asarray(os_periods[:num_modes]), np.asarray(p3d_periods[:num_modes])
+    return pd.DataFrame({'OpenSees': os_periods, 'Perform3D': p3d_periods, 'Ratio': os_periods / p3d_periods, 
+                         'Error (%)': (os_periods / p3d_periods - 1) * 100}, 
+                        index=pd.Index(np.arange(1, num_modes + 1), name='Mode'))
+
+# COMPARE ALL THE HISTORIES OF A RUN
+def compare_run(os_time, os_histories, os_labels, p3d_times, p3d_histories, p3d_labels, os_items=None):
+    """
+    os_time                     times of the rows of the OpenSees histories
+    os_histories                {quantity: array (steps x items)} obtained with OpenSees
+    os_labels                   {quantity: Perform3D labels of the items} see opensees_labels, the empty labels are not 
+                                compared
+    os_items                    {quantity: OpenSees items} used as the index of the results (the labels if None)
+    p3d_times                   {quantity: times of the rows} of each table exported from Perform3D
+    p3d_histories, p3d_labels   same as os_histories and os_labels for Perform3D, the items are matched with the OpenSees 
+                                items by their labels
+    
+    returns {quantity: DataFrame of the error metrics of each item}, the items without a match are left out
+    """
+    quantities = [quantity for quantity in QUANTITIES if quantity in os_histories and quantity in p3d_histories]
+    if not quantities:
+        raise ValueError(f'No quantity to compare, OpenSees has {sorted(os_histories)} and Perform3D has {sorted(p3d_histories)}')
+    
+    comparison = {}
+    for quantity in quantities:
+        # columns matched by their labels
+        os_quantity_labels = np.asarray(os_labels[quantity])
+        pos = np.where(os_quantity_labels != '', pd.Index(p3d_labels[quantity]).get_indexer(os_quantity_labels), -1)
+        matched = np.flatnonzero(pos >= 0)
+        if not len(matched):
+            raise ValueError(f'None of the {quantity} labels of OpenSees {os_quantity_labels[:10].tolist()} match the labels '
+                             f'of the Perform3D table {np.asarray(p3d_labels[quantity])[:10].tolist()} (first 10 of each)')
+        unmatched = os_quantity_labels[pos < 0]
+        if len(unmatched):
+            print(f'{len(unmatched)} {quantity} items of OpenSees are not in the Perform3D table and are left out: '
+                  f'{unmatched[:10].tolist()}{" ..." if len(unmatched) > 10 else ""}')
+        
+        # common time grid: the OpenSees times within the duration of both runs (each Perform3D table has its own times)
+        p3d_time = p3d_times[quantity]
+        grid = os_time[(os_time >= max(os_time[0], p3d_time[0])) & (os_time <= min(os_time[-1], p3d_time[-1]))]
+        errors = history_errors(resample(os_time, np.asarray(os_histories[quantity])[:, matched], grid), 
+                                resample(p3d_time, np.asarray(p3d_histories[quantity])[:, pos[matched]], grid))
+        if os_items is None:
+            comparison[quantity] = pd.DataFrame(errors, index=pd.Index(os_quantity_labels[matched], name='Item'))
+        else:
+            comparison[quantity] = pd.DataFrame({'Perform3D Label': os_quantity_labels[matched], **errors}, 
+                                                index=pd.Index(np.asarray(os_items[quantity])[matched], name='OpenSees Item'))
+    return comparison
+
+# COMPARE AN OPENSEES RUN (ARRAYS EXPORTED BY campaign_statistics) WITH THE TABLES EXPORTED FROM PERFORM3D
+def compare_with_perform3d(model_data, run_dir, p3d_fpaths, os_periods=None, p3d_periods=None, item_map=None):
+    """
+    run_dir             directory of the OpenSees run (with the arrays written by campaign_statistics.export_run_arrays)
+    p3d_fpaths          {quantity: path of the table exported from Perform3D}
+    item_map            Perform3D label of each OpenSees item (see read_item_map), default_item_map if None
+    """
+    if item_map is None:
+        item_map = default_item_map(model_data)
+    
+    meta, arrays = open_run(run_dir)
+    os_time = meta['time_step'] * np.arange(1, meta['num_steps'] + 1)
+    os_histories = {quantity: np.asarray(arrays[quantity]).reshape(meta['num_steps'], -1) for quantity in QUANTITIES}
+    
+    # the tables may be exported with different time steps or durations, each quantity keeps its own times
+    p3d_times, p3d_histories, p3d_labels = {}, {}, {}
+    for quantity, fpath in p3d_fpaths.items():
+        p3d_times[quantity], p3d_labels[quantity], p3d_histories[quantity] = read_perform3d_histories(fpath)
+    
+    comparison = compare_run(os_time, os_histories, opensees_labels(model_data, item_map), p3d_times, p3d_histories, 
+                             p3d_labels, opensees_items(model_data))
+    if os_periods is not None and p3d_periods is not None:
+        comparison['periods'] = compare_periods(os_periods, p3d_periods)
+    return comparison
+
+if __name__ == '__main__':
+    from general_utilities import load_model_snapshot
+    
+    parser = argparse.ArgumentParser(description='Compare an OpenSees run with the results exported from Perform3D.')
+    parser.add_argument('snapshot', help='model snapshot (see general_utilities.save_model_snapshot)')
+    parser.add_argument('run_dir', help='directory of the OpenSees run with the exported arrays')
+    for quantity in QUANTITIES:
+        parser.add_argument(f'--{quantity.replace("_", "-")}', help=f'table of the {quantity} histories exported from Perform3D')
+    parser.add_argument('--item-map', default=None, 
+                        help=f'csv file with the Perform3D label of each OpenSees item (default: <run_dir>/{ITEM_MAP_FNAME} '
+                             'if it exists, otherwise the default map)')
+    parser.add_argument('--write-item-map', action='store_true', 
+                        help='write the default item map to <run_dir>/' + ITEM_MAP_FNAME + ' (to be edited) and exit')
+    args = parser.parse_args()
+    
+    model_data = load_model_snapshot(args.snapshot)
+    item_map_fpath = args.item_map or os.path.join(args.run_dir, ITEM_MAP_FNAME)
+    if args.write_item_map:
+        write_item_map(item_map_fpath, default_item_map(model_data))
+        print(f'Item map written to {item_map_fpath}')
+        sys.exit(0)
+    item_map = read_item_map(item_map_fpath) if os.path.exists(item_map_fpath) else None
+    
+    p3d_fpaths = {quantity: getattr(args, quantity) for quantity in QUANTITIES if getattr(args, quantity)}
+    comparison = compare_with_perform3d(model_data, args.run_dir, p3d_fpaths, item_map=item_map)
+    with pd.ExcelWriter(os.path.join(args.run_dir, 'perform3d_comparison.xlsx')) as writer:
+        for quantity, df in comparison.items():
+            df.to_excel(writer, sheet_name=quantity)
+            print(f'{quantity}:\n{df.describe().loc[["mean", "min", "max"]]}\n')
+    sys.exit(0)
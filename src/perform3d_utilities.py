@@ -0,0 +1,237 @@
+'''
+    MIT License
+    
+    Copyright (c) 2020 OpenSeesPro
+    
+    Permission is hereby granted, free of charge, to any person obtaining a copy
+    of this software and associated documentation files (the "Software"), to deal
+    in the Software without restriction, including without limitation the rights
+    to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+    copies of the Software, and to permit persons to whom the Software is
+    furnished to do so, subject to the following conditions:
+    
+    The above copyright notice and this permission notice shall be included in all
+    copies or substantial portions of the Software.
+    
+    THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+    IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+    FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+    AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+    LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+    OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+    SOFTWARE.
+
+    Developed by:
+        Ayush Singhania (ayushs@stanford.edu)
+        Pearl Ranchal (ranchal@berkeley.edu)
+      
+    Publication:
+        Goings, C. B., Singhania, A., Ranchal, P., Weaver B., 2020, “Industrial 
+        Scale NLRH Analysis Using OpenSees and Comparison with Perform3D,” 
+        Proceedings of 2020 SEAOC Virtual Convention, SEAOC, CA
+
+    
+    Description of the script - 
+        This is a supporting script to read the binary files of the Perform3D 
+        model (models/Perform3D) into typed numpy arrays and to match its nodes
+        and elements with the joints and hinges of the OpenSees model. The tables
+        are memory mapped, so only the records that are used are read from the
+        disk.
+
+'''
+
+import os
+import numpy as np
+import pandas as pd
+
+# directory of the Perform3D model shipped with the library
+P3D_MODEL_DIR = os.path.join(os.path.dirname(os.getcwd()), 'models', 'Perform3D', 'p2006_E2O')
+
+# name of the structure file (nodes, diaphragms, elements, ...) in the model directory
+STRUCTURE_FNAME = 'PF3DS'
+
+# layout of the header of the structure file (Perform3D version 7)
+HEADER_DTYPE = np.dtype([('version', 'S8'), ('name', 'S12'), ('description', 'S60'), ('flag', '<i2'), ('pad0', 'V4'), 
+                         ('g', '<f4'), ('pad1', 'V38'), ('units', 'S6'), ('max_node', '<i4'), ('num_nodes', '<i4'), 
+                         ('pad2', 'V4')])
+
+# layout of a node record
+#   node                node number
+#   xyz                 coordinates
+#   diaphragm           number of the diaphragm the node is slaved to (0 if none)
+#   restraints          restrained DOFs (UX, UY, UZ, RX, RY, RZ)
+NODE_DTYPE = np.dtype([('seq', '<i4'), ('node', '<i4'), ('xyz', '<f8', (3,)), ('pad0', 'V2'), ('diaphragm', '<i2'), 
+                       ('pad1', 'V23'), ('supported', 'u1'), ('pad2', 'V1'), ('restraints', 'u1', (6,)), ('pad3', 'V17')])
+
+# layout of a diaphragm record, the diaphragm table follows the node table (after an int16 count and an int16 flag)
+DIAPHRAGM_DTYPE = np.dtype([('name', 'S40'), ('number', '<i4'), ('pad0', 'V36')])
+
+# the header is followed by a default node record (not a node of the model)
+NODE_TABLE_OFFSET = HEADER_DTYPE.itemsize + NODE_DTYPE.itemsize
+
+# the diaphragm table is followed by the nodal mass table: a header (8 bytes and the name of the mass pattern) and one 
+# record of 6 float32 per node number from 0 to max_node
+MASS_HEADER_SIZE = 48
+MASS_RECORD_SIZE = 24
+
+# layout of an element group record, the group table follows the mass table (after an int16 count and 4 bytes)
+#   type                kind of the elements of the group (2 beam, 3 column)
+#   number              number of the group
+#   first, end          range [first, end) of the rows of the elements of the group in the element table
+ELEMENT_GROUP_DTYPE = np.dtype([('name', 'S40'), ('type', '<i2'), ('number', '<i2'), ('first', '<i4'), ('end', '<i4'), 
+                                ('pad0', 'V10'), ('scale', '<f4'), ('pad1', 'V10')])
+
+# layout of an element record, the element table follows the group table (after a header of 104 bytes), the elements of
+# all the groups are in one table, with an unused record between two groups
+#   group               number of the group of the element (0 for the unused records)
+#   element             number of the element in its group
+#   node_i, node_j      nodes of the element, given by their position in the node table counted from the default node
+#                       record (see ELEMENT_NODE_BASE)
+#   compound            compound component of the element (numbered in the order of the component table)
+ELEMENT_DTYPE = np.dtype([('group', '<i2'), ('element', '<i4'), ('node_i', '<i4'), ('node_j', '<i4'), ('pad0', 'V8'), 
+                          ('orientation', '<i4'), ('pad1', 'V16'), ('compound', '<i4'), ('pad2', 'V26'), 
+                          ('end_zones', '<f4', (2,)), ('pad3', 'V12')])
+ELEMENT_TABLE_HEADER_SIZE = 104
+
+# the node position 1 is the default node record, so the row of a node in the table of read_nodes is position - 2
+ELEMENT_NODE_BASE = 2
+
+# READ THE HEADER OF THE STRUCTURE FILE
+def read_structure_header(model_dir=P3D_MODEL_DIR):
+    header = np.fromfile(os.path.join(model_dir, STRUCTURE_FNAME), dtype=HEADER_DTYPE, count=1)[0]
+    if not header['version'].strip().startswith(b'7.'):
+        raise ValueError(f'Unsupported Perform3D structure file version: {header["version"].decode().strip()}')
+    return {'version': header['version'].decode().strip(), 'name': header['name'].decode().strip(), 
+            'description': header['description'].decode().strip(), 'g': round(float(header['g']), 4), 
+            'units': header['units'].decode().strip(), 'max_node': int(header['max_node']), 
+            'num_nodes': int(header['num_nodes'])}
+
+# MEMORY MAP THE NODE TABLE OF THE STRUCTURE FILE, RAISES ValueError IF THE LAYOUT IS NOT THE EXPECTED ONE
+def read_nodes(model_dir=P3D_MODEL_DIR):
+    header = read_structure_header(model_dir)
+    nodes = np.memmap(os.path.join(model_dir, STRUCTURE_FNAME), dtype=NODE_DTYPE, mode='r', offset=NODE_TABLE_OFFSET, 
+                      shape=(header['num_nodes'],))
+    
+    # the records are numbered consecutively, any other value means that the layout is different
+    if not np.array_equal(nodes['seq'], np.arange(1, header['num_nodes'] + 1)):
+        raise ValueError('Unexpected layout of the node table of the Perform3D structure file')
+    return nodes
+
+# READ THE DIAPHRAGM TABLE (NAMES AND NUMBERS) OF THE STRUCTURE FILE
+def read_diaphragms(model_dir=P3D_MODEL_DIR):
+    header = read_structure_header(model_dir)
+    offset = NODE_TABLE_OFFSET + header['num_nodes'] * NODE_DTYPE.itemsize
+    fpath = os.path.join(model_dir, STRUCTURE_FNAME)
+    
+    num_diaphragms = int(np.fromfile(fpath, dtype='<i2', count=1, offset=offset)[0])
+    diaphragms = np.memmap(fpath, dtype=DIAPHRAGM_DTYPE, mode='r', offset=offset + 4, shape=(num_diaphragms,))
+    if not np.array_equal(diaphragms['number'], np.arange(1, num_diaphragms + 1)):
+        raise ValueError('Unexpected layout of the diaphragm table of the Perform3D structure file')
+    return {number: name.decode().strip() for number, name in zip(diaphragms['number'].tolist(), diaphragms['name'])}
+
+# MEMORY MAP THE ELEMENT GROUPS AND THE ELEMENT TABLE OF THE STRUCTURE FILE
+def read_elements(model_dir=P3D_MODEL_DIR):
+    """
+    returns {group number: group name} and the elements of all the groups (ELEMENT_DTYPE, without the unused records) with
+    their nodes given as Perform3D node numbers, raises ValueError if the layout is not the expected one
+    """
+    header = read_structure_header(model_dir)
+    fpath = os.path.join(model_dir, STRUCTURE_FNAME)
+    
+    # the group table follows the diaphragm and the mass tables
+    offset = NODE_TABLE_OFFSET + header['num_nodes'] * NODE_DTYPE.itemsize
+    num_diaphragms = int(np.fromfile(fpath, dtype='<i2', count=1, offset=offset)[0])
+    offset += 4 + num_diaphragms * DIAPHRAGM_DTYPE.itemsize + MASS_HEADER_SIZE + (header['max_node'] + 1) * MASS_RECORD_SIZE
+    num_groups = int(np.fromfile(fpath, dtype='<i2', count=1, offset=offset)[0])
+    groups = np.fromfile(fpath, dtype=ELEMENT_GROUP_DTYPE, count=num_groups, offset=offset + 6)
+    if not np.array_equal(groups['number'], np.arange(1, num_groups + 1)):
+        raise ValueError('Unexpected layout of the element group table of the Perform3D structure file')
+    
+    # rows 1 to end - 1 of the element table, the rows of each group are numbered from 1
+    offset += 6 + num_groups * ELEMENT_GROUP_DTYPE.itemsize + ELEMENT_TABLE_HEADER_SIZE
+    table = np.memmap(fpath, dtype=ELEMENT_DTYPE, mode='r', offset=offset, shape=(int(groups['end'].max()) - 1,))
+    rows = []
+    for group in groups:
+        group_rows = np.arange(group['first'], group['end']) - 1
+        if not (np.all(table['group'][group_rows] == group['number']) and 
+                np.array_equal(table['element'][group_rows], np.arange(1, len(group_rows) + 1))):
+            raise ValueError(f'Unexpected layout of the elements of the group {group["name"].decode().strip()} of the '
+                             'Perform3D structure file')
+        rows.append(group_rows)
+    elements = np.array(table[np.concatenate(rows)])
+    
+    # node positions to node numbers
+    node_numbers = np.asarray(read_nodes(model_dir)['node'])
+    for end in ['node_i', 'node_j']:
+        elements[end] = node_numbers[elements[end] - ELEMENT_NODE_BASE]
+    return {number: name.decode().strip() for number, name in zip(groups['number'].tolist(), groups['name'])}, elements
+
+# MATCH POINTS BY THEIR COORDINATES, RETURNS THE ROW OF EACH QUERY POINT IN THE REFERENCE POINTS (-1 IF NOT FOUND)
+def match_coordinates(reference_xyz, query_xyz, tol=0.5):
+    # points are matched on a grid of size tol (points closer than tol may fall on adjacent cells and not be matched)
+    origin = np.minimum(reference_xyz.min(axis=0), query_xyz.min(axis=0))
+    ref_cells = np.round((reference_xyz - origin) / tol).astype(np.int64)
+    query_cells = np.round((query_xyz - origin) / tol).astype(np.int64)
+    
+    # a single integer key for each cell
+    shape = np.maximum(ref_cells.max(axis=0), query_cells.max(axis=0)) + 1
+    ref_keys = np.ravel_multi_index(ref_cells.T, shape)
+    query_keys = np.ravel_multi_index(query_cells.T, shape)
+    
+    order = np.argsort(ref_keys, kind='stable')
+    pos = np.minimum(np.searchsorted(ref_keys[order], query_keys), len(order) - 1)
+    return np.where(ref_keys[order][pos] == query_keys, order[pos], -1)
+
+# PERFORM3D NODE NUMBER OF EACH OPENSEES JOINT (-1 IF THE JOINT IS NOT IN THE PERFORM3D MODEL)
+def map_joints_to_perform3d(model_data, joint_ids=None, nodes=None, tol=0.5):
+    if nodes is None:
+        nodes = read_nodes()
+    if joint_ids is None:
+        joint_ids = model_data.joints['id']
+    rows = match_coordinates(np.asarray(nodes['xyz']), model_data.joint_coords(joint_ids), tol)
+    return np.where(rows >= 0, np.asarray(nodes['node'])[rows], -1)
+
+# FAR JOINT OF THE BEAM OF EACH HINGE (THE BEAM IS THE FRAME ELEMENT CONNECTED TO THE NEW JOINT OF THE HINGE)
+def hinge_beam_far_joints(model_data):
+    frames = model_data.frames
+    ends = np.concatenate([frames['node_i'], frames['node_j']])
+    others = np.concatenate([frames['node_j'], frames['node_i']])
+    order = np.argsort(ends, kind='stable')
+    pos = np.minimum(np.searchsorted(ends[order], model_data.hinges['new_node']), len(order) - 1)
+    return np.where(ends[order][pos] == model_data.hinges['new_node'], others[order][pos], -1)
+
+# PERFORM3D ELEMENT OF EACH HINGE: GROUP NAME, ELEMENT NUMBER AND END ('I' OR 'J', EMPTY IF NOT FOUND)
+def map_hinges_to_perform3d(model_data, nodes=None, elements=None, tol=0.5):
+    """
+    The hinge is at the end of the Perform3D element which connects the Perform3D nodes at the real joint of the hinge and
+    at the far joint of its beam. elements is the result of read_elements (read from the shipped model if None).
+    
+    returns a DataFrame indexed by the zero length element ID of the OpenSees hinges
+    """
+    if nodes is None:
+        nodes = read_nodes()
+    if elements is None:
+        elements = read_elements()
+    group_names, elements = elements
+    
+    near = map_joints_to_perform3d(model_data, model_data.hinges['node'], nodes, tol)
+    far_joints = hinge_beam_far_joints(model_data)
+    far = np.full(len(far_joints), -1, dtype=near.dtype)
+    far[far_joints >= 0] = map_joints_to_perform3d(model_data, far_joints[far_joints >= 0], nodes, tol)
+    
+    # element of each pair of Perform3D nodes, in both directions (a single integer key for each pair)
+    size = int(max(elements['node_i'].max(), elements['node_j'].max(), near.max(), far.max())) + 2
+    keys = np.concatenate([elements['node_i'] * size + elements['node_j'], elements['node_j'] * size + elements['node_i']])
+    rows = np.tile(np.arange(len(elements)), 2)
+    order = np.argsort(keys, kind='stable')
+    query = np.where((near >= 0) & (far >= 0), near * size + far, -1)
+    pos = np.minimum(np.searchsorted(keys[order], query), len(order) - 1)
+    found = keys[order][pos] == query
+    element_rows = rows[order][pos]
+    
+    # the end of the element at the real joint of the hinge
+    matched = elements[element_rows]
+    return pd.DataFrame({'Group': np.where(found, np.array([group_names[g] for g in matched['group'].tolist()], dtype=object), ''),
+                         'Element': np.where(found, matched['element'], -1),
+                         'End': np.where(found, np.where(matched['node_i'] == near, 'I', 'J'), ''),
+                         }, index=pd.Index(model_data.hinges['ele'], name='Hinge ID'))
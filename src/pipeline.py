@@ -0,0 +1,237 @@
+'''
+    MIT License
+    
+    Copyright (c) 2020 OpenSeesPro
+    
+    Permission is hereby granted, free of charge, to any person obtaining a copy
+    of this software and associated documentation files (the "Software"), to deal
+    in the Software without restriction, including without limitation the rights
+    to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+    copies of the Software, and to permit persons to whom the Software is
+    furnished to do so, subject to the following conditions:
+    
+    The above copyright notice and this permission notice shall be included in all
+    copies or substantial portions of the Software.
+    
+    THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+    IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+    FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+    AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+    LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+    OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+    SOFTWARE.
+
+    Developed by:
+        Ayush Singhania (ayushs@stanford.edu)
+        Pearl Ranchal (ranchal@berkeley.edu)
+      
+    Publication:
+        Goings, C. B., Singhania, A., Ranchal, P., Weaver B., 2020, “Industrial 
+        Scale NLRH Analysis Using OpenSees and Comparison with Perform3D,” 
+        Proceedings of 2020 SEAOC Virtual Convention, SEAOC, CA
+
+    
+    Description of the script - 
+        This is a supporting script to run the analysis as an incremental pipeline
+        of stages (extract -> build -> modal -> transient -> post-process). The
+        output of each stage is stored under a hash of all the inputs that affect
+        it, so a run only recomputes the stages whose inputs have changed. Every
+        completed run is added to a catalog which can be queried to find the
+        (model, record, scale, configuration) combinations with results.
+        The model is always extracted from the running ETABS instance (it may
+        have unsaved changes), so the key of the extract stage is the hash of
+        the extracted data rather than of an EDB file.
+
+'''
+
+import os
+import json
+import time
+import shutil
+import hashlib
+import numpy as np
+import pandas as pd
+from general_utilities import save_model_snapshot, load_model_snapshot
+import opensees_utilities as osu
+from opensees_postprocessor import hinge_analytics, base_shear
+from streaming_postprocessor import StreamingEDPs, save_edp_summary, load_edp_summary
+
+STAGES = ['extract', 'build', 'modal', 'transient', 'post-process']
+CATALOG_COLS = ['Model', 'Record', 'Scale', 'zeta', 'initialOrTangent', 'Config', 'Transient Key', 'Post-Process Key', 'Timestamp']
+
+# default inputs of the pipeline
+CACHE_DIR = os.path.join(os.path.dirname(os.getcwd()), 'results', 'cache')
+
+# HASH THE CONTENT OF A FILE
+def file_hash(fpath):
+    h = hashlib.sha256()
+    with open(fpath, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+# HASH A SET OF INPUTS (ANY JSON SERIALIZABLE OBJECTS)
+def content_hash(*inputs):
+    return hashlib.sha256(json.dumps(inputs, sort_keys=True, default=str).encode()).hexdigest()[:16]
+
+# DIRECTORY WHERE THE OUTPUT OF A STAGE IS STORED
+def stage_dir(cache_dir, stage, key):
+    return os.path.join(cache_dir, stage, key)
+
+# A STAGE OUTPUT IS VALID ONLY IF THE STAGE COMPLETED (MARKER FILE IS WRITTEN LAST)
+def is_cached(cache_dir, stage, key):
+    return os.path.exists(os.path.join(stage_dir(cache_dir, stage, key), 'done'))
+
+# WRITE THE OUTPUT OF A STAGE TO A SCRATCH DIRECTORY AND PUBLISH IT UNDER ITS KEY
+def commit_stage(cache_dir, stage, key, scratch_dir, inputs):
+    with open(os.path.join(scratch_dir, 'inputs.json'), 'w') as f:
+        json.dump(inputs, f, indent=4, sort_keys=True, default=str)
+    open(os.path.join(scratch_dir, 'done'), 'w').close()
+    
+    dest = stage_dir(cache_dir, stage, key)
+    if os.path.exists(dest):
+        shutil.rmtree(dest)
+    os.makedirs(os.path.dirname(dest), exist_ok=True)
+    os.rename(scratch_dir, dest)
+    return dest
+
+# NEW SCRATCH DIRECTORY FOR THE OUTPUT OF A STAGE
+def scratch_dir_for(cache_dir, stage, key):
+    scratch = os.path.join(cache_dir, 'scratch', f'{stage}-{key}-{os.getpid()}')
+    if os.path.exists(scratch):
+        shutil.rmtree(scratch)
+    os.makedirs(scratch)
+    return scratch
+
+# KEYS OF ALL THE STAGES FOR A GIVEN SET OF INPUTS (model_hash IS THE HASH OF THE EXTRACTED MODEL SNAPSHOT)
+def get_stage_keys(model_hash, record_file, scale_factor, zeta, initialOrTangent, total_run_time=50, time_step=0.01, units=3):
+    settings = osu.get_analysis_settings()
+    
+    inputs = {}
+    inputs['extract'] = {'model': model_hash, 'units': units}
+    keys = {'extract': content_hash(inputs['extract'])}
+    
+    inputs['build'] = {'extract': keys['extract'], 'hinge_props_mtime': os.path.getmtime(osu.hinge_props_fpath), 
+                       'settings': settings}
+    keys['build'] = content_hash(inputs['build'])
+    
+    inputs['modal'] = {'build': keys['build'], 'numEigen': osu.numEigen}
+    keys['modal'] = content_hash(inputs['modal'])
+    
+    inputs['transient'] = {'build': keys['build'], 'record': file_hash(record_file), 'scale': scale_factor, 'zeta': zeta, 
+                           'initialOrTangent': initialOrTangent, 'total_run_time': total_run_time, 'time_step': time_step}
+    keys['transient'] = content_hash(inputs['transient'])
+    
+    inputs['post-process'] = {'transient': keys['transient'], 'hinge_props_mtime': os.path.getmtime(osu.hinge_props_fpath)}
+    keys['post-process'] = content_hash(inputs['post-process'])
+    
+    return keys, inputs
+
+# APPEND A COMPLETED RUN TO THE CATALOG
+def add_to_catalog(cache_dir, row):
+    fpath = os.path.join(cache_dir, 'catalog.csv')
+    pd.DataFrame([row], columns=CATALOG_COLS).to_csv(fpath, mode='a', header=not os.path.exists(fpath), index=False)
+    return
+
+# QUERY THE CATALOG, E.G. query_catalog(cache_dir, Record='BM68elc.acc', zeta=0.05)
+def query_catalog(cache_dir=CACHE_DIR, **filters):
+    fpath = os.path.join(cache_dir, 'catalog.csv')
+    if not os.path.exists(fpath):
+        return pd.DataFrame(columns=CATALOG_COLS)
+    
+    df = pd.read_csv(fpath)
+    for col, val in filters.items():
+        df = df[df[col] == val]
+    
+    # only the latest entry of a combination is relevant
+    return df.drop_duplicates(subset=['Transient Key', 'Post-Process Key'], keep='last').reset_index(drop=True)
+
+# RUN THE PIPELINE, ONLY THE STAGES WHOSE INPUTS HAVE CHANGED ARE RECOMPUTED
+def run_pipeline(record_file='BM68elc.acc', scale_factor=3.0, zeta=0.05, initialOrTangent='tangent', total_run_time=50, 
+                 time_step=0.01, cache_dir=CACHE_DIR, units=3, model=None):
+    """
+    model               ETABS model (SapModel) the data is extracted from, the running instance of ETABS if None
+    """
+    from general_utilities import get_model_from_etabs
+    from etabs_utilities import get_etabs_data
+    
+    # EXTRACT
+    # the data of the model open in ETABS is extracted on every run and identified by its content, so unsaved changes or a 
+    # different model than the default EDB file are never mistaken for a cached model
+    if model is None:
+        model = get_model_from_etabs()
+    model.SetPresentUnits(units)
+    model_file = model.GetModelFilename()
+    extract_scratch = scratch_dir_for(cache_dir, 'extract', 'new')
+    save_model_snapshot(os.path.join(extract_scratch, 'model_snapshot.pkl'), get_etabs_data(model))
+    model_hash = file_hash(os.path.join(extract_scratch, 'model_snapshot.pkl'))
+    
+    keys, inputs = get_stage_keys(model_hash, record_file, scale_factor, zeta, initialOrTangent, total_run_time, time_step, units)
+    inputs['extract']['model_file'] = model_file
+    invalid = [stage for stage in STAGES if stage != 'build' and not is_cached(cache_dir, stage, keys[stage])]
+    
+    # the model only needs to be built (in memory) if an analysis stage has to be recomputed
+    if 'modal' in invalid or 'transient' in invalid:
+        invalid.append('build')
+    print(f'Stages to recompute: {", ".join(stage for stage in STAGES if stage in invalid) or "none"}')
+    
+    # the snapshot of a model which was already extracted is kept (with the inputs it was first extracted with)
+    snapshot_fpath = os.path.join(stage_dir(cache_dir, 'extract', keys['extract']), 'model_snapshot.pkl')
+    if 'extract' in invalid:
+        commit_stage(cache_dir, 'extract', keys['extract'], extract_scratch, inputs['extract'])
+    else:
+        shutil.rmtree(extract_scratch)
+    model_data = load_model_snapshot(snapshot_fpath)
+    
+    # BUILD
+    if 'build' in invalid:
+        osu.setup_opensees_model(model_data)
+        
+    # MODAL
+    modal_dir = stage_dir(cache_dir, 'modal', keys['modal'])
+    if 'modal' in invalid:
+        scratch = scratch_dir_for(cache_dir, 'modal', keys['modal'])
+        eigenValues = np.array(osu.modal_response(osu.numEigen))
+        np.savez(os.path.join(scratch, 'modal.npz'), eigenValues=eigenValues, periods=2 * np.pi / np.sqrt(eigenValues))
+        osu.op.wipeAnalysis()
+        commit_stage(cache_dir, 'modal', keys['modal'], scratch, inputs['modal'])
+    modal = np.load(os.path.join(modal_dir, 'modal.npz'))
+    eigenValues, periods = modal['eigenValues'], modal['periods']
+    print(f'OpenSees Periods: {[round(float(n), 3) for n in periods]}')
+    if model_data.etabs_periods:
+        print(f'ETABS Periods   : {model_data.etabs_periods}')
+    
+    # TRANSIENT
+    transient_dir = stage_dir(cache_dir, 'transient', keys['transient'])
+    if 'transient' in invalid:
+        scratch = scratch_dir_for(cache_dir, 'transient', keys['transient'])
+        edps = StreamingEDPs(model_data)
+        _, _, status = osu.run_dynamic_analysis_w_rayleigh_damping(model_data, zeta, initialOrTangent, scratch, total_run_time, 
+                                                                   time_step, record_file, scale_factor, 
+                                                                   eigenValues=eigenValues.tolist(), edp_stream=edps)
+        
+        # a truncated analysis is never cached (nor cataloged), its output is left in the scratch directory for inspection
+        if status['failed']:
+            raise RuntimeError(f'The transient analysis did not converge (stopped at t = {status["time"]:.3f} s of '
+                               f'{total_run_time} s), the stage is not cached. Output: {scratch}')
+        save_edp_summary(edps.summary, os.path.join(scratch, f'edp_summary-{initialOrTangent}.json'))
+        commit_stage(cache_dir, 'transient', keys['transient'], scratch, inputs['transient'])
+    edp_fpath = os.path.join(transient_dir, f'edp_summary-{initialOrTangent}.json')
+    edps = load_edp_summary(edp_fpath) if os.path.exists(edp_fpath) else None
+    
+    # POST-PROCESS
+    post_dir = stage_dir(cache_dir, 'post-process', keys['post-process'])
+    if 'post-process' in invalid:
+        scratch = scratch_dir_for(cache_dir, 'post-process', keys['post-process'])
+        hinge_analytics(model_data, initialOrTangent, transient_dir).to_pickle(
+                                                                        os.path.join(scratch, f'hinge_analytics-{initialOrTangent}.pkl'))
+        # the committed transient directory is never written to, the tables go straight to the post-process scratch directory
+        base_shear(transient_dir, model_data, initialOrTangent, out_dir=scratch, time_step=time_step)
+        commit_stage(cache_dir, 'post-process', keys['post-process'], scratch, inputs['post-process'])
+        
+        add_to_catalog(cache_dir, {'Model': os.path.basename(model_file), 'Record': os.path.basename(record_file), 'Scale': scale_factor, 
+                                   'zeta': zeta, 'initialOrTangent': initialOrTangent, 'Config': content_hash(inputs['build']['settings']), 
+                                   'Transient Key': keys['transient'], 'Post-Process Key': keys['post-process'], 
+                                   'Timestamp': time.strftime('%Y-%m-%d %H:%M:%S')})
+    
+    return {'periods': periods, 'transient_dir': transient_dir, 'post_dir': post_dir, 'edps': edps, 'keys': keys}
@@ -0,0 +1,271 @@
+'''
+    MIT License
+    
+    Copyright (c) 2020 OpenSeesPro
+    
+    Permission is hereby granted, free of charge, to any person obtaining a copy
+    of this software and associated documentation files (the "Software"), to deal
+    in the Software without restriction, including without limitation the rights
+    to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+    copies of the Software, and to permit persons to whom the Software is
+    furnished to do so, subject to the following conditions:
+    
+    The above copyright notice and this permission notice shall be included in all
+    copies or substantial portions of the Software.
+    
+    THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+    IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+    FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+    AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+    LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+    OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+    SOFTWARE.
+
+    Developed by:
+        Ayush Singhania (ayushs@stanford.edu)
+        Pearl Ranchal (ranchal@berkeley.edu)
+      
+    Publication:
+        Goings, C. B., Singhania, A., Ranchal, P., Weaver B., 2020, “Industrial 
+        Scale NLRH Analysis Using OpenSees and Comparison with Perform3D,” 
+        Proceedings of 2020 SEAOC Virtual Convention, SEAOC, CA
+
+    
+    Description of the script - 
+        This is a supporting script to post-process a response history analysis
+        while it runs. The recorder files (floor displacements, base reactions 
+        and hinge deformations) are followed by a separate process as OpenSees 
+        writes them, and the envelopes of the floor displacements, story drifts,
+        base shear and hinge rotations are updated with every new batch of 
+        steps. The EDP summary is therefore ready as soon as the last step of 
+        the analysis completes, without parsing the output files again.
+
+'''
+
+import os
+import json
+import queue
+import threading
+import traceback
+import numpy as np
+import multiprocessing as mp
+
+# wall clock seconds between two reads of the recorder files
+POLL_INTERVAL = 0.1
+
+# wall clock seconds between two checks that the consumer is alive while waiting for the EDP summary
+RESULT_TIMEOUT = 1.0
+
+# READ THE ROWS ADDED TO A RECORDER FILE SINCE THE LAST READ
+class RecorderTail:
+    def __init__(self, fpath, num_cols):
+        self.fpath = fpath
+        self.num_cols = num_cols
+        self.offset = 0
+        self.partial = b''
+    
+    # array of shape (number of new rows, num_cols), a partially written last line is kept for the next read
+    def read(self):
+        try:
+            with open(self.fpath, 'rb') as f:
+                f.seek(self.offset)
+                chunk = f.read()
+        except FileNotFoundError:
+            chunk = b''
+        self.offset += len(chunk)
+        
+        data = self.partial + chunk
+        end = data.rfind(b'\n') + 1
+        self.partial = data[end:]
+        if end == 0:
+            return np.empty((0, self.num_cols))
+        return np.array(data[:end].split(), dtype=float).reshape(-1, self.num_cols)
+
+# RUNNING ENVELOPES OF THE ENGINEERING DEMAND PARAMETERS OF ONE ANALYSIS
+class EDPEnvelopes:
+    def __init__(self, story_heights, num_rxn_nodes, num_hinges):
+        """
+        story_heights       height of the story below each floor, shape (number of floors,)
+        num_rxn_nodes       number of reaction recorders summed into the base shear
+        num_hinges          number of columns of the stacked hinge deformation recorder
+        """
+        num_floors = len(story_heights)
+        self.story_heights = np.asarray(story_heights, dtype=float)
+        self.num_steps = 0
+        self.max_floor_disp = np.zeros((num_floors, 2))
+        self.min_floor_disp = np.zeros((num_floors, 2))
+        self.peak_drift = np.zeros((num_floors, 2))
+        self.peak_drift_step = np.zeros((num_floors, 2), dtype=int)
+        self.last_floor_disp = np.zeros((num_floors, 2))
+        
+        # reactions of the nodes which have not been read for all the nodes yet (the files are written one after the other)
+        self.pending_rxn = [np.empty((0, 2)) for _ in range(num_rxn_nodes)]
+        self.num_shear_steps = 0
+        self.peak_base_shear = np.zeros(2)
+        self.peak_base_shear_step = np.zeros(2, dtype=int)
+        
+        self.peak_hinge_rotation = np.zeros(num_hinges)
+    
+    # floor_disp has two columns (X, Y) per floor, sorted by elevation
+    def add_floor_disp(self, floor_disp):
+        if not len(floor_disp):
+            return
+        disp = floor_disp.reshape(len(floor_disp), -1, 2)
+        self.max_floor_disp = np.maximum(self.max_floor_disp, disp.max(axis=0))
+        self.min_floor_disp = np.minimum(self.min_floor_disp, disp.min(axis=0))
+        self.last_floor_disp = disp[-1]
+        
+        # same definition as opensees_postprocessor.read_story_drifts
+        drift = np.abs(np.diff(disp, axis=1, prepend=0.0)) / self.story_heights[None, :, None]
+        peak_row = drift.argmax(axis=0)
+        peak = np.take_along_axis(drift, peak_row[None], axis=0)[0]
+        exceeded = peak > self.peak_drift
+        self.peak_drift = np.where(exceeded, peak, self.peak_drift)
+        self.peak_drift_step = np.where(exceeded, peak_row + self.num_steps, self.peak_drift_step)
+        self.num_steps += len(disp)
+        return
+    
+    # rxn is a list with the new rows (FX, FY) of each reaction recorder
+    def add_reactions(self, rxn):
+        self.pending_rxn = [np.concatenate([pending, new]) for (pending, new) in zip(self.pending_rxn, rxn)]
+        num_rows = min(len(pending) for pending in self.pending_rxn) if self.pending_rxn else 0
+        if not num_rows:
+            return
+        shear = np.abs(sum(pending[:num_rows] for pending in self.pending_rxn))
+        self.pending_rxn = [pending[num_rows:] for pending in self.pending_rxn]
+        
+        peak_row = shear.argmax(axis=0)
+        peak = shear[peak_row, [0, 1]]
+        exceeded = peak > self.peak_base_shear
+        self.peak_base_shear = np.where(exceeded, peak, self.peak_base_shear)
+        self.peak_base_shear_step = np.where(exceeded, peak_row + self.num_shear_steps, self.peak_base_shear_step)
+        self.num_shear_steps += num_rows
+        return
+    
+    # hinge_def has one column per hinge, in the order of model_data.hinges
+    def add_hinge_rotations(self, hinge_def):
+        if len(hinge_def):
+            self.peak_hinge_rotation = np.maximum(self.peak_hinge_rotation, np.abs(hinge_def).max(axis=0))
+        return
+    
+    # envelopes as plain lists (steps are counted from 0, one step per recorded row)
+    def summary(self):
+        return {'num_steps'             : self.num_steps,
+                'max_floor_disp'        : self.max_floor_disp.tolist(),
+                'min_floor_disp'        : self.min_floor_disp.tolist(),
+                'residual_floor_disp'   : self.last_floor_disp.tolist(),
+                'peak_story_drift'      : self.peak_drift.tolist(),
+                'peak_story_drift_step' : self.peak_drift_step.tolist(),
+                'max_story_drift'       : self.peak_drift.max(axis=0).tolist() if len(self.peak_drift) else [0.0, 0.0],
+                'peak_base_shear'       : self.peak_base_shear.tolist(),
+                'peak_base_shear_step'  : self.peak_base_shear_step.tolist(),
+                'peak_hinge_rotation'   : self.peak_hinge_rotation.tolist(),
+                }
+
+# FOLLOW THE RECORDER FILES OF AN ANALYSIS UNTIL stop IS SET, THEN PUT THE EDP SUMMARY (OR THE ERROR) IN results
+def follow_recorders(dir_, initialOrTangent, rxn_nodes, story_heights, num_hinges, stop, results, poll_interval=POLL_INTERVAL):
+    # the error is sent as a RuntimeError with the traceback of the consumer, which can always be pickled
+    try:
+        summary = follow_recorder_files(dir_, initialOrTangent, rxn_nodes, story_heights, num_hinges, stop, poll_interval)
+    except Exception:
+        results.put(RuntimeError(f'Following the recorders failed:\n{traceback.format_exc()}'))
+    else:
+        results.put(summary)
+    return
+
+# UPDATE THE ENVELOPES FROM THE RECORDER FILES UNTIL stop IS SET AND RETURN THE EDP SUMMARY
+def follow_recorder_files(dir_, initialOrTangent, rxn_nodes, story_heights, num_hinges, stop, poll_interval=POLL_INTERVAL):
+    envelopes = EDPEnvelopes(story_heights, len(rxn_nodes), num_hinges)
+    floor_tail = RecorderTail(os.path.join(dir_, f'floor_disp_{initialOrTangent}.out'), 2 * len(story_heights))
+    rxn_tails = [RecorderTail(os.path.join(dir_, f'node_{node}_rxn_{initialOrTangent}.out'), 6) for node in rxn_nodes]
+    hinge_tail = RecorderTail(os.path.join(dir_, f'hinge_def_{initialOrTangent}.out'), num_hinges) if num_hinges else None
+    
+    while True:
+        # checked before reading so that the rows written before the stop are always consumed
+        stopping = stop.is_set()
+        envelopes.add_floor_disp(floor_tail.read())
+        envelopes.add_reactions([tail.read()[:, :2] for tail in rxn_tails])
+        if hinge_tail is not None:
+            envelopes.add_hinge_rotations(hinge_tail.read())
+        if stopping:
+            break
+        stop.wait(poll_interval)
+    
+    return envelopes.summary()
+
+# EDP SUMMARY OF AN ANALYSIS COMPUTED WHILE THE ANALYSIS RUNS
+class StreamingEDPs:
+    """
+    usage:  edps = StreamingEDPs(model_data)
+            run_dynamic_analysis_w_rayleigh_damping(model_data, ..., edp_stream=edps)
+            edps.summary
+    """
+    def __init__(self, model_data, poll_interval=POLL_INTERVAL):
+        levels = model_data.floor_levels
+        self.story_heights = np.diff(levels, prepend=model_data.joints['z'].min()).tolist()
+        self.rxn_nodes = model_data.rxn_nodes.tolist()
+        self.num_hinges = len(model_data.hinges['ele'])
+        self.poll_interval = poll_interval
+        self.summary = None
+        self.consumer = None
+    
+    # start following the recorders (call after the recorders are defined)
+    def start(self, initialOrTangent, dir_=None):
+        dir_ = os.getcwd() if dir_ is None else dir_
+        
+        # the analysis holds the GIL while OpenSees solves a step, so the envelopes are updated in a separate process, 
+        # unless this is already a daemonic process (e.g. a worker of a pool) which cannot have children
+        if mp.current_process().daemon:
+            self.stop, self.results = threading.Event(), queue.Queue()
+            self.consumer = threading.Thread(target=follow_recorders, daemon=True,
+                                             args=(dir_, initialOrTangent, self.rxn_nodes, self.story_heights, self.num_hinges, 
+                                                   self.stop, self.results, self.poll_interval))
+        else:
+            ctx = mp.get_context('fork' if 'fork' in mp.get_all_start_methods() else 'spawn')
+            self.stop, self.results = ctx.Event(), ctx.Queue()
+            self.consumer = ctx.Process(target=follow_recorders, daemon=True,
+                                        args=(dir_, initialOrTangent, self.rxn_nodes, self.story_heights, self.num_hinges, 
+                                              self.stop, self.results, self.poll_interval))
+        self.consumer.start()
+        return
+    
+    # read the rest of the recorder files (call after the recorders are closed) and return the EDP summary, an error of 
+    # the consumer is raised here
+    def finish(self):
+        self.stop.set()
+        try:
+            result = self.wait_for_result()
+        finally:
+            self.consumer.join()
+            self.consumer = None
+        if isinstance(result, Exception):
+            raise result
+        self.summary = result
+        return self.summary
+    
+    # the result sent by the consumer, RuntimeError if the consumer died without sending it (e.g. killed)
+    def wait_for_result(self):
+        while True:
+            try:
+                return self.results.get(timeout=RESULT_TIMEOUT)
+            except queue.Empty:
+                if self.consumer.is_alive():
+                    continue
+            
+            # the result may have been sent just before the consumer stopped
+            try:
+                return self.results.get(timeout=RESULT_TIMEOUT)
+            except queue.Empty:
+                exitcode = getattr(self.consumer, 'exitcode', None)
+                raise RuntimeError(f'The recorder consumer stopped without an EDP summary (exit code {exitcode})')
+
+# SAVE AN EDP SUMMARY AS JSON
+def save_edp_summary(summary, fpath):
+    with open(fpath, 'w') as f:
+        json.dump(summary, f, indent=4)
+    return
+
+# LOAD AN EDP SUMMARY SAVED USING save_edp_summary
+def load_edp_summary(fpath):
+    with open(fpath) as f:
+        return json.load(f)
@@ -0,0 +1,211 @@
+'''
+    MIT License
+    
+    Copyright (c) 2020 OpenSeesPro
+    
+    Permission is hereby granted, free of charge, to any person obtaining a copy
+    of this software and associated documentation files (the "Software"), to deal
+    in the Software without restriction, including without limitation the rights
+    to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+    copies of the Software, and to permit persons to whom the Software is
+    furnished to do so, subject to the following conditions:
+    
+    The above copyright notice and this permission notice shall be included in all
+    copies or substantial portions of the Software.
+    
+    THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+    IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+    FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+    AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+    LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+    OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+    SOFTWARE.
+
+    Developed by:
+        Ayush Singhania (ayushs@stanford.edu)
+        Pearl Ranchal (ranchal@berkeley.edu)
+      
+    Publication:
+        Goings, C. B., Singhania, A., Ranchal, P., Weaver B., 2020, “Industrial 
+        Scale NLRH Analysis Using OpenSees and Comparison with Perform3D,” 
+        Proceedings of 2020 SEAOC Virtual Convention, SEAOC, CA
+
+    
+    Description of the script - 
+        This is a supporting script to run several variants of the response 
+        history analysis (Rayleigh damping ratio, initial or tangent stiffness
+        proportional damping and the directions of the ground motion) on one 
+        model. The model is built and the eigenvalues are computed once in the
+        parent process, which then forks a child for each variant. The children
+        share the built domain copy-on-write and only add their own ground 
+        motion, damping and recorders before the analysis.
+
+'''
+
+import os
+import sys
+import time
+import argparse
+import itertools
+import traceback
+import pandas as pd
+import opensees_utilities as osu
+from streaming_postprocessor import StreamingEDPs, save_edp_summary, load_edp_summary
+
+# name of each direction of the ground motion (1: X, 2: Y)
+DIRECTION_NAMES = {1: 'X', 2: 'Y'}
+
+# scale factor of the ground motion in each direction (the record is scaled to 3.0 g in X and 1.0 g in Y)
+SCALE_FACTORS = {1: 3.0, 2: 1.0}
+
+# exit code of a variant whose analysis raised an exception, and of a variant whose analysis did not converge
+ERROR_EXIT_CODE = 1
+FAILED_EXIT_CODE = 2
+
+# ALL THE COMBINATIONS OF THE VARIANT SETTINGS
+def make_variants(zetas=(0.05,), initialOrTangents=('initial', 'tangent'), directions=((1,), (1, 2))):
+    return [{'zeta': zeta, 'initialOrTangent': initialOrTangent, 'directions': tuple(dirns)} 
+            for (zeta, initialOrTangent, dirns) in itertools.product(zetas, initialOrTangents, directions)]
+
+# NAME OF A VARIANT (ALSO THE NAME OF ITS RESULTS DIRECTORY)
+def variant_name(variant):
+    dirns = ''.join(DIRECTION_NAMES[dirn] for dirn in variant['directions'])
+    return f'{variant["initialOrTangent"]}_zeta{variant["zeta"]}_{dirns}'
+
+# RUN ONE VARIANT ON THE BUILT MODEL, THE RECORDERS WRITE TO THE RESULTS DIRECTORY OF THE VARIANT (RETURNS THE EXIT CODE)
+def run_variant(model_data, variant, results_dir, eigenValues, config, wipe_model=True):
+    os.makedirs(results_dir, exist_ok=True)
+    cwd = os.getcwd()
+    os.chdir(results_dir)
+    edps = StreamingEDPs(model_data)
+    try:
+        _, _, status = osu.run_dynamic_analysis_w_rayleigh_damping(model_data, variant['zeta'], variant['initialOrTangent'], 
+                                                                   results_dir, config['total_run_time'], config['time_step'], 
+                                                                   config['record_file'], config['scale_factor'], 
+                                                                   eigenValues=eigenValues, wipe_model=wipe_model, 
+                                                                   edp_stream=edps, directions=variant['directions'])
+    finally:
+        os.chdir(cwd)
+    save_edp_summary(edps.summary, os.path.join(results_dir, f'edp_summary-{variant["initialOrTangent"]}.json'))
+    
+    # the envelopes of a variant which did not converge are those of the truncated histories
+    if status['failed']:
+        print(f'{variant_name(variant)}: the analysis did not converge (stopped at t = {status["time"]:.3f} s)')
+        return FAILED_EXIT_CODE
+    return 0
+
+# BODY OF A FORKED CHILD, RUNS ITS VARIANT AND EXITS (THE OUTPUT OF THE CHILD IS WRITTEN TO analysis.log)
+def run_forked_variant(model_data, variant, results_dir, eigenValues, config):
+    status = ERROR_EXIT_CODE
+    try:
+        os.makedirs(results_dir, exist_ok=True)
+        log = os.open(os.path.join(results_dir, 'analysis.log'), os.O_WRONLY | os.O_CREAT | os.O_TRUNC)
+        os.dup2(log, 1)
+        os.dup2(log, 2)
+        status = run_variant(model_data, variant, results_dir, eigenValues, config)
+    except BaseException:
+        traceback.print_exc()
+    finally:
+        sys.stdout.flush()
+        sys.stderr.flush()
+        os._exit(status)
+
+# WAIT FOR ANY CHILD TO EXIT AND RECORD ITS EXIT CODE
+def wait_for_child(running, exit_codes):
+    pid, status = os.waitpid(-1, 0)
+    exit_codes[running.pop(pid)] = os.waitstatus_to_exitcode(status)
+    return
+
+# RUN ALL THE VARIANTS ON ONE BUILT (AND EIGEN-SOLVED) MODEL
+def run_variants(model_data, variants, results_dir, record_file='BM68elc.acc', scale_factor=SCALE_FACTORS, total_run_time=50, 
+                 time_step=0.01, max_children=None):
+    """
+    variants            list of dicts with the zeta, initialOrTangent and directions (e.g. (1,) or (1, 2)) of each variant
+    scale_factor        scale factor of the record in all the directions or dict with the factor of each direction
+    results_dir         the output of each variant is written to results_dir/<variant name>
+    max_children        number of variants analyzed at the same time (number of cpus by default)
+    """
+    # a missing scale factor is reported before any variant is run
+    for variant in variants:
+        osu.get_scale_factors(scale_factor, variant['directions'])
+    config = {'record_file': os.path.abspath(record_file), 'scale_factor': scale_factor, 'total_run_time': total_run_time, 
+              'time_step': time_step}
+    names = [variant_name(variant) for variant in variants]
+    
+    # the model and its eigenvalues are the same for all the variants
+    osu.setup_opensees_model(model_data)
+    eigenValues = osu.modal_response(osu.numEigen)
+    osu.op.wipeAnalysis()
+    
+    exit_codes = {}
+    if not hasattr(os, 'fork'):
+        # without fork (Windows) the variants are analyzed one after the other, the model is reverted after each variant
+        for name, variant in zip(names, variants):
+            exit_codes[name] = run_variant(model_data, variant, os.path.join(results_dir, name), eigenValues, config, 
+                                           wipe_model=False)
+    else:
+        max_children = max_children or os.cpu_count()
+        running = {}
+        for name, variant in zip(names, variants):
+            if len(running) >= max_children:
+                wait_for_child(running, exit_codes)
+            
+            # the buffered output of the parent would otherwise be written again by the child
+            sys.stdout.flush()
+            sys.stderr.flush()
+            pid = os.fork()
+            if pid == 0:
+                run_forked_variant(model_data, variant, os.path.join(results_dir, name), eigenValues, config)
+            running[pid] = name
+        
+        while running:
+            wait_for_child(running, exit_codes)
+    
+    # one row per variant with the peak response from its EDP summary (exit code 1: error, 2: the analysis did not converge)
+    rows = []
+    for name, variant in zip(names, variants):
+        row = {'Variant': name, 'zeta': variant['zeta'], 'initialOrTangent': variant['initialOrTangent'], 
+               'Directions': ''.join(DIRECTION_NAMES[dirn] for dirn in variant['directions'])}
+        factors = osu.get_scale_factors(scale_factor, variant['directions'])
+        for dirn, dirn_name in DIRECTION_NAMES.items():
+            row[f'Scale {dirn_name}'] = factors.get(dirn, float('nan'))
+        row['Exit Code'] = exit_codes[name]
+        edp_fpath = os.path.join(results_dir, name, f'edp_summary-{variant["initialOrTangent"]}.json')
+        if exit_codes[name] == 0 and os.path.exists(edp_fpath):
+            edps = load_edp_summary(edp_fpath)
+            row.update({'Max Drift X': edps['max_story_drift'][0], 'Max Drift Y': edps['max_story_drift'][1], 
+                        'Peak Vx': edps['peak_base_shear'][0], 'Peak Vy': edps['peak_base_shear'][1]})
+        rows.append(row)
+    return pd.DataFrame(rows).set_index('Variant')
+
+# RUN THE VARIANTS OF A SYNTHETIC BUILDING
+if __name__ == '__main__':
+    from model_generator import generate_etabs_data
+    
+    parser = argparse.ArgumentParser(description='Damping and ground motion direction variants of one NLRHA model.')
+    parser.add_argument('--zeta', type=float, nargs='+', default=[0.05])
+    parser.add_argument('--damping', nargs='+', default=['initial', 'tangent'], choices=['initial', 'tangent'])
+    parser.add_argument('--directions', nargs='+', default=['X', 'XY'], choices=['X', 'Y', 'XY'])
+    parser.add_argument('--scale-factor', nargs='+', default=[f'{DIRECTION_NAMES[dirn]}={factor}' for (dirn, factor) in 
+                        SCALE_FACTORS.items()], help='scale factor of the record in all the directions, or X=<factor> Y=<factor>')
+    parser.add_argument('--run-time', type=float, default=5.0, help='duration of each response history analysis')
+    parser.add_argument('--children', type=int, default=None, help='number of variants analyzed at the same time')
+    parser.add_argument('--size', type=int, nargs=3, default=[5, 3, 3], metavar=('STORIES', 'BAYS', 'FRAMES'))
+    args = parser.parse_args()
+    
+    dirn_codes = {name: code for (code, name) in DIRECTION_NAMES.items()}
+    directions = [tuple(dirn_codes[c] for c in dirns) for dirns in args.directions]
+    variants = make_variants(args.zeta, args.damping, directions)
+    if len(args.scale_factor) == 1 and '=' not in args.scale_factor[0]:
+        scale_factor = float(args.scale_factor[0])
+    else:
+        scale_factor = {dirn_codes[value.split('=')[0]]: float(value.split('=')[1]) for value in args.scale_factor}
+    
+    results_dir = os.path.join(os.path.dirname(os.getcwd()), 'results', 'variants')
+    start = time.time()
+    df = run_variants(generate_etabs_data(*args.size), variants, results_dir, scale_factor=scale_factor, 
+                      total_run_time=args.run_time, max_children=args.children)
+    print(df)
+    print(f'\n{len(variants)} variants analyzed in {time.time() - start:.1f} s')
+    df.to_excel(os.path.join(results_dir, 'variants.xlsx'))
+    sys.exit(0)
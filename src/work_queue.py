@@ -0,0 +1,429 @@
+'''
+    MIT License
+    
+    Copyright (c) 2020 OpenSeesPro
+    
+    Permission is hereby granted, free of charge, to any person obtaining a copy
+    of this software and associated documentation files (the "Software"), to deal
+    in the Software without restriction, including without limitation the rights
+    to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+    copies of the Software, and to permit persons to whom the Software is
+    furnished to do so, subject to the following conditions:
+    
+    The above copyright notice and this permission notice shall be included in all
+    copies or substantial portions of the Software.
+    
+    THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+    IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+    FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+    AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+    LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+    OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+    SOFTWARE.
+
+    Developed by:
+        Ayush Singhania (ayushs@stanford.edu)
+        Pearl Ranchal (ranchal@berkeley.edu)
+      
+    Publication:
+        Goings, C. B., Singhania, A., Ranchal, P., Weaver B., 2020, “Industrial 
+        Scale NLRH Analysis Using OpenSees and Comparison with Perform3D,” 
+        Proceedings of 2020 SEAOC Virtual Convention, SEAOC, CA
+
+    
+    Description of the script - 
+        This is a supporting script to run an NLRHA campaign (records x scale
+        factors x configurations) on any number of worker processes on any
+        number of machines that share a filesystem. No scheduler is required:
+        jobs are files that move between the pending, leased, done and failed
+        directories with atomic renames. A worker holds a lease on its job and
+        refreshes it with a heartbeat. Jobs whose lease expires (e.g. the worker
+        died) are returned to the queue and retried. Results are published with
+        an atomic rename, so a job that runs twice is committed only once.
+        
+        The clocks of the machines are assumed to be synchronized (NTP), the 
+        lease timeout should be much larger than any clock skew.
+        
+        Usage:
+            python work_queue.py worker <queue_dir>         run a worker on this machine
+            python work_queue.py simulate                   simulate several nodes locally
+
+'''
+
+import os
+import sys
+import json
+import time
+import uuid
+import shutil
+import socket
+import argparse
+import itertools
+import threading
+import traceback
+import multiprocessing
+from pipeline import content_hash
+
+QUEUE_DIRS = ['pending', 'leased', 'done', 'failed', 'results', 'scratch']
+
+# default lease settings (seconds)
+LEASE_TIMEOUT = 600
+HEARTBEAT_INTERVAL = 30
+POLL_INTERVAL = 5
+MAX_ATTEMPTS = 3
+
+# state returned by release_job when the job is no longer leased by the worker (its lease expired)
+LEASE_LOST = 'lost'
+
+# CREATE THE DIRECTORIES OF THE QUEUE
+def init_queue(queue_dir):
+    for name in QUEUE_DIRS:
+        os.makedirs(os.path.join(queue_dir, name), exist_ok=True)
+    return
+
+# PATH OF A JOB FILE IN ONE OF THE QUEUE DIRECTORIES
+def job_path(queue_dir, state, job_id):
+    return os.path.join(queue_dir, state, f'{job_id}.json')
+
+# WRITE A JSON FILE ATOMICALLY (WRITE TO A TEMPORARY FILE AND RENAME)
+def write_json(fpath, data):
+    tmp = f'{fpath}.{uuid.uuid4().hex}.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(data, f, indent=4, sort_keys=True)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, fpath)
+    return
+
+def read_json(fpath):
+    with open(fpath, 'r') as f:
+        return json.load(f)
+
+# ADD A JOB TO THE QUEUE, THE JOB ID IS A HASH OF THE JOB SO SUBMITTING THE SAME JOB AGAIN IS A NO-OP
+def submit_job(queue_dir, snapshot, record_file, scale_factor, zeta, initialOrTangent, total_run_time=50, time_step=0.01):
+    job = {'snapshot': os.path.abspath(snapshot), 'record': os.path.abspath(record_file), 'scale': scale_factor, 
+           'zeta': zeta, 'initialOrTangent': initialOrTangent, 'total_run_time': total_run_time, 'time_step': time_step}
+    job_id = content_hash(job)
+    
+    if any(os.path.exists(job_path(queue_dir, state, job_id)) for state in ['pending', 'leased', 'done', 'failed']):
+        return job_id
+    
+    job.update({'job_id': job_id, 'attempts': 0, 'errors': []})
+    write_json(job_path(queue_dir, 'pending', job_id), job)
+    return job_id
+
+# SUBMIT ALL THE COMBINATIONS OF RECORDS, SCALE FACTORS AND CONFIGURATIONS [(zeta, initialOrTangent), ...]
+def submit_campaign(queue_dir, snapshot, records, scale_factors, configs, **kwargs):
+    init_queue(queue_dir)
+    return [submit_job(queue_dir, snapshot, record, scale, zeta, initialOrTangent, **kwargs) 
+            for record, scale, (zeta, initialOrTangent) in itertools.product(records, scale_factors, configs)]
+
+# CLAIM A PENDING JOB, THE RENAME SUCCEEDS FOR EXACTLY ONE WORKER
+def claim_job(queue_dir, worker_id):
+    for fname in sorted(os.listdir(os.path.join(queue_dir, 'pending'))):
+        if not fname.endswith('.json'):
+            continue
+        
+        job_id = fname[:-5]
+        try:
+            # refresh the modification time first, the lease is considered to start from it
+            os.utime(job_path(queue_dir, 'pending', job_id))
+            os.rename(job_path(queue_dir, 'pending', job_id), job_path(queue_dir, 'leased', job_id))
+        except FileNotFoundError:
+            continue    # claimed by another worker
+        
+        job = read_json(job_path(queue_dir, 'leased', job_id))
+        job['worker'] = worker_id
+        job['leased_at'] = time.time()
+        write_json(job_path(queue_dir, 'leased', job_id), job)
+        return job
+    return None
+
+# REFRESH THE LEASE OF A JOB (OF ANY WORKER IF worker_id IS None), FALSE IF THE WORKER NO LONGER HOLDS THE LEASE
+def heartbeat(queue_dir, job_id, worker_id=None):
+    fpath = job_path(queue_dir, 'leased', job_id)
+    try:
+        if worker_id is not None and read_json(fpath).get('worker') != worker_id:
+            return False    # the lease expired and the job was claimed by another worker
+        os.utime(fpath)
+        return True
+    except FileNotFoundError:
+        return False    # the lease expired and the job was returned to the queue
+
+# TAKE A LEASED JOB OUT OF THE LEASED DIRECTORY, SO THAT ONLY ONE PROCESS RELEASES OR COMPLETES IT, RETURNS THE PATH OF THE
+# TAKEN FILE AND THE JOB (None IF THE JOB IS NOT LEASED, OR IS LEASED BY ANOTHER WORKER THAN worker_id WHEN IT IS GIVEN)
+def take_lease(queue_dir, job_id, worker_id=None):
+    src = job_path(queue_dir, 'leased', job_id)
+    tmp = f'{src}.{uuid.uuid4().hex}.taken'
+    try:
+        os.rename(src, tmp)
+    except FileNotFoundError:
+        return None
+    
+    job = read_json(tmp)
+    if worker_id is not None and job.get('worker') != worker_id:
+        os.rename(tmp, src)     # the lease of the other worker is left untouched
+        return None
+    return tmp, job
+
+# RAISED BY A JOB WHICH FAILS FOR A REASON THAT A RETRY CANNOT FIX (E.G. THE ANALYSIS DID NOT CONVERGE)
+class JobFailed(Exception):
+    pass
+
+# RETURN A JOB TO THE QUEUE (OR MOVE IT TO FAILED IF IT HAS BEEN ATTEMPTED TOO MANY TIMES OR SHOULD NOT BE RETRIED), 
+# RETURNS THE NEW STATE OF THE JOB OR LEASE_LOST IF THE JOB IS NOT LEASED BY worker_id (BY ANY WORKER IF worker_id IS None)
+def release_job(queue_dir, job_id, error, max_attempts=MAX_ATTEMPTS, retry=True, worker_id=None):
+    taken = take_lease(queue_dir, job_id, worker_id)
+    if taken is None:
+        return LEASE_LOST
+    
+    tmp, job = taken
+    job['attempts'] += 1
+    job['errors'].append(error)
+    state = 'failed' if job['attempts'] >= max_attempts or not retry else 'pending'
+    
+    # a pending job is not leased by anyone until it is claimed again
+    if state == 'pending':
+        job['worker'] = None
+    write_json(job_path(queue_dir, state, job_id), job)
+    os.remove(tmp)
+    return state
+
+# RETURN THE JOBS WHOSE LEASE HAS EXPIRED TO THE QUEUE
+def requeue_expired(queue_dir, lease_timeout=LEASE_TIMEOUT, max_attempts=MAX_ATTEMPTS):
+    now = time.time()
+    for fname in os.listdir(os.path.join(queue_dir, 'leased')):
+        if not fname.endswith('.json'):
+            continue
+        try:
+            expired = now - os.path.getmtime(os.path.join(queue_dir, 'leased', fname)) > lease_timeout
+        except FileNotFoundError:
+            continue
+        if expired:
+            release_job(queue_dir, fname[:-5], f'lease expired at {time.ctime(now)}', max_attempts)
+    return
+
+# PUBLISH THE RESULTS OF A JOB, ONLY THE FIRST COMMIT OF A JOB IS KEPT
+def commit_result(queue_dir, job_id, scratch_dir):
+    try:
+        os.rename(scratch_dir, os.path.join(queue_dir, 'results', job_id))
+        return True
+    except OSError:
+        # the results were already committed by another attempt of the same job
+        shutil.rmtree(scratch_dir, ignore_errors=True)
+        return False
+
+# MARK A JOB AS DONE (ONCE ITS RESULTS ARE COMMITTED), A JOB LEASED BY ANOTHER WORKER THAN worker_id IS LEFT TO THAT WORKER
+def complete_job(queue_dir, job_id, worker_id=None):
+    taken = take_lease(queue_dir, job_id, worker_id)
+    if taken is not None:
+        os.rename(taken[0], job_path(queue_dir, 'done', job_id))
+        return True
+    
+    # the lease of a worker which committed the results expired and the job was returned to the queue
+    try:
+        os.rename(job_path(queue_dir, 'pending', job_id), job_path(queue_dir, 'done', job_id))
+        return True
+    except FileNotFoundError:
+        return False
+
+# STATUS OF THE QUEUE (NUMBER OF JOBS IN EACH STATE)
+def queue_status(queue_dir):
+    return {state: len([f for f in os.listdir(os.path.join(queue_dir, state)) if f.endswith('.json')]) 
+            for state in ['pending', 'leased', 'done', 'failed']}
+
+# MODEL SNAPSHOTS ARE LOADED ONCE PER WORKER PROCESS
+_snapshots = {}
+
+# RUN THE RESPONSE HISTORY ANALYSIS OF A JOB, ALL THE OUTPUT IS WRITTEN TO THE SCRATCH DIRECTORY
+def run_analysis_job(job, scratch_dir):
+    from general_utilities import load_model_snapshot
+    from opensees_utilities import setup_opensees_model, run_dynamic_analysis_w_rayleigh_damping
+    from opensees_postprocessor import hinge_analytics
+    from campaign_statistics import export_run_arrays
+    from analysis_metrics import register_run
+    from streaming_postprocessor import StreamingEDPs, save_edp_summary
+    
+    if job['snapshot'] not in _snapshots:
+        _snapshots[job['snapshot']] = load_model_snapshot(job['snapshot'])
+    model_data = _snapshots[job['snapshot']]
+    
+    # the recorders write to the current directory, which is private to this job
+    cwd = os.getcwd()
+    os.chdir(scratch_dir)
+    edps = StreamingEDPs(model_data)
+    try:
+        setup_opensees_model(model_data)
+        _, _, status = run_dynamic_analysis_w_rayleigh_damping(model_data, job['zeta'], job['initialOrTangent'], scratch_dir, 
+                                                               job['total_run_time'], job['time_step'], job['record'], 
+                                                               job['scale'], metrics=register_run(job['job_id']), 
+                                                               edp_stream=edps)
+    finally:
+        os.chdir(cwd)
+    
+    # the histories of a diverged analysis are truncated, they must not be published as the result of the job
+    if status['failed']:
+        raise JobFailed(f'the analysis did not converge (stopped at t = {status["time"]:.3f} s of {job["total_run_time"]} s)')
+    
+    # envelopes computed while the analysis was running
+    save_edp_summary(edps.summary, os.path.join(scratch_dir, f'edp_summary-{job["initialOrTangent"]}.json'))
+    
+    hinge_analytics(model_data, job['initialOrTangent'], scratch_dir).to_pickle(
+                                                        os.path.join(scratch_dir, f'hinge_analytics-{job["initialOrTangent"]}.pkl'))
+    
+    # binary arrays of the run for the statistics of the campaign (campaign_statistics.summarize_campaign)
+    export_run_arrays(model_data, job['initialOrTangent'], scratch_dir, job['time_step'])
+    return
+
+# KEEP THE LEASE OF A JOB ALIVE WHILE IT RUNS
+class Heartbeat(threading.Thread):
+    def __init__(self, queue_dir, job_id, interval, worker_id=None):
+        super().__init__(daemon=True)
+        self.queue_dir, self.job_id, self.interval, self.worker_id = queue_dir, job_id, interval, worker_id
+        self.stopped = threading.Event()
+    
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            if not heartbeat(self.queue_dir, self.job_id, self.worker_id):
+                return
+    
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+# WHAT HAPPENED TO A JOB RELEASED BY ITS WORKER (STATE RETURNED BY release_job)
+def release_message(state):
+    if state == LEASE_LOST:
+        return 'its lease had already expired'
+    return f'moved to {state}'
+
+# PULL AND RUN JOBS UNTIL THE QUEUE IS EMPTY
+def run_worker(queue_dir, worker_id=None, run_job=run_analysis_job, lease_timeout=LEASE_TIMEOUT, 
+               heartbeat_interval=HEARTBEAT_INTERVAL, poll_interval=POLL_INTERVAL, max_attempts=MAX_ATTEMPTS, exit_when_empty=True, metrics_port=None):
+    
+    if worker_id is None:
+        worker_id = f'{socket.gethostname()}-{os.getpid()}'
+    init_queue(queue_dir)
+    
+    # expose the progress of the running job (see analysis_metrics)
+    if metrics_port is not None:
+        from analysis_metrics import start_metrics_server
+        start_metrics_server(metrics_port)
+    
+    num_jobs = 0
+    while True:
+        requeue_expired(queue_dir, lease_timeout, max_attempts)
+        job = claim_job(queue_dir, worker_id)
+        
+        if job is None:
+            status = queue_status(queue_dir)
+            if exit_when_empty and status['pending'] == 0 and status['leased'] == 0:
+                break
+            time.sleep(poll_interval)
+            continue
+        
+        job_id = job['job_id']
+        
+        # a previous attempt of this job may have committed its results before its lease expired
+        if os.path.exists(os.path.join(queue_dir, 'results', job_id)):
+            complete_job(queue_dir, job_id, worker_id)
+            continue
+        
+        print(f'[{worker_id}] running job {job_id} (attempt {job["attempts"] + 1})')
+        scratch_dir = os.path.join(queue_dir, 'scratch', f'{job_id}-{worker_id}-{uuid.uuid4().hex[:8]}')
+        os.makedirs(scratch_dir)
+        
+        beat = Heartbeat(queue_dir, job_id, heartbeat_interval, worker_id)
+        beat.start()
+        try:
+            run_job(job, scratch_dir)
+        except JobFailed as e:
+            beat.stop()
+            shutil.rmtree(scratch_dir, ignore_errors=True)
+            state = release_job(queue_dir, job_id, f'{worker_id}: {e}', max_attempts, retry=False, worker_id=worker_id)
+            print(f'[{worker_id}] job {job_id} failed ({e}), {release_message(state)}')
+            continue
+        except Exception:
+            beat.stop()
+            shutil.rmtree(scratch_dir, ignore_errors=True)
+            state = release_job(queue_dir, job_id, f'{worker_id}: {traceback.format_exc()}', max_attempts, worker_id=worker_id)
+            print(f'[{worker_id}] job {job_id} raised an exception, {release_message(state)}')
+            continue
+        beat.stop()
+        
+        with open(os.path.join(scratch_dir, 'job.json'), 'w') as f:
+            json.dump({**job, 'finished_at': time.time()}, f, indent=4, sort_keys=True)
+        commit_result(queue_dir, job_id, scratch_dir)
+        complete_job(queue_dir, job_id, worker_id)
+        num_jobs += 1
+    
+    print(f'[{worker_id}] queue is empty, {num_jobs} job(s) completed')
+    return num_jobs
+
+# JOB USED TO SIMULATE A CAMPAIGN, THE WORKER CAN BE CONFIGURED TO DIE IN THE MIDDLE OF ITS FIRST JOB
+def simulated_job(job, scratch_dir, duration=0.2, crash=None):
+    if crash is not None and crash.is_set():
+        crash.clear()
+        os._exit(1)     # simulate a node that dies without releasing its lease
+    time.sleep(duration)
+    with open(os.path.join(scratch_dir, 'result.txt'), 'w') as f:
+        f.write(f'{job["record"]} {job["scale"]} {job["zeta"]} {job["initialOrTangent"]}\n')
+    return
+
+def simulated_worker(queue_dir, worker_id, crash):
+    run_worker(queue_dir, worker_id, run_job=lambda job, scratch_dir: simulated_job(job, scratch_dir, crash=crash),
+               lease_timeout=2.0, heartbeat_interval=0.2, poll_interval=0.1)
+    return
+
+# SIMULATE SEVERAL NODES WITH LOCAL PROCESSES, ONE OF WHICH DIES WHILE HOLDING A LEASE
+def simulate(num_workers=4, num_records=5, queue_dir=None):
+    import tempfile
+    queue_dir = queue_dir or tempfile.mkdtemp(prefix='e2o_queue_')
+    
+    records = [f'record_{i}.acc' for i in range(num_records)]
+    job_ids = submit_campaign(queue_dir, 'model_snapshot.pkl', records, [1.0, 2.0], [(0.05, 'initial'), (0.05, 'tangent')])
+    print(f'Submitted {len(job_ids)} jobs to {queue_dir}')
+    
+    ctx = multiprocessing.get_context('spawn')
+    crash = ctx.Event()
+    crash.set()
+    workers = [ctx.Process(target=simulated_worker, args=(queue_dir, f'node{i}', crash)) for i in range(num_workers)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    
+    status = queue_status(queue_dir)
+    results = sorted(os.listdir(os.path.join(queue_dir, 'results')))
+    retried = [job_id for job_id in job_ids if read_json(job_path(queue_dir, 'done', job_id))['attempts'] > 0]
+    
+    print(f'Queue status: {status}')
+    print(f'Committed results: {len(results)}, jobs retried after lease expiry: {len(retried)}')
+    assert status == {'pending': 0, 'leased': 0, 'done': len(job_ids), 'failed': 0}
+    assert results == sorted(job_ids)
+    assert len(retried) == 1
+    print('Simulation passed!')
+    shutil.rmtree(queue_dir)
+    return
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='File based work queue for NLRHA campaigns.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    
+    worker_parser = subparsers.add_parser('worker', help='run a worker until the queue is empty')
+    worker_parser.add_argument('queue_dir')
+    worker_parser.add_argument('--lease-timeout', type=float, default=LEASE_TIMEOUT)
+    worker_parser.add_argument('--keep-alive', action='store_true', help='keep polling when the queue is empty')
+    worker_parser.add_argument('--metrics-port', type=int, default=None, 
+                               help='serve the progress of the running job on this port (or the next free one)')
+    
+    simulate_parser = subparsers.add_parser('simulate', help='simulate several nodes with local processes')
+    simulate_parser.add_argument('--workers', type=int, default=4)
+    
+    args = parser.parse_args()
+    if args.command == 'worker':
+        run_worker(args.queue_dir, lease_timeout=args.lease_timeout, exit_when_empty=not args.keep_alive, 
+                   metrics_port=args.metrics_port)
+    else:
+        simulate(args.workers)
+    sys.exit(0)
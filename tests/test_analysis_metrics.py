@@ -0,0 +1,22 @@
+import numpy as np
+import analysis_metrics as am
+
+def test_slots_of_running_analyses_are_not_reused(monkeypatch):
+    table = np.zeros(am.NUM_SLOTS, dtype=am.SLOT_DTYPE)
+    monkeypatch.setattr(am, '_table', table)
+    runs = [am.register_run(f'run{i}') for i in range(am.NUM_SLOTS)]
+    assert all(np.shares_memory(run.values, table) for run in runs)
+    
+    # all the slots are registered or running, the next run gets private metrics
+    runs[0].values[am.STATE] = am.RUNNING
+    extra = am.register_run('extra')
+    assert not np.shares_memory(extra.values, table)
+    assert [am.read_slot_text(table, i)['run'] for i in range(am.NUM_SLOTS)] == [f'run{i}' for i in range(am.NUM_SLOTS)]
+    
+    # the slot of the run which finished first is reused
+    for index, finished_at in [(3, 200.0), (5, 100.0)]:
+        runs[index].values[am.STATE] = am.FINISHED
+        runs[index].values[am.FINISHED_AT] = finished_at
+    reused = am.register_run('next')
+    assert np.shares_memory(reused.values, table['values'][5])
+    assert am.read_slot_text(table, 5)['run'] == 'next'
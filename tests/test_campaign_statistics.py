@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+from campaign_statistics import QuantileSketch, RunningStats, summarize_campaign
+
+PERCENTILES = [5, 16, 50, 84, 95]
+
+# FEED THE RUNS ONE BY ONE, AS summarize_campaign DOES
+def sketch_of(runs, relative_accuracy=0.01, **kwargs):
+    sketch = QuantileSketch(runs.shape[1:], relative_accuracy, **kwargs)
+    for run in runs:
+        sketch.update(run)
+    return sketch
+
+def assert_close_to_percentiles(sketch, runs, relative_accuracy):
+    for p in PERCENTILES:
+        expected = np.percentile(runs, p, axis=0, method='inverted_cdf')
+        np.testing.assert_allclose(sketch.quantile(p / 100), expected, rtol=relative_accuracy, atol=0)
+
+@pytest.mark.parametrize('relative_accuracy', [0.01, 0.05])
+def test_quantiles_of_lognormal_peaks(relative_accuracy):
+    runs = np.random.default_rng(0).lognormal(np.log(0.02), 0.6, size=(300, 4, 2))
+    assert_close_to_percentiles(sketch_of(runs, relative_accuracy), runs, relative_accuracy)
+
+def test_quantiles_with_zeros():
+    runs = np.random.default_rng(1).lognormal(0.0, 1.0, size=(200, 3))
+    runs[::3, 0] = 0.0
+    runs[:, 1] = 0.0
+    sketch = sketch_of(runs)
+    assert_close_to_percentiles(sketch, runs, 0.01)
+    assert np.all(sketch.quantile(0.5)[1] == 0.0)
+
+def test_range_is_extended_by_later_runs():
+    runs = np.random.default_rng(2).lognormal(0.0, 0.5, size=(200, 2))
+    runs[100:, 0] *= 1e6
+    runs[100:, 1] *= 1e-6
+    sketch = sketch_of(runs)
+    assert sketch.num_clipped == 0
+    assert_close_to_percentiles(sketch, runs, 0.01)
+
+def test_values_beyond_the_largest_range_are_counted():
+    sketch = QuantileSketch((1,), max_decades=2)
+    sketch.update([1.0])
+    sketch.update([1e9])
+    assert sketch.num_clipped == 1
+
+def test_running_stats():
+    runs = np.random.default_rng(3).normal(size=(50, 5))
+    stats = RunningStats((1, 5))
+    for run in runs:
+        stats.update(run[None])
+    np.testing.assert_allclose(stats.mean[0], runs.mean(axis=0))
+    np.testing.assert_allclose(stats.std[0], runs.std(axis=0, ddof=1))
+
+def test_quantile_without_values_is_nan():
+    sketch = QuantileSketch((2, 2))
+    assert np.all(np.isnan(sketch.quantile(0.5)))
+    
+    # an element which only received NaN has no quantile
+    sketch.update(np.array([[1.0, np.nan], [0.0, 2.0]]))
+    assert np.array_equal(np.isnan(sketch.quantile(0.5)), [[False, True], [False, False]])
+
+def test_summary_of_no_runs():
+    with pytest.raises(ValueError, match='no runs to summarize'):
+        summarize_campaign([])
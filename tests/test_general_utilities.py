@@ -0,0 +1,37 @@
+import numpy as np
+import pytest
+from general_utilities import TABLE_SCHEMAS, parse_database_column, parse_database_table
+
+MODAL_TABLE = 'Modal Participating Mass Ratios'
+MODAL_HEADERS = ['Case', 'Mode', 'Period', 'UX']
+
+def test_parse_typed_columns():
+    data = ('Modal', '1', '1.25', '0.7', 'Modal', '2', '0.5', '0.1')
+    df = parse_database_table(MODAL_HEADERS, data, TABLE_SCHEMAS[MODAL_TABLE], MODAL_TABLE)
+    
+    # the columns which are not in the schema are dropped
+    assert list(df.columns) == ['Case', 'Mode', 'Period']
+    assert df['Mode'].dtype == int
+    assert df['Mode'].tolist() == [1, 2]
+    assert df['Period'].tolist() == [1.25, 0.5]
+    assert df['Case'].tolist() == ['Modal', 'Modal']
+
+def test_int_column_with_decimal_point():
+    assert parse_database_column(('1', '2.0', '3'), int).tolist() == [1, 2, 3]
+
+def test_float_column_with_blanks():
+    values = parse_database_column(('1.5', '', '2'), float)
+    assert values[0] == 1.5 and np.isnan(values[1]) and values[2] == 2.0
+
+def test_int_column_with_blanks():
+    data = ('Modal', '1', '1.25', '0.7', 'Modal', '', '0.5', '0.1')
+    with pytest.raises(ValueError, match=f"'Mode'.*'{MODAL_TABLE}'"):
+        parse_database_table(MODAL_HEADERS, data, TABLE_SCHEMAS[MODAL_TABLE], MODAL_TABLE)
+
+def test_int_column_with_fractions():
+    with pytest.raises(ValueError, match="'PointElm'"):
+        parse_database_column(('1', '2.5'), int, 'PointElm', 'Assembled Joint Masses')
+
+def test_missing_column():
+    with pytest.raises(KeyError, match='Mode'):
+        parse_database_table(['Case', 'Period'], ('Modal', '1.0'), TABLE_SCHEMAS[MODAL_TABLE], MODAL_TABLE)
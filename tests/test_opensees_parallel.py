@@ -0,0 +1,101 @@
+import os
+import numpy as np
+import pytest
+import openseespy.opensees as op
+import opensees_utilities as osu
+import opensees_parallel as osp
+from model_generator import generate_etabs_data
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+@pytest.fixture(scope='module')
+def model_data():
+    return generate_etabs_data(6, 2, 2)
+
+def test_partition_bands_of_floors(model_data):
+    partition = osp.partition_model(model_data, 3)
+
+    # contiguous bands, every partition has at least one floor
+    assert np.all(np.diff(partition['floor']) >= 0)
+    assert np.array_equal(np.unique(partition['floor']), [0, 1, 2])
+
+    # the joints of a rigid diaphragm belong to the partition of their floor
+    for floor, nodes in enumerate(model_data.diaphragm_nodes()):
+        assert np.all(partition['joint'][model_data.joint_rows(nodes)] == partition['floor'][floor])
+
+    with pytest.raises(ValueError):
+        osp.partition_model(model_data, len(model_data.floor_levels) + 1)
+
+def test_partitions_cover_the_model(model_data):
+    num_parts = 3
+    partition = osp.partition_model(model_data, num_parts)
+    parts = [osp.get_partition_data(model_data, partition, rank) for rank in range(num_parts)]
+
+    # every element is in exactly one partition and all the joints it connects are defined in that partition
+    assert sorted(np.concatenate([part.frames['id'] for part in parts]).tolist()) == sorted(model_data.frames['id'].tolist())
+    assert sorted(np.concatenate([part.hinges['ele'] for part in parts]).tolist()) == sorted(model_data.hinges['ele'].tolist())
+    for part in parts:
+        connected = np.concatenate([part.frames['node_i'], part.frames['node_j'], part.hinges['node'], part.hinges['new_node']])
+        assert np.all(np.isin(connected, part.joints['id']))
+
+    # the masses and loads of the shared joints are not added twice
+    assert np.allclose(sum(part.masses['mass'].sum(axis=0) for part in parts), model_data.masses['mass'].sum(axis=0))
+    assert sum(len(part.loads) for part in parts) == len(model_data.loads)
+
+def test_merge_partition_outputs(model_data, tmp_path):
+    num_parts = 3
+    partition = osp.partition_model(model_data, num_parts)
+    num_floors, num_hinges = len(model_data.floor_levels), len(model_data.hinges)
+    rng = np.random.default_rng(0)
+    serial = {'floor_disp': rng.normal(size=(5, 2 * num_floors)), 'hinge_def': rng.normal(size=(5, num_hinges)),
+              'hinge_frc': rng.normal(size=(5, num_hinges))}
+    item_parts = {'floor_disp': np.repeat(partition['floor'], 2), 'hinge_def': partition['hinge'],
+                  'hinge_frc': partition['hinge']}
+
+    # the partitions write the columns of their items, the last one was interrupted one step earlier
+    for name, values in serial.items():
+        for rank in range(num_parts):
+            num_steps = 4 if rank == num_parts - 1 else 5
+            np.savetxt(tmp_path / f'{name}_tangent.p{rank}.out', values[:num_steps, item_parts[name] == rank])
+
+    osp.merge_partition_outputs(partition, num_parts, 'tangent', str(tmp_path))
+
+    for name, values in serial.items():
+        assert np.allclose(np.loadtxt(tmp_path / f'{name}_tangent.out', ndmin=2), values[:4])
+    assert not list(tmp_path.glob('*.p*.out'))
+
+# FLOOR DISPLACEMENTS OF A SHORT RESPONSE HISTORY ANALYSIS
+def floor_disp_history(model_data, hinge_params, eigenValues, constraints, partition=None, num_steps=50):
+    if partition is None:
+        osu.setup_opensees_model(model_data, hinge_params)
+    else:
+        osp.setup_partition_model(model_data, partition, 0, hinge_params)
+    try:
+        osu.add_ground_motion('BM68elc.acc', 3.0)
+        osu.define_transient_analysis(constraints)
+        osu.add_rayleigh_damping(eigenValues, 0.05, 'tangent', verbose=False)
+
+        disp = []
+        for _ in range(num_steps):
+            assert op.analyze(1, 0.01) == 0
+            disp.append([op.nodeDisp(node, dof) for node in model_data.floor_nodes.tolist() for dof in (1, 2)])
+    finally:
+        op.wipe()
+    return np.array(disp)
+
+def test_penalty_constraints_match_the_serial_analysis(monkeypatch):
+    # the paths of the hinge properties and of the record are relative to the src directory
+    monkeypatch.chdir(os.path.join(REPO_DIR, 'src'))
+    monkeypatch.setattr(osu, 'hinge_props_fpath', os.path.join(REPO_DIR, 'worksheets', 'NL Properties Summary.xlsx'))
+    
+    # the partition model with the penalty constraints of the parallel analysis, on a single process
+    model_data = generate_etabs_data(4, 2, 2)
+    hinge_params = osu.get_hinge_params(model_data)
+    osu.setup_opensees_model(model_data, hinge_params)
+    eigenValues = osu.modal_response(osu.numEigen)
+    op.wipe()
+
+    serial = floor_disp_history(model_data, hinge_params, eigenValues, ('Transformation',))
+    penalty = floor_disp_history(model_data, hinge_params, eigenValues, osp.parallelConstraints,
+                                 osp.partition_model(model_data, 1))
+    assert np.abs(penalty - serial).max() < 1e-5 * np.abs(serial).max()
@@ -0,0 +1,56 @@
+import numpy as np
+import pandas as pd
+from opensees_postprocessor import compute_hinge_metrics, base_shear
+from model_generator import generate_etabs_data
+
+K0, MY = 1000.0, 10.0
+LIMITS = [[0.005, 0.01, 0.02]]
+
+# MOMENT OF AN ELASTIC PERFECTLY PLASTIC HINGE FOR A ROTATION HISTORY
+def elastic_plastic_moments(rotations):
+    moments, plastic = np.zeros_like(rotations), 0.0
+    for i, rotation in enumerate(rotations):
+        moment = K0 * (rotation - plastic)
+        if abs(moment) > MY:
+            plastic += (abs(moment) - MY) / K0 * np.sign(moment)
+            moment = MY * np.sign(moment)
+        moments[i] = moment
+    return moments
+
+def test_energy_of_a_plastic_cycle():
+    # a cycle to +-0.03 and back to 0, the plastic rotation goes 0.02 forward, 0.04 back and 0.01 forward again
+    rotations = np.concatenate([np.linspace(0, 0.03, 301), np.linspace(0.03, -0.03, 601), np.linspace(-0.03, 0.0, 301)])
+    moments = elastic_plastic_moments(rotations)
+    _, peak_plastic, cum_plastic, energy, ratio = compute_hinge_metrics(rotations[None], moments[None], [K0], LIMITS)
+    
+    np.testing.assert_allclose(peak_plastic, 0.02, rtol=1e-6)
+    np.testing.assert_allclose(cum_plastic, 0.07, rtol=1e-6)
+    np.testing.assert_allclose(energy, MY * 0.07, rtol=1e-3)
+    np.testing.assert_allclose(ratio, [[4.0, 2.0, 1.0]], rtol=1e-6)
+
+def test_energy_of_an_elastic_hinge_is_not_negative():
+    # the recorders round the moments and rotations, so the plastic rotation of an elastic hinge is not exactly 0
+    rotations = 0.005 * np.sin(np.linspace(0, 20 * np.pi, 2001)[None] + np.arange(5)[:, None])
+    moments = np.round(K0 * rotations, 4)
+    rotations = np.round(rotations, 6)
+    energy = compute_hinge_metrics(rotations, moments, np.full(5, K0), LIMITS * 5)[3]
+    assert np.all(energy >= 0.0)
+    assert np.all(energy < 1e-3 * (K0 * 0.005)**2 / (2 * K0))
+
+def test_base_shear_time_axis(tmp_path):
+    model_data = generate_etabs_data(2, 1, 1)
+    rxn_nodes = model_data.rxn_nodes.tolist()
+    for i, node in enumerate(rxn_nodes):
+        rxn = np.zeros((7 - i, 6))
+        rxn[:, 0], rxn[:, 1] = 1.0, -2.0
+        np.savetxt(tmp_path / f'node_{node}_rxn_tangent.out', rxn)
+    
+    base_shear(str(tmp_path), model_data, 'tangent', time_step=0.02)
+    
+    # the histories are cut to the shortest recorder, line k is at (k + 1) * time_step
+    df = pd.read_excel(tmp_path / 'base shear x-tangent.xlsx', index_col=0)
+    num_steps = 8 - len(rxn_nodes)
+    np.testing.assert_allclose(df['t'], 0.02 * np.arange(1, num_steps + 1))
+    np.testing.assert_allclose(df['Vx'], len(rxn_nodes))
+    df = pd.read_excel(tmp_path / 'base shear y-tangent.xlsx', index_col=0)
+    np.testing.assert_allclose(df['Vy'], -2.0 * len(rxn_nodes))
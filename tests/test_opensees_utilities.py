@@ -0,0 +1,9 @@
+import pytest
+import opensees_utilities as osu
+
+def test_scale_factors_of_the_directions():
+    assert osu.get_scale_factors(3.0, (1, 2)) == {1: 3.0, 2: 3.0}
+    assert osu.get_scale_factors({1: 3.0, 2: 1.0}, (1, 2)) == {1: 3.0, 2: 1.0}
+    assert osu.get_scale_factors({1: 3.0, 2: 1.0}, (2,)) == {2: 1.0}
+    with pytest.raises(ValueError):
+        osu.get_scale_factors({1: 3.0}, (1, 2))
@@ -0,0 +1,42 @@
+import numpy as np
+import pytest
+from perform3d_comparison import compare_run
+
+def histories(time, amplitudes):
+    return np.sin(time[:, None] * np.arange(1, len(amplitudes) + 1)) * np.asarray(amplitudes)
+
+def test_items_matched_by_label():
+    os_time = 0.01 * np.arange(1, 501)
+    p3d_time = 0.02 * np.arange(0, 251)
+    os_histories = {'hinge_rotation': histories(os_time, [1.0, 2.0, 3.0])}
+    os_labels = {'hinge_rotation': np.array(['ElemSteelBeam 1 I', 'ElemSteelBeam 1 J', ''])}
+    os_items = {'hinge_rotation': np.array(['101', '102', '103'])}
+    
+    # the Perform3D columns are in another order and the second one is 10 % larger
+    p3d_values = histories(p3d_time, [1.0, 2.0])[:, ::-1] * [1.1, 1.0]
+    comparison = compare_run(os_time, os_histories, os_labels, {'hinge_rotation': p3d_time}, 
+                             {'hinge_rotation': p3d_values}, {'hinge_rotation': np.array(['ElemSteelBeam 1 J', 'ElemSteelBeam 1 I'])}, 
+                             os_items)['hinge_rotation']
+    
+    # the item without a label is left out
+    assert comparison.index.tolist() == ['101', '102']
+    assert comparison['Perform3D Label'].tolist() == ['ElemSteelBeam 1 I', 'ElemSteelBeam 1 J']
+    np.testing.assert_allclose(comparison['Peak Ratio'], [1.0, 1 / 1.1], rtol=1e-3)
+    np.testing.assert_allclose(comparison['Correlation'], 1.0, rtol=1e-3)
+
+def test_each_table_keeps_its_times():
+    os_time = 0.01 * np.arange(1, 501)
+    os_histories = {'drift': histories(os_time, [1.0]), 'base_shear': histories(os_time, [2.0])}
+    labels = {'drift': np.array(['D']), 'base_shear': np.array(['V'])}
+    p3d_times = {'drift': 0.005 * np.arange(0, 1001), 'base_shear': 0.02 * np.arange(0, 151)}
+    p3d_histories = {quantity: histories(p3d_times[quantity], amplitudes) 
+                     for quantity, amplitudes in [('drift', [1.0]), ('base_shear', [2.0])]}
+    comparison = compare_run(os_time, os_histories, labels, p3d_times, p3d_histories, labels)
+    for quantity in ['drift', 'base_shear']:
+        np.testing.assert_allclose(comparison[quantity]['NRMSE'], 0.0, atol=1e-3)
+
+def test_no_matching_label():
+    time = 0.01 * np.arange(1, 11)
+    with pytest.raises(ValueError, match='None of the drift labels'):
+        compare_run(time, {'drift': histories(time, [1.0])}, {'drift': np.array(['D'])}, {'drift': time}, 
+                    {'drift': histories(time, [1.0])}, {'drift': np.array(['X'])})
@@ -0,0 +1,89 @@
+import os
+import numpy as np
+import pytest
+from model_data import ModelData, JOINT_DTYPE, FRAME_DTYPE, HINGE_DTYPE
+from perform3d_utilities import read_structure_header, read_nodes, read_elements, map_hinges_to_perform3d
+
+MODEL_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'models', 'Perform3D', 'p2006_E2O')
+
+# OFFSET OF THE OPENSEES JOINT IDS OF THE MODEL BUILT FROM THE PERFORM3D MODEL
+JOINT_OFFSET = 1000
+
+@pytest.fixture(scope='module')
+def p3d_model():
+    return read_nodes(MODEL_DIR), read_elements(MODEL_DIR)
+
+def node_coords(nodes, numbers):
+    rows = np.searchsorted(nodes['node'], numbers)
+    assert np.array_equal(nodes['node'][rows], numbers)
+    return np.asarray(nodes['xyz'])[rows]
+
+def test_structure_header():
+    header = read_structure_header(MODEL_DIR)
+    assert header['name'] == 'p2006_E2O'
+    assert header['num_nodes'] == 246
+
+def test_elements_connect_the_nodes(p3d_model):
+    nodes, (groups, elements) = p3d_model
+    assert groups == {1: 'ElemSteelCol', 2: 'ElemSteelBeam'}
+    assert np.bincount(elements['group']).tolist() == [0, 200, 180]
+    
+    # the columns are vertical and the beams horizontal
+    delta = node_coords(nodes, elements['node_j']) - node_coords(nodes, elements['node_i'])
+    columns = elements['group'] == 1
+    assert np.all(np.abs(delta[columns, :2]).sum(axis=1) == 0) and np.all(delta[columns, 2] != 0)
+    assert np.all(delta[~columns, 2] == 0) and np.all(np.abs(delta[~columns, :2]).sum(axis=1) > 0)
+
+# OPENSEES MODEL WITH THE GEOMETRY OF THE PERFORM3D MODEL AND A HINGE AT ONE END OF SOME BEAMS
+def model_from_perform3d(nodes, elements, beam_rows, ends):
+    joints = np.zeros(len(nodes) + len(beam_rows), dtype=JOINT_DTYPE)
+    joints['id'][:len(nodes)] = np.asarray(nodes['node']) + JOINT_OFFSET
+    xyz = np.asarray(nodes['xyz'])
+    
+    frames = np.zeros(len(elements), dtype=FRAME_DTYPE)
+    frames['id'] = np.arange(1, len(elements) + 1)
+    frames['node_i'] = elements['node_i'] + JOINT_OFFSET
+    frames['node_j'] = elements['node_j'] + JOINT_OFFSET
+    
+    # the new joint of each hinge is at the real joint and the beam is connected to the new joint
+    hinges = np.zeros(len(beam_rows), dtype=HINGE_DTYPE)
+    for k, (row, end) in enumerate(zip(beam_rows, ends)):
+        new_node = 100000 + k
+        real_node = frames[f'node_{end}'][row]
+        joints['id'][len(nodes) + k] = new_node
+        xyz = np.vstack([xyz, xyz[np.flatnonzero(joints['id'][:len(nodes)] == real_node)[0]]])
+        hinges[k] = (real_node, new_node, 200000 + k, 1, 0)
+        frames[f'node_{end}'][row] = new_node
+    joints['x'], joints['y'], joints['z'] = xyz.T
+    return ModelData(joints, frames, np.zeros(0), np.array([]), np.zeros(0), np.zeros(0), hinges, np.array(['hinge']))
+
+def test_hinges_mapped_to_perform3d_elements(p3d_model):
+    nodes, (groups, elements) = p3d_model
+    beam_rows = np.flatnonzero(elements['group'] == 2)[::7]
+    ends = np.where(np.arange(len(beam_rows)) % 2 == 0, 'i', 'j')
+    model_data = model_from_perform3d(nodes, elements, beam_rows, ends)
+    
+    mapping = map_hinges_to_perform3d(model_data, nodes, (groups, elements))
+    assert mapping.index.tolist() == model_data.hinges['ele'].tolist()
+    assert (mapping['Group'] == 'ElemSteelBeam').all()
+    assert mapping['Element'].tolist() == elements['element'][beam_rows].tolist()
+    assert mapping['End'].tolist() == np.char.upper(ends).tolist()
+
+def test_default_item_map(p3d_model, tmp_path):
+    from perform3d_comparison import default_item_map, write_item_map, read_item_map, opensees_labels, opensees_items
+    nodes, (groups, elements) = p3d_model
+    beam_rows = np.flatnonzero(elements['group'] == 2)[:3]
+    model_data = model_from_perform3d(nodes, elements, beam_rows, ['i', 'j', 'i'])
+    
+    # the map written to the disk can be edited and read back
+    fpath = str(tmp_path / 'items.csv')
+    write_item_map(fpath, default_item_map(model_data, nodes, (groups, elements)))
+    item_map = read_item_map(fpath)
+    item_map.loc[item_map['OpenSees Item'] == 'H2', 'Perform3D Label'] = ''
+    
+    labels = opensees_labels(model_data, item_map)
+    assert labels['drift'][:2].tolist() == ['L02_H1 Drift', 'L02_H2 Drift']
+    assert labels['base_shear'].tolist() == ['Frame Base Cut H1', '']
+    assert labels['hinge_rotation'].tolist() == [f'ElemSteelBeam {element} {end}' for element, end in 
+                                                 zip(elements['element'][beam_rows].tolist(), 'IJI')]
+    assert len(labels['drift']) == len(opensees_items(model_data)['drift'])
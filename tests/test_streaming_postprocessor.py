@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+import streaming_postprocessor as sp
+from model_generator import generate_etabs_data
+
+@pytest.fixture(scope='module')
+def model_data():
+    return generate_etabs_data(3, 1, 1)
+
+def write_recorders(model_data, dir_, floor_disp):
+    np.savetxt(dir_ / 'floor_disp_tangent.out', floor_disp)
+    for node in model_data.rxn_nodes.tolist():
+        np.savetxt(dir_ / f'node_{node}_rxn_tangent.out', np.ones((len(floor_disp), 6)))
+    np.savetxt(dir_ / 'hinge_def_tangent.out', np.full((len(floor_disp), len(model_data.hinges)), -0.01))
+
+def test_summary_of_the_recorders(model_data, tmp_path):
+    num_floors = len(model_data.floor_levels)
+    floor_disp = np.outer(np.arange(1.0, 5.0), np.repeat(np.arange(1, num_floors + 1), 2))
+    write_recorders(model_data, tmp_path, floor_disp)
+
+    edps = sp.StreamingEDPs(model_data, poll_interval=0.01)
+    edps.start('tangent', str(tmp_path))
+    summary = edps.finish()
+
+    assert summary['num_steps'] == 4
+    assert np.allclose(summary['max_floor_disp'], floor_disp[-1].reshape(-1, 2))
+    assert np.allclose(summary['peak_base_shear'], len(model_data.rxn_nodes))
+    assert np.allclose(summary['peak_hinge_rotation'], 0.01)
+
+def test_error_of_the_consumer_is_raised(model_data, tmp_path):
+    # a floor displacement recorder with a missing column
+    write_recorders(model_data, tmp_path, np.ones((3, 2 * len(model_data.floor_levels) - 1)))
+
+    edps = sp.StreamingEDPs(model_data, poll_interval=0.01)
+    edps.start('tangent', str(tmp_path))
+    with pytest.raises(RuntimeError, match='ValueError'):
+        edps.finish()
+    assert edps.consumer is None
+
+def test_dead_consumer_is_detected(model_data, tmp_path):
+    edps = sp.StreamingEDPs(model_data, poll_interval=0.01)
+    edps.start('tangent', str(tmp_path))
+    edps.consumer.kill()
+    with pytest.raises(RuntimeError, match='without an EDP summary'):
+        edps.finish()
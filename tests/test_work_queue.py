@@ -0,0 +1,154 @@
+import os
+import time
+import pytest
+import work_queue as wq
+
+@pytest.fixture
+def queue_dir(tmp_path):
+    queue_dir = str(tmp_path / 'queue')
+    wq.init_queue(queue_dir)
+    return queue_dir
+
+def submit(queue_dir, scale_factor=1.0):
+    return wq.submit_job(queue_dir, 'snapshot.pkl', 'record.acc', scale_factor, 0.05, 'tangent', total_run_time=1.0)
+
+# MOVE THE LAST REFRESH OF A LEASE TO THE PAST
+def age_lease(queue_dir, job_id, seconds):
+    fpath = wq.job_path(queue_dir, 'leased', job_id)
+    past = time.time() - seconds
+    os.utime(fpath, (past, past))
+
+def scratch_with(queue_dir, name, content):
+    scratch_dir = os.path.join(queue_dir, 'scratch', name)
+    os.makedirs(scratch_dir)
+    with open(os.path.join(scratch_dir, 'result.txt'), 'w') as f:
+        f.write(content)
+    return scratch_dir
+
+def test_claim_is_exclusive(queue_dir):
+    job_id = submit(queue_dir)
+    assert wq.claim_job(queue_dir, 'a')['job_id'] == job_id
+    assert wq.claim_job(queue_dir, 'b') is None
+    assert wq.queue_status(queue_dir) == {'pending': 0, 'leased': 1, 'done': 0, 'failed': 0}
+
+def test_expired_lease_is_requeued(queue_dir):
+    job_id = submit(queue_dir)
+    wq.claim_job(queue_dir, 'a')
+    age_lease(queue_dir, job_id, 100)
+    wq.requeue_expired(queue_dir, lease_timeout=10)
+    
+    assert wq.queue_status(queue_dir)['pending'] == 1
+    job = wq.read_json(wq.job_path(queue_dir, 'pending', job_id))
+    assert job['attempts'] == 1
+    assert 'lease expired' in job['errors'][0]
+    
+    # the worker which lost the lease notices it at its next heartbeat
+    assert not wq.heartbeat(queue_dir, job_id)
+
+def test_heartbeat_keeps_the_lease(queue_dir):
+    job_id = submit(queue_dir)
+    wq.claim_job(queue_dir, 'a')
+    age_lease(queue_dir, job_id, 100)
+    assert wq.heartbeat(queue_dir, job_id)
+    wq.requeue_expired(queue_dir, lease_timeout=10)
+    assert wq.queue_status(queue_dir)['leased'] == 1
+
+# WORKER a LOSES THE LEASE OF THE JOB, WHICH IS THEN CLAIMED BY WORKER b
+def take_over(queue_dir, job_id):
+    wq.claim_job(queue_dir, 'a')
+    age_lease(queue_dir, job_id, 100)
+    wq.requeue_expired(queue_dir, lease_timeout=10)
+    assert wq.claim_job(queue_dir, 'b')['job_id'] == job_id
+
+def test_lease_is_checked_for_its_worker(queue_dir):
+    job_id = submit(queue_dir)
+    take_over(queue_dir, job_id)
+    
+    assert not wq.heartbeat(queue_dir, job_id, 'a')
+    assert wq.heartbeat(queue_dir, job_id, 'b')
+    
+    # the late worker neither completes nor releases the job of the new worker
+    assert not wq.complete_job(queue_dir, job_id, 'a')
+    assert wq.release_job(queue_dir, job_id, 'a: error', worker_id='a') == wq.LEASE_LOST
+    assert wq.read_json(wq.job_path(queue_dir, 'leased', job_id))['worker'] == 'b'
+    
+    assert wq.complete_job(queue_dir, job_id, 'b')
+    assert wq.queue_status(queue_dir) == {'pending': 0, 'leased': 0, 'done': 1, 'failed': 0}
+
+def test_release_of_an_expired_lease(queue_dir):
+    job_id = submit(queue_dir)
+    wq.claim_job(queue_dir, 'a')
+    age_lease(queue_dir, job_id, 100)
+    wq.requeue_expired(queue_dir, lease_timeout=10)
+    
+    assert wq.release_job(queue_dir, job_id, 'a: error', worker_id='a') == wq.LEASE_LOST
+    assert wq.read_json(wq.job_path(queue_dir, 'pending', job_id))['attempts'] == 1
+
+def test_job_fails_after_max_attempts(queue_dir):
+    job_id = submit(queue_dir)
+    for _ in range(2):
+        wq.claim_job(queue_dir, 'a')
+        age_lease(queue_dir, job_id, 100)
+        wq.requeue_expired(queue_dir, lease_timeout=10, max_attempts=2)
+    
+    assert wq.queue_status(queue_dir) == {'pending': 0, 'leased': 0, 'done': 0, 'failed': 1}
+    assert wq.read_json(wq.job_path(queue_dir, 'failed', job_id))['attempts'] == 2
+
+def test_commit_is_exactly_once(queue_dir):
+    job_id = submit(queue_dir)
+    first = scratch_with(queue_dir, 'first', 'first')
+    second = scratch_with(queue_dir, 'second', 'second')
+    
+    assert wq.commit_result(queue_dir, job_id, first)
+    assert not wq.commit_result(queue_dir, job_id, second)
+    
+    # the results of the first commit are kept and the scratch of the second one is removed
+    with open(os.path.join(queue_dir, 'results', job_id, 'result.txt')) as f:
+        assert f.read() == 'first'
+    assert not os.path.exists(second)
+
+def test_late_worker_does_not_commit_twice(queue_dir):
+    job_id = submit(queue_dir)
+    
+    # worker a claims the job and stalls until its lease expires
+    wq.claim_job(queue_dir, 'a')
+    age_lease(queue_dir, job_id, 100)
+    
+    # worker b takes the job over and completes it
+    def run_job(job, scratch_dir):
+        with open(os.path.join(scratch_dir, 'result.txt'), 'w') as f:
+            f.write('b')
+    assert wq.run_worker(queue_dir, 'b', run_job=run_job, lease_timeout=10, heartbeat_interval=0.05, poll_interval=0.01) == 1
+    
+    # worker a wakes up and tries to publish its results
+    late = scratch_with(queue_dir, 'late', 'a')
+    assert not wq.commit_result(queue_dir, job_id, late)
+    wq.complete_job(queue_dir, job_id)
+    
+    assert os.listdir(os.path.join(queue_dir, 'results')) == [job_id]
+    with open(os.path.join(queue_dir, 'results', job_id, 'result.txt')) as f:
+        assert f.read() == 'b'
+    assert wq.queue_status(queue_dir) == {'pending': 0, 'leased': 0, 'done': 1, 'failed': 0}
+
+def test_failed_job_is_not_retried_nor_published(queue_dir):
+    job_id = submit(queue_dir)
+    
+    def run_job(job, scratch_dir):
+        raise wq.JobFailed('analysis failed at t = 0.5 s')
+    assert wq.run_worker(queue_dir, 'a', run_job=run_job, heartbeat_interval=0.05, poll_interval=0.01) == 0
+    
+    assert wq.queue_status(queue_dir) == {'pending': 0, 'leased': 0, 'done': 0, 'failed': 1}
+    assert os.listdir(os.path.join(queue_dir, 'results')) == []
+    assert wq.read_json(wq.job_path(queue_dir, 'failed', job_id))['attempts'] == 1
+
+def test_crashed_job_is_retried(queue_dir):
+    attempts = []
+    
+    def run_job(job, scratch_dir):
+        attempts.append(job['attempts'])
+        if len(attempts) == 1:
+            raise RuntimeError('worker crashed')
+    submit(queue_dir)
+    assert wq.run_worker(queue_dir, 'a', run_job=run_job, heartbeat_interval=0.05, poll_interval=0.01) == 1
+    assert attempts == [0, 1]
+    assert wq.queue_status(queue_dir)['done'] == 1